@@ -23,8 +23,11 @@ try:
         participant,
         participant_message,
         participant_variable,
+        participant_state,
         node_execution_log,
         scheduled_job,
+        campaign,
+        outbox_message,
     )
 except ImportError:
     pass
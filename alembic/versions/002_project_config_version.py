@@ -0,0 +1,24 @@
+"""Project config_version stamp used to invalidate compiled protocol graphs.
+
+Revision ID: 002
+Revises: 001
+Create Date: 2025-02-01 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "002"
+down_revision: Union[str, None] = "001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("projects", sa.Column("config_version", sa.String(36), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("projects", "config_version")
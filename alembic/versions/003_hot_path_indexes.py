@@ -0,0 +1,53 @@
+"""Secondary indexes for the engine and scheduler hot paths.
+
+Revision ID: 003
+Revises: 002
+Create Date: 2025-02-15 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "003"
+down_revision: Union[str, None] = "002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, unique)
+INDEXES = [
+    ("ix_scheduled_jobs_status_run_at", "scheduled_jobs", ["status", "run_at"], False),
+    ("ix_scheduled_jobs_participant_status", "scheduled_jobs", ["participant_id", "status"], False),
+    ("ix_participant_messages_participant_created", "participant_messages", ["participant_id", "created_at"], False),
+    ("ux_participant_variables_participant_variable", "participant_variables", ["participant_id", "variable_id"], True),
+    ("ix_nodes_project_activation_source", "nodes", ["project_id", "activation_type", "activation_source_node_id"], False),
+    ("ix_nodes_project_activation_poll", "nodes", ["project_id", "activation_type", "activation_poll_id"], False),
+    ("ix_keywords_project_text", "keywords", ["project_id", "keyword_text"], False),
+    ("ix_node_execution_logs_participant_executed", "node_execution_logs", ["participant_id", "executed_at"], False),
+]
+
+
+def upgrade() -> None:
+    # The unique index below would fail on duplicate (participant, variable) rows; keep one of each.
+    op.execute(
+        "DELETE FROM participant_variables WHERE id NOT IN ("
+        "SELECT MIN(id) FROM participant_variables GROUP BY participant_id, variable_id)"
+    )
+    if op.get_bind().dialect.name == "postgresql":
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction and does not block writers.
+        with op.get_context().autocommit_block():
+            for name, table, columns, unique in INDEXES:
+                op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+    else:
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, _, _ in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    else:
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,30 @@
+"""Scheduled job leases: claimed_by, lease_expires_at, attempts, last_error.
+
+Revision ID: 004
+Revises: 003
+Create Date: 2025-03-01 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "004"
+down_revision: Union[str, None] = "003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("scheduled_jobs", sa.Column("claimed_by", sa.String(64), nullable=True))
+    op.add_column("scheduled_jobs", sa.Column("lease_expires_at", sa.DateTime(), nullable=True))
+    op.add_column("scheduled_jobs", sa.Column("attempts", sa.Integer(), nullable=True, server_default="0"))
+    op.add_column("scheduled_jobs", sa.Column("last_error", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("scheduled_jobs", "last_error")
+    op.drop_column("scheduled_jobs", "attempts")
+    op.drop_column("scheduled_jobs", "lease_expires_at")
+    op.drop_column("scheduled_jobs", "claimed_by")
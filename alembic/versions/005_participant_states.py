@@ -0,0 +1,61 @@
+"""Participant conversation state (awaiting poll, last node, activity, counts).
+
+Revision ID: 005
+Revises: 004
+Create Date: 2025-03-08 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "005"
+down_revision: Union[str, None] = "004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "participant_states",
+        sa.Column("participant_id", sa.String(36), sa.ForeignKey("participants.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("awaiting_poll_template_id", sa.String(36), sa.ForeignKey("message_templates.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("last_node_id", sa.String(36), sa.ForeignKey("nodes.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("last_outbound_at", sa.DateTime(), nullable=True),
+        sa.Column("last_inbound_at", sa.DateTime(), nullable=True),
+        sa.Column("outbound_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("inbound_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    # Backfill from history: counts and activity times, the last POLL sent, the last node executed.
+    op.execute(
+        """
+        INSERT INTO participant_states
+            (participant_id, outbound_count, inbound_count, last_outbound_at, last_inbound_at,
+             awaiting_poll_template_id, last_node_id, updated_at)
+        SELECT
+            p.id,
+            (SELECT COUNT(*) FROM participant_messages m
+              WHERE m.participant_id = p.id AND m.direction = 'OUTBOUND'),
+            (SELECT COUNT(*) FROM participant_messages m
+              WHERE m.participant_id = p.id AND m.direction = 'INBOUND'),
+            (SELECT MAX(m.created_at) FROM participant_messages m
+              WHERE m.participant_id = p.id AND m.direction = 'OUTBOUND'),
+            (SELECT MAX(m.created_at) FROM participant_messages m
+              WHERE m.participant_id = p.id AND m.direction = 'INBOUND'),
+            (SELECT m.message_template_id FROM participant_messages m
+               JOIN message_templates t ON t.id = m.message_template_id
+              WHERE m.participant_id = p.id AND m.direction = 'OUTBOUND' AND t.type = 'POLL'
+              ORDER BY m.created_at DESC LIMIT 1),
+            (SELECT l.node_id FROM node_execution_logs l
+              WHERE l.participant_id = p.id
+              ORDER BY l.executed_at DESC LIMIT 1),
+            CURRENT_TIMESTAMP
+        FROM participants p
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("participant_states")
@@ -0,0 +1,36 @@
+"""Index participants by (project_id, external_id) for bulk-import de-duplication.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2025-03-15 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "006"
+down_revision: Union[str, None] = "005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(
+                "ix_participants_project_external",
+                "participants",
+                ["project_id", "external_id"],
+                postgresql_concurrently=True,
+            )
+    else:
+        op.create_index("ix_participants_project_external", "participants", ["project_id", "external_id"])
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index("ix_participants_project_external", table_name="participants", postgresql_concurrently=True)
+    else:
+        op.drop_index("ix_participants_project_external", table_name="participants")
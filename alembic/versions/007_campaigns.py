@@ -0,0 +1,44 @@
+"""Campaigns and scheduled_jobs.campaign_id.
+
+Revision ID: 007
+Revises: 006
+Create Date: 2025-03-22 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "007"
+down_revision: Union[str, None] = "006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "campaigns",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("project_id", sa.String(36), sa.ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("node_id", sa.String(36), sa.ForeignKey("nodes.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("name", sa.String(255), nullable=True),
+        sa.Column("language", sa.String(20), nullable=True),
+        sa.Column("run_at", sa.DateTime(), nullable=False),
+        sa.Column("job_count", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    with op.batch_alter_table("scheduled_jobs") as batch:
+        batch.add_column(sa.Column("campaign_id", sa.String(36), nullable=True))
+        batch.create_foreign_key(
+            "fk_scheduled_jobs_campaign_id", "campaigns", ["campaign_id"], ["id"], ondelete="SET NULL"
+        )
+    op.create_index("ix_scheduled_jobs_campaign_status", "scheduled_jobs", ["campaign_id", "status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_scheduled_jobs_campaign_status", table_name="scheduled_jobs")
+    with op.batch_alter_table("scheduled_jobs") as batch:
+        batch.drop_constraint("fk_scheduled_jobs_campaign_id", type_="foreignkey")
+        batch.drop_column("campaign_id")
+    op.drop_table("campaigns")
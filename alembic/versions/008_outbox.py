@@ -0,0 +1,46 @@
+"""Outbox for external channel delivery and participants.channel.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2025-04-05 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "008"
+down_revision: Union[str, None] = "007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("participants", sa.Column("channel", sa.String(20), nullable=True, server_default="web"))
+    op.create_table(
+        "outbox_messages",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("message_id", sa.String(36), sa.ForeignKey("participant_messages.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("participant_id", sa.String(36), sa.ForeignKey("participants.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("channel", sa.String(20), nullable=False),
+        sa.Column("recipient", sa.String(255), nullable=True),
+        sa.Column("text", sa.Text(), nullable=True),
+        sa.Column("status", sa.String(20), nullable=True),
+        sa.Column("available_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("claimed_by", sa.String(64), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.Column("provider_message_id", sa.String(255), nullable=True),
+    )
+    op.create_index("ix_outbox_messages_status_available", "outbox_messages", ["status", "available_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_outbox_messages_status_available", table_name="outbox_messages")
+    op.drop_table("outbox_messages")
+    with op.batch_alter_table("participants") as batch:
+        batch.drop_column("channel")
@@ -0,0 +1,41 @@
+"""scheduled_jobs.project_id for fair per-project claims.
+
+Revision ID: 009
+Revises: 008
+Create Date: 2025-04-12 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "009"
+down_revision: Union[str, None] = "008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX = ("ix_scheduled_jobs_status_project_run_at", "scheduled_jobs", ["status", "project_id", "run_at"])
+
+
+def upgrade() -> None:
+    op.add_column("scheduled_jobs", sa.Column("project_id", sa.String(36), nullable=True))
+    # Only jobs that can still run are claimed by project; finished ones keep NULL.
+    op.execute(
+        "UPDATE scheduled_jobs SET project_id = "
+        "(SELECT participants.project_id FROM participants WHERE participants.id = scheduled_jobs.participant_id) "
+        "WHERE status IN ('PENDING', 'RUNNING')"
+    )
+    name, table, columns = INDEX
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+    else:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    name, table, _ = INDEX
+    op.drop_index(name, table_name=table)
+    with op.batch_alter_table("scheduled_jobs") as batch:
+        batch.drop_column("project_id")
@@ -0,0 +1,36 @@
+"""scheduled_jobs.lane (interactive / bulk claim queues).
+
+Revision ID: 010
+Revises: 009
+Create Date: 2025-04-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "010"
+down_revision: Union[str, None] = "009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX = ("ix_scheduled_jobs_status_lane_run_at", "scheduled_jobs", ["status", "lane", "run_at"])
+
+
+def upgrade() -> None:
+    # Existing jobs (START_DATE schedules, campaigns, delayed follow-ups) all go to the bulk lane.
+    op.add_column("scheduled_jobs", sa.Column("lane", sa.String(20), nullable=False, server_default="bulk"))
+    name, table, columns = INDEX
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+    else:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    name, table, _ = INDEX
+    op.drop_index(name, table_name=table)
+    with op.batch_alter_table("scheduled_jobs") as batch:
+        batch.drop_column("lane")
@@ -0,0 +1,25 @@
+"""timing_elements.spread_seconds (per-participant run time spreading).
+
+Revision ID: 011
+Revises: 010
+Create Date: 2025-04-26 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "011"
+down_revision: Union[str, None] = "010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("timing_elements", sa.Column("spread_seconds", sa.Integer(), nullable=True, server_default="0"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("timing_elements") as batch:
+        batch.drop_column("spread_seconds")
@@ -0,0 +1,27 @@
+"""scheduled_jobs.started_at / finished_at (scheduler lag after the fact).
+
+Revision ID: 012
+Revises: 011
+Create Date: 2025-05-03 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "012"
+down_revision: Union[str, None] = "011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("scheduled_jobs", sa.Column("started_at", sa.DateTime(), nullable=True))
+    op.add_column("scheduled_jobs", sa.Column("finished_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("scheduled_jobs") as batch:
+        batch.drop_column("finished_at")
+        batch.drop_column("started_at")
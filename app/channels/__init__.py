@@ -0,0 +1,59 @@
+"""
+External delivery channels.
+
+An adapter sends outbox messages for one channel (Participant.channel). Adapters are
+configured from settings; a channel without an adapter keeps its messages PENDING in
+the outbox until one is configured. "web" messages are only shown in the chat UI and
+never enter the outbox.
+"""
+from typing import Optional
+
+import httpx
+
+from app.channels.adapters import FacebookAdapter, SmsAdapter, WebhookAdapter
+from app.channels.base import (
+    ChannelAdapter,
+    DeliveryError,
+    DeliveryResult,
+    HttpChannelAdapter,
+    OutboundMessage,
+)
+from app.config import settings
+
+WEB_CHANNEL = "web"
+
+
+def build_adapters(transport: Optional[httpx.AsyncBaseTransport] = None) -> dict[str, ChannelAdapter]:
+    """Adapters for every channel configured in settings, by channel name (their clients bind to the loop that uses them)."""
+    timeout = settings.CHANNEL_HTTP_TIMEOUT_SECONDS
+    adapters: list[ChannelAdapter] = []
+    if settings.SMS_GATEWAY_URL:
+        adapters.append(SmsAdapter(
+            settings.SMS_GATEWAY_URL, settings.SMS_API_KEY, settings.SMS_SENDER,
+            concurrency=settings.SMS_CONCURRENCY, timeout=timeout, transport=transport,
+        ))
+    if settings.FACEBOOK_PAGE_TOKEN:
+        adapters.append(FacebookAdapter(
+            settings.FACEBOOK_PAGE_TOKEN, settings.FACEBOOK_API_URL,
+            concurrency=settings.FACEBOOK_CONCURRENCY, timeout=timeout, transport=transport,
+        ))
+    if settings.WEBHOOK_URL:
+        adapters.append(WebhookAdapter(
+            settings.WEBHOOK_URL, settings.WEBHOOK_SECRET,
+            concurrency=settings.WEBHOOK_CONCURRENCY, timeout=timeout, transport=transport,
+        ))
+    return {adapter.name: adapter for adapter in adapters}
+
+
+__all__ = [
+    "WEB_CHANNEL",
+    "ChannelAdapter",
+    "DeliveryError",
+    "DeliveryResult",
+    "FacebookAdapter",
+    "HttpChannelAdapter",
+    "OutboundMessage",
+    "SmsAdapter",
+    "WebhookAdapter",
+    "build_adapters",
+]
@@ -0,0 +1,87 @@
+"""HTTP channel adapters: SMS gateway, Facebook Messenger, generic webhook."""
+import hashlib
+import hmac
+import json
+from typing import Optional
+
+from app.channels.base import DeliveryError, HttpChannelAdapter, OutboundMessage, response_field
+
+
+class SmsAdapter(HttpChannelAdapter):
+    """
+    SMS through an HTTP gateway: POST {"to", "from", "text"} with a bearer API key; the
+    gateway's "id" is kept as the provider message id.
+    """
+
+    name = "sms"
+
+    def __init__(self, url: str, api_key: str = "", sender: str = "", **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.url = url
+        self.sender = sender
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+    async def send(self, message: OutboundMessage) -> Optional[str]:
+        if not message.recipient:
+            raise DeliveryError("participant has no phone number (external_id)", retryable=False)
+        response = await self.post(
+            self.url,
+            json={"to": message.recipient, "from": self.sender, "text": message.text or ""},
+            headers={**self.headers, "Idempotency-Key": message.id},
+        )
+        return response_field(response, "id")
+
+
+class FacebookAdapter(HttpChannelAdapter):
+    """Facebook Messenger Send API; the recipient is the page-scoped id (external_id)."""
+
+    name = "facebook"
+
+    def __init__(self, page_token: str, url: str = "https://graph.facebook.com/v19.0/me/messages", **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.url = url
+        self.page_token = page_token
+
+    async def send(self, message: OutboundMessage) -> Optional[str]:
+        if not message.recipient:
+            raise DeliveryError("participant has no page-scoped id (external_id)", retryable=False)
+        response = await self.post(
+            self.url,
+            params={"access_token": self.page_token},
+            json={
+                "recipient": {"id": message.recipient},
+                "message": {"text": message.text or ""},
+                "messaging_type": "UPDATE",
+            },
+        )
+        return response_field(response, "message_id")
+
+
+class WebhookAdapter(HttpChannelAdapter):
+    """
+    POST each message as JSON to a URL. With a secret, the body is signed with HMAC-SHA256
+    in the X-Dash-Signature header.
+    """
+
+    name = "webhook"
+
+    def __init__(self, url: str, secret: str = "", **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.url = url
+        self.secret = secret.encode()
+
+    async def send(self, message: OutboundMessage) -> Optional[str]:
+        body = json.dumps(
+            {
+                "id": message.id,
+                "message_id": message.message_id,
+                "participant_id": message.participant_id,
+                "recipient": message.recipient,
+                "text": message.text or "",
+            }
+        ).encode()
+        headers = {"Content-Type": "application/json", "Idempotency-Key": message.id}
+        if self.secret:
+            headers["X-Dash-Signature"] = "sha256=" + hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+        response = await self.post(self.url, content=body, headers=headers)
+        return response_field(response, "id")
@@ -0,0 +1,107 @@
+"""Channel adapter interface."""
+import asyncio
+from typing import NamedTuple, Optional
+
+import httpx
+
+
+class OutboundMessage(NamedTuple):
+    """One claimed outbox row, as handed to an adapter."""
+
+    id: str  # outbox row id (also sent as the idempotency key)
+    message_id: str
+    participant_id: str
+    channel: str
+    recipient: Optional[str]
+    text: Optional[str]
+    attempts: int
+
+
+class DeliveryResult(NamedTuple):
+    outbox_id: str
+    provider_message_id: Optional[str] = None
+    error: Optional[str] = None
+    retryable: bool = True
+
+
+class DeliveryError(Exception):
+    """A send failed; ``retryable`` False means retrying cannot help (e.g. invalid recipient)."""
+
+    def __init__(self, message: str, retryable: bool = True) -> None:
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class ChannelAdapter:
+    """
+    Delivers messages for one channel. Subclasses implement send(); deliver() bounds how many
+    sends run at once (``concurrency``) and turns failures into DeliveryResults.
+    """
+
+    name = ""
+
+    def __init__(self, concurrency: int = 10) -> None:
+        self.concurrency = max(1, concurrency)
+        self._slots = asyncio.Semaphore(self.concurrency)
+
+    async def send(self, message: OutboundMessage) -> Optional[str]:
+        """Send one message; return the provider's message id, or raise DeliveryError."""
+        raise NotImplementedError
+
+    async def deliver(self, message: OutboundMessage) -> DeliveryResult:
+        async with self._slots:
+            try:
+                provider_id = await self.send(message)
+            except DeliveryError as exc:
+                return DeliveryResult(message.id, error=str(exc) or "delivery failed", retryable=exc.retryable)
+            except Exception as exc:
+                return DeliveryResult(message.id, error=str(exc) or exc.__class__.__name__)
+        return DeliveryResult(message.id, provider_message_id=provider_id)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class HttpChannelAdapter(ChannelAdapter):
+    """Adapter talking to an HTTP API through one pooled AsyncClient (keep-alive, at most ``concurrency`` connections)."""
+
+    def __init__(
+        self,
+        concurrency: int = 10,
+        timeout: float = 10.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        super().__init__(concurrency)
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            transport=transport,
+        )
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """
+        POST and classify the outcome: network errors, timeouts, 429 and 5xx are retryable,
+        any other non-2xx response is permanent.
+        """
+        try:
+            response = await self.client.post(url, **kwargs)
+        except httpx.HTTPError as exc:
+            raise DeliveryError(f"{exc.__class__.__name__}: {exc}")
+        if response.is_success:
+            return response
+        retryable = response.status_code == 429 or response.status_code >= 500
+        raise DeliveryError(f"HTTP {response.status_code}: {response.text[:200]}", retryable=retryable)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+def response_field(response: httpx.Response, *path: str) -> Optional[str]:
+    """A (nested) field of a JSON response body as a string, or None."""
+    try:
+        value = response.json()
+        for key in path:
+            value = value[key]
+    except (ValueError, KeyError, TypeError):
+        return None
+    return None if value is None else str(value)
@@ -0,0 +1,147 @@
+"""
+Command-line tools.
+
+    python -m app.cli import-participants PROJECT FILE [--format csv|ndjson] [--activate iselect]
+    python -m app.cli simulate PROJECT --participants 100000 --days 30 [--answers answers.json]
+    python -m app.cli impact PROJECT PROPOSAL [--workers 4]
+
+PROJECT is a project id or name; FILE is a path or - for stdin. The answers file maps poll
+template names to scripts: {"Poll_1": {"answers": {"Yes": 0.7, "No": 0.3},
+"response_rate": 0.9, "delay_minutes": [1, 120]}}. The impact PROPOSAL names the timing
+and node changes to assess (see app.core.impact.build_plan); nothing is written.
+"""
+import argparse
+import json
+import os
+import sys
+from dataclasses import asdict
+from datetime import timedelta
+
+from app.db import SessionLocal
+from app.models import Project
+from app.core.participant_import import ImportConfigError, detect_format, import_participants, iter_records
+
+
+def _resolve_project(db, ref: str):
+    return (
+        db.query(Project).filter(Project.id == ref).first()
+        or db.query(Project).filter(Project.name == ref).first()
+    )
+
+
+def cmd_import_participants(args: argparse.Namespace) -> int:
+    db = SessionLocal()
+    try:
+        project = _resolve_project(db, args.project)
+        if project is None:
+            print(f"Project not found: {args.project}", file=sys.stderr)
+            return 2
+        fmt = detect_format(None if args.file == "-" else args.file, args.format)
+        stream = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8-sig", newline="")
+        try:
+            result = import_participants(db, project.id, iter_records(stream, fmt), args.activate, args.batch_size)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+    except ImportConfigError as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
+    finally:
+        db.close()
+    print(json.dumps(asdict(result), indent=2))
+    return 1 if result.error_count else 0
+
+
+def cmd_simulate(args: argparse.Namespace) -> int:
+    from app.core.simulator import AnswerScript, SimulationError, simulate_project
+
+    scripts = {}
+    if args.answers:
+        with open(args.answers, encoding="utf-8") as f:
+            for poll, script in json.load(f).items():
+                scripts[poll] = AnswerScript(
+                    script["answers"],
+                    script.get("response_rate", 1.0),
+                    tuple(script.get("delay_minutes", (1.0, 60.0))),
+                )
+    db = SessionLocal()
+    try:
+        project = _resolve_project(db, args.project)
+        if project is None:
+            print(f"Project not found: {args.project}", file=sys.stderr)
+            return 2
+        report = simulate_project(
+            db,
+            project.id,
+            args.participants,
+            args.days,
+            scripts,
+            enroll_hours=args.enroll_hours,
+            keyword=args.keyword,
+            scratch_url=args.scratch_url,
+            resolution=timedelta(seconds=args.resolution_seconds),
+            seed=args.seed,
+        )
+    except SimulationError as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
+    finally:
+        db.close()
+    print(json.dumps(asdict(report), indent=2, default=str))
+    return 0
+
+
+def cmd_impact(args: argparse.Namespace) -> int:
+    from app.core.impact import ImpactConfigError, analyze_impact
+
+    with open(args.proposal, encoding="utf-8") as f:
+        proposal = json.load(f)
+    db = SessionLocal()
+    try:
+        project = _resolve_project(db, args.project)
+        if project is None:
+            print(f"Project not found: {args.project}", file=sys.stderr)
+            return 2
+        report = analyze_impact(db, project.id, proposal, args.workers, args.batch_size)
+    except ImpactConfigError as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
+    finally:
+        db.close()
+    print(json.dumps(asdict(report), indent=2, default=str))
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import-participants", help="Bulk-import participants from CSV or NDJSON")
+    imp.add_argument("project", help="Project id or name")
+    imp.add_argument("file", help="CSV/NDJSON file, or - for stdin")
+    imp.add_argument("--format", choices=("csv", "ndjson"), help="Default: from the file extension, else csv")
+    imp.add_argument("--activate", help="Activation keyword to apply to created participants (e.g. iselect)")
+    imp.add_argument("--batch-size", type=int, default=1000)
+    imp.set_defaults(func=cmd_import_participants)
+    sim = sub.add_parser("simulate", help="Simulate a protocol in virtual time on a scratch database")
+    sim.add_argument("project", help="Project id or name")
+    sim.add_argument("--participants", type=int, default=1000)
+    sim.add_argument("--days", type=float, default=30)
+    sim.add_argument("--enroll-hours", type=float, default=0, help="Spread enrollment over this many hours")
+    sim.add_argument("--answers", help="JSON answer scripts by poll template name (default: uniform, always, 1-60 min)")
+    sim.add_argument("--keyword", help="Activation keyword (default: the project's first)")
+    sim.add_argument("--scratch-url", help="Scratch database (default: in-memory SQLite)")
+    sim.add_argument("--resolution-seconds", type=float, default=60, help="Event time granularity (0 = exact)")
+    sim.add_argument("--seed", type=int, default=0)
+    sim.set_defaults(func=cmd_simulate)
+    what = sub.add_parser("impact", help="Dry-run proposed timing/condition changes against pending jobs")
+    what.add_argument("project", help="Project id or name")
+    what.add_argument("proposal", help="JSON file of timing and node changes, by name")
+    what.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Evaluation processes (0 = inline)")
+    what.add_argument("--batch-size", type=int, default=5000)
+    what.set_defaults(func=cmd_impact)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,7 +12,46 @@ class Settings(BaseSettings):
 
     # App
     DEBUG: bool = False
-    SCHEDULER_POLL_INTERVAL_SECONDS: int = 1
+    PAGE_SIZE: int = 200  # default page for message/timeline lists and the chat snapshot
+    MAX_PAGE_SIZE: int = 1000
+    SSE_KEEPALIVE_SECONDS: int = 15  # comment line sent on idle conversation event streams
+    SINCE_LOOKBACK_SECONDS: int = 5  # since polling / SSE resume re-read this much before the cursor (late commits)
+    ENGINE_INLINE_CHAIN_DEPTH: int = 10  # zero-delay dependents run inline up to this depth (0 = always schedule)
+    SCHEDULER_POLL_INTERVAL_SECONDS: int = 30  # max idle between scans; wakeups normally come sooner
+    SCHEDULER_BATCH_SIZE: int = 200  # jobs claimed per scheduler tick
+    SCHEDULER_WORKERS: int = 4  # worker threads executing claimed jobs
+    SCHEDULER_LEASE_SECONDS: int = 120  # RUNNING jobs whose lease expires go back to the queue
+    SCHEDULER_REAP_INTERVAL_SECONDS: int = 30
+    SCHEDULER_MAX_ATTEMPTS: int = 5  # then the job is marked FAILED
+    SCHEDULER_RETRY_BASE_SECONDS: int = 5  # backoff: base * 2^(attempt-1), capped
+    SCHEDULER_RETRY_MAX_SECONDS: int = 900
+    # Share of each batch reserved per lane; capacity a lane leaves unused goes to the others in priority order.
+    SCHEDULER_LANE_RESERVED: dict[str, float] = {"interactive": 0.5, "bulk": 0.2}
+
+    # Token-bucket rate limits (0 / absent = unlimited); see app.core.ratelimit
+    RATE_LIMIT_PROJECT_PER_SECOND: float = 0  # jobs executed per second per project
+    RATE_LIMIT_PROJECTS: dict[str, float] = {}  # per-project overrides by project id (JSON in the environment)
+    RATE_LIMIT_CHANNELS: dict[str, float] = {}  # messages sent per second per channel, e.g. {"sms": 20}
+    RATE_LIMIT_BURST_SECONDS: float = 2.0  # bucket capacity = rate * this
+
+    # Outbox dispatcher (external channels; see app.channels)
+    OUTBOX_BATCH_SIZE: int = 100  # outbox rows claimed per channel per tick
+    OUTBOX_POLL_INTERVAL_SECONDS: int = 5  # max idle between claims; commits wake the dispatcher sooner
+    OUTBOX_LEASE_SECONDS: int = 60  # SENDING rows whose lease expires go back to PENDING
+    OUTBOX_MAX_ATTEMPTS: int = 8  # then the row is marked FAILED
+    OUTBOX_RETRY_BASE_SECONDS: int = 5
+    OUTBOX_RETRY_MAX_SECONDS: int = 1800
+    CHANNEL_HTTP_TIMEOUT_SECONDS: float = 10.0
+    SMS_GATEWAY_URL: str = ""  # empty = SMS adapter disabled
+    SMS_API_KEY: str = ""
+    SMS_SENDER: str = ""
+    SMS_CONCURRENCY: int = 10  # in-flight requests per adapter
+    FACEBOOK_PAGE_TOKEN: str = ""  # empty = Facebook adapter disabled
+    FACEBOOK_API_URL: str = "https://graph.facebook.com/v19.0/me/messages"
+    FACEBOOK_CONCURRENCY: int = 10
+    WEBHOOK_URL: str = ""  # empty = webhook adapter disabled
+    WEBHOOK_SECRET: str = ""  # signs webhook bodies (HMAC-SHA256) when set
+    WEBHOOK_CONCURRENCY: int = 20
 
 
 settings = Settings()
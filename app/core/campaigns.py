@@ -0,0 +1,156 @@
+"""
+Campaign fan-out.
+
+A campaign schedules one node (e.g. an announcement broadcast) for every ACTIVE
+participant of a project, optionally narrowed by language and cohort conditions. The jobs are
+created by a single INSERT ... SELECT over participants, so enqueueing costs one
+statement whatever the audience size; the scheduler then drains them through its
+batched claim/execute path like any other due job.
+"""
+import uuid
+from datetime import datetime
+from typing import Optional, Sequence
+
+from sqlalchemy import DateTime, Integer, String, func, insert, literal, literal_column, select, update
+from sqlalchemy.orm import Session
+
+from app.core.clock import utcnow
+from app.core.cohort import CohortCondition, CohortError, cohort_query
+from app.core.graph import get_project_graph
+from app.core.wakeup import record_scheduled
+from app.models import Campaign, Node, Participant, ScheduledJob
+from app.models.scheduled_job import JobLane, JobStatus
+
+_FALLBACK_CHUNK = 5000
+
+
+class CampaignError(ValueError):
+    pass
+
+
+def _sql_uuid(dialect_name: str):
+    """SQL expression producing a fresh uuid string per row, or None if the dialect has none."""
+    if dialect_name == "postgresql":
+        return func.gen_random_uuid().cast(String)
+    if dialect_name == "sqlite":
+        parts = " || '-' || ".join(f"lower(hex(randomblob({n})))" for n in (4, 2, 2, 2, 6))
+        return literal_column(parts, String)
+    return None
+
+
+def audience(
+    db: Session,
+    project_id: str,
+    language: Optional[str] = None,
+    conditions: Sequence[CohortCondition] = (),
+):
+    """SELECT of the participant ids a campaign targets. Raises CampaignError for bad conditions."""
+    if not conditions:
+        query = select(Participant.id).where(
+            Participant.project_id == project_id,
+            Participant.status == "ACTIVE",
+        )
+        if language:
+            query = query.where(Participant.language == language)
+        return query
+    try:
+        return cohort_query(get_project_graph(db, project_id), conditions, "ACTIVE", language)
+    except CohortError as exc:
+        raise CampaignError(str(exc))
+
+
+def create_campaign(
+    db: Session,
+    project_id: str,
+    node_id: str,
+    run_at: Optional[datetime] = None,
+    language: Optional[str] = None,
+    name: Optional[str] = None,
+    conditions: Sequence[CohortCondition] = (),
+) -> Campaign:
+    """
+    Create a campaign and its PENDING jobs (one per targeted participant, due at run_at, default now)
+    in one transaction. Raises CampaignError if the node is not part of the project or a cohort
+    condition is invalid.
+    """
+    node = db.query(Node.id).filter(Node.id == node_id, Node.project_id == project_id).first()
+    if node is None:
+        raise CampaignError("Node not found in this project")
+    targets = audience(db, project_id, language, conditions)
+    now = utcnow()
+    run_at = run_at or now
+    campaign = Campaign(
+        id=str(uuid.uuid4()),
+        project_id=project_id,
+        node_id=node_id,
+        name=name,
+        language=language,
+        run_at=run_at,
+    )
+    db.add(campaign)
+    db.flush()
+
+    constants = {
+        "project_id": literal(project_id, String),
+        "node_id": literal(node_id, String),
+        "run_at": literal(run_at, DateTime),
+        "status": literal(JobStatus.PENDING.value, String),
+        "lane": literal(JobLane.BULK.value, String),
+        "attempts": literal(0, Integer),
+        "campaign_id": literal(campaign.id, String),
+        "created_at": literal(now, DateTime),
+    }
+    uuid_expr = _sql_uuid(db.get_bind().dialect.name)
+    if uuid_expr is not None:
+        subquery = targets.subquery()
+        rows = select(uuid_expr, subquery.c.id, *constants.values())
+        result = db.execute(
+            insert(ScheduledJob).from_select(["id", "participant_id", *constants.keys()], rows)
+        )
+        count = result.rowcount
+    else:
+        count = 0
+        values = {
+            "project_id": project_id,
+            "node_id": node_id,
+            "run_at": run_at,
+            "status": JobStatus.PENDING.value,
+            "lane": JobLane.BULK.value,
+            "attempts": 0,
+            "campaign_id": campaign.id,
+            "created_at": now,
+        }
+        for chunk in db.execute(targets).scalars().partitions(_FALLBACK_CHUNK):
+            db.execute(
+                insert(ScheduledJob),
+                [{"id": str(uuid.uuid4()), "participant_id": pid, **values} for pid in chunk],
+            )
+            count += len(chunk)
+    campaign.job_count = count
+    if count:
+        record_scheduled(db, run_at)
+    db.commit()
+    return campaign
+
+
+def campaign_progress(db: Session, campaign_id: str) -> dict[str, int]:
+    """Job counts by status for one campaign."""
+    rows = (
+        db.query(ScheduledJob.status, func.count())
+        .filter(ScheduledJob.campaign_id == campaign_id)
+        .group_by(ScheduledJob.status)
+        .all()
+    )
+    return {status: count for status, count in rows}
+
+
+def cancel_campaign(db: Session, campaign_id: str) -> int:
+    """Cancel a campaign's jobs that have not run yet. Returns how many were cancelled."""
+    cancelled = db.execute(
+        update(ScheduledJob)
+        .where(ScheduledJob.campaign_id == campaign_id, ScheduledJob.status == JobStatus.PENDING.value)
+        .values(status=JobStatus.CANCELLED.value)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return cancelled
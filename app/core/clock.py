@@ -0,0 +1,65 @@
+"""
+The engine's clock.
+
+Everything that stamps or compares times in the engine, scheduler and models reads
+``utcnow()`` from here instead of ``datetime.utcnow()``, so a simulation can swap
+in a VirtualClock and run days of protocol without waiting for them (see
+app.core.simulator). The wall clock is the default; the scheduler's sleep and the
+rate limiters' monotonic buckets are unaffected.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator
+
+
+class Clock:
+    """Naive-UTC wall clock."""
+
+    def now(self) -> datetime:
+        return datetime.utcnow()
+
+
+class VirtualClock(Clock):
+    """A clock that only moves when told to."""
+
+    def __init__(self, start: datetime) -> None:
+        self._now = start
+
+    def now(self) -> datetime:
+        return self._now
+
+    def set(self, when: datetime) -> None:
+        if when < self._now:
+            raise ValueError("a virtual clock never goes backwards")
+        self._now = when
+
+    def advance(self, delta: timedelta) -> datetime:
+        self.set(self._now + delta)
+        return self._now
+
+
+_clock: Clock = Clock()
+
+
+def utcnow() -> datetime:
+    return _clock.now()
+
+
+def get_clock() -> Clock:
+    return _clock
+
+
+def set_clock(clock: Clock) -> Clock:
+    """Install ``clock`` process-wide; returns the previous one."""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+@contextmanager
+def use_clock(clock: Clock) -> Iterator[Clock]:
+    previous = set_clock(clock)
+    try:
+        yield clock
+    finally:
+        set_clock(previous)
@@ -0,0 +1,127 @@
+"""
+Cohort selection over participant variables.
+
+A cohort is a set of conditions in the NodeCondition vocabulary (variable, operation,
+expected answer) over a project's participants. The conditions are compiled into a
+single SQL query, one correlated EXISTS per condition against participant_variables
+(served by its unique (participant_id, variable_id) index), so targeting and analytics
+run as set operations in the database. Results are returned in keyset pages of
+participant ids ordered by id.
+"""
+from dataclasses import dataclass
+from typing import Iterator, Optional, Sequence
+
+from sqlalchemy import and_, exists, func, select
+from sqlalchemy.orm import Session, aliased
+
+from app.core.conditions import OPERATIONS, condition_clause
+from app.core.graph import ProjectGraph, get_project_graph
+from app.models import Participant, ParticipantVariable
+
+
+class CohortError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class CohortCondition:
+    variable: str  # variable name or id
+    operation: str = "equal"
+    value: Optional[str] = None  # expected answer; comma-separated for in / not_in
+
+
+@dataclass(frozen=True)
+class CohortPage:
+    participant_ids: list[str]
+    next_cursor: Optional[str]  # last id of this page when more may follow
+
+
+def cohort_filter(graph: ProjectGraph, conditions: Sequence[CohortCondition]) -> list:
+    """WHERE clauses on Participant for the conditions (all must hold). Raises CohortError."""
+    by_name = {v.name: v for v in graph.variables.values()}
+    clauses = []
+    for cond in conditions:
+        variable = graph.variables.get(cond.variable) or by_name.get(cond.variable)
+        if variable is None:
+            raise CohortError(f"Unknown variable {cond.variable!r}")
+        operation = (cond.operation or "equal").strip().lower()
+        if operation not in OPERATIONS:
+            raise CohortError(f"Unknown operation {cond.operation!r} (expected one of {', '.join(OPERATIONS)})")
+        pv = aliased(ParticipantVariable)
+        clauses.append(
+            exists().where(
+                pv.participant_id == Participant.id,
+                pv.variable_id == variable.id,
+                condition_clause(operation, cond.value, variable.is_int, pv.value_int, pv.value_text),
+            )
+        )
+    return clauses
+
+
+def cohort_query(
+    graph: ProjectGraph,
+    conditions: Sequence[CohortCondition] = (),
+    status: Optional[str] = "ACTIVE",
+    language: Optional[str] = None,
+):
+    """SELECT participants.id for the cohort (status None = any status)."""
+    query = select(Participant.id).where(Participant.project_id == graph.project_id)
+    if status:
+        query = query.where(Participant.status == status)
+    if language:
+        query = query.where(Participant.language == language)
+    return query.where(and_(*cohort_filter(graph, conditions)))
+
+
+def _graph(db: Session, project_id: str) -> ProjectGraph:
+    graph = get_project_graph(db, project_id)
+    if graph is None:
+        raise CohortError("Project not found")
+    return graph
+
+
+def select_cohort(
+    db: Session,
+    project_id: str,
+    conditions: Sequence[CohortCondition] = (),
+    status: Optional[str] = "ACTIVE",
+    language: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = 1000,
+) -> CohortPage:
+    """One page of cohort participant ids (ascending), starting after the ``after`` cursor."""
+    query = cohort_query(_graph(db, project_id), conditions, status, language)
+    if after:
+        query = query.where(Participant.id > after)
+    ids = list(db.execute(query.order_by(Participant.id).limit(limit)).scalars())
+    return CohortPage(ids, ids[-1] if len(ids) == limit else None)
+
+
+def iter_cohort_pages(
+    db: Session,
+    project_id: str,
+    conditions: Sequence[CohortCondition] = (),
+    status: Optional[str] = "ACTIVE",
+    language: Optional[str] = None,
+    page_size: int = 1000,
+) -> Iterator[list[str]]:
+    """Every cohort participant id, page by page (each page is one indexed range query)."""
+    after = None
+    while True:
+        page = select_cohort(db, project_id, conditions, status, language, after, page_size)
+        if page.participant_ids:
+            yield page.participant_ids
+        if page.next_cursor is None:
+            return
+        after = page.next_cursor
+
+
+def count_cohort(
+    db: Session,
+    project_id: str,
+    conditions: Sequence[CohortCondition] = (),
+    status: Optional[str] = "ACTIVE",
+    language: Optional[str] = None,
+) -> int:
+    query = cohort_query(_graph(db, project_id), conditions, status, language)
+    return db.execute(select(func.count()).select_from(query.subquery())).scalar_one()
@@ -0,0 +1,94 @@
+"""
+Compiled protocol configuration: the immutable value types app.core.graph builds from a
+project's rows and the protocol core (app.core.protocol) decides with. Nothing here
+imports the models or the database, so the core can be used without either.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Mapping, Optional
+
+
+TIMING_FIELDS = ("days", "hours", "minutes", "seconds", "spread_seconds")  # editable TimingElement columns
+
+
+def timedelta_from_timing(timing) -> timedelta:
+    """Convert TimingElement to timedelta."""
+    if not timing:
+        return timedelta(0)
+    return timedelta(
+        days=timing.days or 0,
+        hours=timing.hours or 0,
+        minutes=timing.minutes or 0,
+        seconds=timing.seconds or 0,
+    )
+
+
+def spread_from_timing(timing) -> timedelta:
+    """Window a TimingElement spreads run times over (zero = no spreading)."""
+    if not timing:
+        return timedelta(0)
+    return timedelta(seconds=max(timing.spread_seconds or 0, 0))
+
+
+@dataclass(frozen=True)
+class CompiledVariable:
+    id: str
+    name: str
+    type: str
+
+    @property
+    def is_int(self) -> bool:
+        return "int" in (self.type or "").lower()
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    id: str
+    type: str
+    name: str
+    text_en: Optional[str]
+    text_es: Optional[str]
+    variable_id: Optional[str]
+    choices_en: tuple
+    choices_es: tuple
+
+
+@dataclass(frozen=True)
+class CompiledNode:
+    id: str
+    project_id: str
+    name: str
+    message_template_id: str
+    activation_type: str
+    activation_source_node_id: Optional[str]
+    activation_poll_id: Optional[str]
+    is_terminal: bool
+    delay: timedelta
+    spread: timedelta  # window its timing spreads run times over, by participant (see app.core.spread)
+    conditions: tuple  # compiled Condition predicates
+    variable_ids: frozenset  # variables the conditions read
+
+
+@dataclass(frozen=True)
+class CompiledKeyword:
+    id: str
+    keyword_text: str
+    action_type: str
+    referenced_node_id: Optional[str]
+
+
+@dataclass(frozen=True)
+class ProjectGraph:
+    """Read-only view of one project's protocol, keyed for the engine hot path."""
+
+    project_id: str
+    version: str
+    nodes: Mapping[str, CompiledNode]
+    templates: Mapping[str, CompiledTemplate]
+    variables: Mapping[str, CompiledVariable]
+    keywords: Mapping[str, CompiledKeyword]  # by keyword_text
+    after_node: Mapping[str, tuple]  # source node id -> dependents (AFTER_NODE)
+    after_poll: Mapping[str, tuple]  # poll template id -> dependents (AFTER_POLL)
+    start_nodes: tuple  # START_DATE nodes
+    start_date_variable_id: Optional[str]
+    condition_variable_ids: frozenset  # every variable read by any node condition
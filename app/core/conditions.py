@@ -0,0 +1,202 @@
+"""
+Node condition predicates.
+
+Each NodeCondition is compiled once, when its project graph is built, into a
+Condition whose test already knows how to read and compare the participant's
+value. The participant variables a node (or a whole set of dependents) needs are
+then fetched with a single query and evaluated in memory.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, Mapping, NamedTuple, Optional
+
+from sqlalchemy import and_, false, func, true
+from sqlalchemy.orm import Session
+
+OPERATIONS = ("equal", "gt", "gte", "lt", "lte", "in", "not_in")
+
+
+class VariableValue(NamedTuple):
+    """A participant's value for one variable (same fields as ParticipantVariable)."""
+
+    value_text: Optional[str] = None
+    value_int: Optional[int] = None
+    value_datetime: Optional[datetime] = None
+
+
+@dataclass(frozen=True)
+class Condition:
+    id: str
+    variable_id: Optional[str]
+    operation: str
+    expected_answer: Optional[str]
+    test: Callable[[VariableValue], bool]
+
+    def matches(self, values: Mapping[str, VariableValue]) -> bool:
+        """True if the participant's value satisfies this condition (missing value = False)."""
+        value = values.get(self.variable_id)
+        if value is None:
+            return False
+        return self.test(value)
+
+
+def parse_int(raw) -> Optional[int]:
+    try:
+        return int(str(raw).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def split_choices(expected: Optional[str]) -> tuple[str, ...]:
+    """Comma-separated expected answer for in/not_in, normalized like text answers."""
+    return tuple(part.strip().lower() for part in (expected or "").split(",") if part.strip())
+
+
+_INT_COMPARISONS: dict[str, Callable[[int, int], bool]] = {
+    "equal": lambda val, exp: val == exp,
+    "gt": lambda val, exp: val > exp,
+    "gte": lambda val, exp: val >= exp,
+    "lt": lambda val, exp: val < exp,
+    "lte": lambda val, exp: val <= exp,
+}
+
+
+def _never(value: VariableValue) -> bool:
+    return False
+
+
+def _int_test(operation: str, expected: Optional[str]) -> Callable[[VariableValue], bool]:
+    if operation in ("in", "not_in"):
+        options = frozenset(n for n in (parse_int(p) for p in split_choices(expected)) if n is not None)
+        if operation == "in":
+            return lambda v: v.value_int is not None and v.value_int in options
+        return lambda v: v.value_int is not None and v.value_int not in options
+    exp_val = parse_int(expected)
+    if exp_val is None:
+        # A numeric condition without a numeric expected answer can never be satisfied.
+        return _never
+    compare = _INT_COMPARISONS.get(operation, _INT_COMPARISONS["equal"])
+    return lambda v: v.value_int is not None and compare(v.value_int, exp_val)
+
+
+def _text_test(operation: str, expected: Optional[str]) -> Callable[[VariableValue], bool]:
+    if operation in ("in", "not_in"):
+        options = frozenset(split_choices(expected))
+        if operation == "in":
+            return lambda v: (v.value_text or "").strip().lower() in options
+        return lambda v: (v.value_text or "").strip().lower() not in options
+    # Text answers (e.g. yes/no) only support equality; other operations compare as equal.
+    exp_text = (expected or "").strip().lower()
+    return lambda v: (v.value_text or "").strip().lower() == exp_text
+
+
+def compile_condition(cond, variable=None) -> Condition:
+    """
+    Compile a NodeCondition (or anything with the same fields) into a Condition.
+    ``variable`` decides integer vs text comparison; without it the value is compared as text.
+    """
+    operation = (cond.operation or "equal").strip().lower()
+    is_int = variable is not None and "int" in (variable.type or "").lower()
+    test = _int_test(operation, cond.expected_answer) if is_int else _text_test(operation, cond.expected_answer)
+    return Condition(
+        id=cond.id,
+        variable_id=cond.variable_id,
+        operation=operation,
+        expected_answer=cond.expected_answer,
+        test=test,
+    )
+
+
+def condition_clause(operation: str, expected: Optional[str], is_int: bool, value_int, value_text):
+    """
+    SQL counterpart of compile_condition's test over a ParticipantVariable row's value_int /
+    value_text columns (same vocabulary and edge cases), for set-based evaluation.
+    """
+    operation = (operation or "equal").strip().lower()
+    if is_int:
+        if operation in ("in", "not_in"):
+            options = [n for n in (parse_int(p) for p in split_choices(expected)) if n is not None]
+            if operation == "in":
+                return value_int.in_(options) if options else false()
+            return and_(value_int.isnot(None), value_int.not_in(options)) if options else value_int.isnot(None)
+        exp_val = parse_int(expected)
+        if exp_val is None:
+            return false()
+        compare = {
+            "gt": value_int > exp_val,
+            "gte": value_int >= exp_val,
+            "lt": value_int < exp_val,
+            "lte": value_int <= exp_val,
+        }
+        return compare.get(operation, value_int == exp_val)
+    normalized = func.lower(func.trim(func.coalesce(value_text, "")))
+    if operation in ("in", "not_in"):
+        options = list(split_choices(expected))
+        if operation == "in":
+            return normalized.in_(options) if options else false()
+        return normalized.not_in(options) if options else true()
+    return normalized == (expected or "").strip().lower()
+
+
+def conditions_match(conditions: Iterable[Condition], values: Mapping[str, VariableValue]) -> bool:
+    """All conditions must hold; an empty condition list always matches."""
+    return all(c.matches(values) for c in conditions)
+
+
+def load_variable_values(
+    db: Session,
+    participant_id: str,
+    variable_ids: Iterable[str],
+) -> dict[str, VariableValue]:
+    """Fetch a participant's values for the given variables in one query."""
+    from app.models import ParticipantVariable  # here, so the predicates import without a database
+    variable_ids = [v for v in set(variable_ids) if v]
+    if not variable_ids:
+        return {}
+    rows = (
+        db.query(
+            ParticipantVariable.variable_id,
+            ParticipantVariable.value_text,
+            ParticipantVariable.value_int,
+            ParticipantVariable.value_datetime,
+        )
+        .filter(
+            ParticipantVariable.participant_id == participant_id,
+            ParticipantVariable.variable_id.in_(variable_ids),
+        )
+        .all()
+    )
+    return {r.variable_id: VariableValue(r.value_text, r.value_int, r.value_datetime) for r in rows}
+
+
+def load_variable_values_many(
+    db: Session,
+    participant_ids: Iterable[str],
+    variable_ids: Iterable[str],
+) -> dict[str, dict[str, VariableValue]]:
+    """Fetch values for many participants at once: participant_id -> variable_id -> value."""
+    from app.models import ParticipantVariable
+    participant_ids = list(set(participant_ids))
+    variable_ids = [v for v in set(variable_ids) if v]
+    if not participant_ids or not variable_ids:
+        return {}
+    rows = (
+        db.query(
+            ParticipantVariable.participant_id,
+            ParticipantVariable.variable_id,
+            ParticipantVariable.value_text,
+            ParticipantVariable.value_int,
+            ParticipantVariable.value_datetime,
+        )
+        .filter(
+            ParticipantVariable.participant_id.in_(participant_ids),
+            ParticipantVariable.variable_id.in_(variable_ids),
+        )
+        .all()
+    )
+    values: dict[str, dict[str, VariableValue]] = {}
+    for r in rows:
+        values.setdefault(r.participant_id, {})[r.variable_id] = VariableValue(
+            r.value_text, r.value_int, r.value_datetime
+        )
+    return values
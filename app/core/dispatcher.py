@@ -0,0 +1,157 @@
+"""
+Outbox dispatcher: drains the outbox to channel adapters.
+
+Each configured channel gets its own loop on one asyncio event loop (in a background
+thread), so a slow provider only delays its own channel. A loop claims a batch of rows
+in a short transaction, sends them concurrently through the adapter (bounded by its
+concurrency limit, over pooled HTTP connections) with no database transaction open,
+then records the outcomes in a second short transaction. Database calls run in worker
+threads so they never block sends in flight. Channels with a rate limit claim only as
+many rows as their token bucket grants and wait for refills without holding any claim.
+"""
+import asyncio
+import threading
+import uuid
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.channels import ChannelAdapter, build_adapters
+from app.channels.base import DeliveryResult, OutboundMessage
+from app.config import settings
+from app.db import SessionLocal
+from app.core.outbox import claim_outbox, complete_outbox, ready_event, reap_outbox
+from app.core.ratelimit import RateLimiter, channel_rate
+from app.core.scheduler import WORKER_ID
+
+
+class Dispatcher:
+    """Delivers outbox rows through ``adapters`` (channel name -> adapter)."""
+
+    def __init__(
+        self,
+        adapters: dict[str, ChannelAdapter],
+        session_factory: Callable[[], Session] = SessionLocal,
+        batch_size: Optional[int] = None,
+        limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        self.adapters = adapters
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.limiter = limiter or RateLimiter(channel_rate)
+
+    def _claim(self, channel: str, limit: int, lease_token: str) -> list[OutboundMessage]:
+        db = self.session_factory()
+        try:
+            claimed = claim_outbox(db, channel, limit, lease_token)
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _complete(self, messages: list[OutboundMessage], results: list[DeliveryResult], lease_token: str) -> None:
+        db = self.session_factory()
+        try:
+            complete_outbox(db, messages, results, lease_token)
+        finally:
+            db.close()
+
+    def _reap(self) -> int:
+        db = self.session_factory()
+        try:
+            return reap_outbox(db)
+        finally:
+            db.close()
+
+    def claim_limit(self, channel: str) -> int:
+        """Rows the next batch may claim: the batch size, capped by the channel's available tokens."""
+        allowed = self.limiter.available(channel)
+        return self.batch_size if allowed is None else min(self.batch_size, allowed)
+
+    async def dispatch_once(self, channel: str, limit: Optional[int] = None) -> int:
+        """Claim, send and record one batch for channel. Returns the number of rows claimed."""
+        adapter = self.adapters[channel]
+        limit = self.claim_limit(channel) if limit is None else limit
+        if limit <= 0:
+            return 0
+        lease_token = f"{WORKER_ID}/{uuid.uuid4().hex[:12]}"
+        claimed = await asyncio.to_thread(self._claim, channel, limit, lease_token)
+        self.limiter.take(channel, len(claimed))
+        if not claimed:
+            return 0
+        results = await asyncio.gather(*(adapter.deliver(message) for message in claimed))
+        await asyncio.to_thread(self._complete, claimed, list(results), lease_token)
+        return len(claimed)
+
+    async def _channel_loop(self, channel: str, stop: threading.Event) -> None:
+        ready = ready_event(channel)
+        idle = max(0.1, settings.OUTBOX_POLL_INTERVAL_SECONDS)
+        while not stop.is_set():
+            limit = self.claim_limit(channel)
+            if limit <= 0:
+                await asyncio.sleep(min(idle, max(0.01, self.limiter.wait_seconds(channel))))
+                continue
+            ready.clear()
+            try:
+                claimed = await self.dispatch_once(channel, limit)
+            except Exception:
+                claimed = 0
+            # A full claim means more is probably waiting: go again (after a refill if throttled).
+            if claimed < limit:
+                await asyncio.to_thread(ready.wait, idle)
+
+    async def run(self, stop: threading.Event) -> None:
+        """Run every channel loop until stop is set, reaping expired leases periodically."""
+
+        async def reaper():
+            while not stop.is_set():
+                try:
+                    await asyncio.to_thread(self._reap)
+                except Exception:
+                    pass
+                await asyncio.to_thread(stop.wait, settings.OUTBOX_LEASE_SECONDS)
+
+        try:
+            await asyncio.gather(reaper(), *(self._channel_loop(channel, stop) for channel in self.adapters))
+        finally:
+            await self.aclose()
+
+    async def aclose(self) -> None:
+        for adapter in self.adapters.values():
+            await adapter.aclose()
+
+
+_thread: Optional[threading.Thread] = None
+_stop: Optional[threading.Event] = None
+_channels: tuple[str, ...] = ()  # channels the running dispatcher serves
+
+
+def start_dispatcher() -> bool:
+    """Start the dispatcher thread if any channel adapter is configured. Returns whether it started."""
+    global _thread, _stop, _channels
+    if _thread is not None:
+        return True
+    adapters = build_adapters()
+    if not adapters:
+        return False
+    stop = threading.Event()
+    _stop, _channels = stop, tuple(adapters)
+    _thread = threading.Thread(
+        target=asyncio.run, args=(Dispatcher(adapters).run(stop),), daemon=True, name="outbox-dispatcher"
+    )
+    _thread.start()
+    return True
+
+
+def stop_dispatcher(timeout: float = 5.0) -> None:
+    """Stop the dispatcher; in-flight sends finish and are recorded before the thread exits."""
+    global _thread, _stop, _channels
+    if _thread is None:
+        return
+    _stop.set()
+    for channel in _channels:
+        ready_event(channel).set()
+    _thread.join(timeout)
+    _thread = None
+    _stop = None
+    _channels = ()
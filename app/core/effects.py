@@ -0,0 +1,253 @@
+"""
+Persistence adapter for the protocol core.
+
+load_snapshots() reads what app.core.protocol.decide() needs for a set of participants
+in a fixed number of queries; apply_effects() writes the Effects of any number of
+decisions with one bulk statement per table (messages, outbox, AGV logs, conversation
+state, variables, jobs), without committing. Effects are applied as if one after the
+other: later variable writes and statuses win, and a cancel also drops the jobs the
+same participant's earlier effects in the batch scheduled.
+"""
+import uuid
+from datetime import datetime
+from typing import Iterable, Mapping, Optional, Sequence
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.core.clock import utcnow
+from app.core.conditions import load_variable_values_many
+from app.core.events import MESSAGE, TIMELINE, message_data, record_event, timeline_data
+from app.core.graph import ProjectGraph, get_project_graph
+from app.core.outbox import is_external, outbox_row, record_outbox
+from app.core.protocol import Effects, OutboundMessage, ParticipantSnapshot
+from app.core.state import apply_state, merge_state_rows, state_row
+from app.core.wakeup import record_scheduled
+from app.models import (
+    NodeExecutionLog,
+    OutboxMessage,
+    Participant,
+    ParticipantMessage,
+    ParticipantState,
+    ParticipantVariable,
+    ScheduledJob,
+)
+from app.models.scheduled_job import JobLane, JobStatus
+
+_VALUE_COLUMNS = ("value_text", "value_int", "value_datetime")
+
+
+def load_snapshots(
+    db: Session,
+    participant_ids: Iterable[str],
+    awaiting: bool = False,
+) -> tuple[dict[str, ParticipantSnapshot], dict[str, Optional[ProjectGraph]]]:
+    """
+    Snapshots of the given participants (missing ids are left out) and the graphs of their
+    projects. Snapshots carry every variable the projects' node conditions read; with
+    ``awaiting`` they also carry the poll each participant was last sent (one more query).
+    """
+    rows = (
+        db.query(
+            Participant.id,
+            Participant.project_id,
+            Participant.status,
+            Participant.language,
+            Participant.channel,
+            Participant.external_id,
+        )
+        .filter(Participant.id.in_(set(participant_ids)))
+        .all()
+    )
+    graphs = {project_id: get_project_graph(db, project_id) for project_id in {r.project_id for r in rows}}
+    variable_ids = set().union(*(g.condition_variable_ids for g in graphs.values() if g))
+    values = load_variable_values_many(db, [r.id for r in rows], variable_ids)
+    polls = {}
+    if awaiting and rows:
+        polls = dict(
+            db.query(ParticipantState.participant_id, ParticipantState.awaiting_poll_template_id)
+            .filter(ParticipantState.participant_id.in_([r.id for r in rows]))
+            .all()
+        )
+    snapshots = {
+        r.id: ParticipantSnapshot(
+            id=r.id,
+            project_id=r.project_id,
+            status=r.status,
+            language=r.language,
+            channel=r.channel,
+            external_id=r.external_id,
+            values=values.get(r.id, {}),
+            awaiting_poll_template_id=polls.get(r.id),
+        )
+        for r in rows
+    }
+    return snapshots, graphs
+
+
+def message_row(participant_id: str, message: OutboundMessage) -> dict:
+    """Column values for one OUTBOUND message."""
+    return {
+        "id": str(uuid.uuid4()),
+        "participant_id": participant_id,
+        "direction": "OUTBOUND",
+        "message_template_id": message.template_id,
+        "text": message.text,
+        "created_at": utcnow(),
+    }
+
+
+def agv_row(participant_id: str, node_id: str, executed_at: datetime) -> dict:
+    """Column values for one AGV (node execution log) entry."""
+    return {
+        "id": str(uuid.uuid4()),
+        "participant_id": participant_id,
+        "node_id": node_id,
+        "executed_at": executed_at,
+    }
+
+
+def job_row(
+    participant_id: str,
+    node_id: str,
+    run_at: datetime,
+    project_id: Optional[str] = None,
+    lane: str = JobLane.BULK.value,
+) -> dict:
+    """Column values for one PENDING scheduled job."""
+    return {
+        "id": str(uuid.uuid4()),
+        "participant_id": participant_id,
+        "project_id": project_id,
+        "node_id": node_id,
+        "run_at": run_at,
+        "status": JobStatus.PENDING.value,
+        "lane": lane,
+    }
+
+
+def apply_effects(
+    db: Session,
+    participants: Mapping[str, ParticipantSnapshot],
+    effects: Sequence[Effects],
+) -> list[list[str]]:
+    """
+    Write ``effects`` (in order) with bulk statements and record their events; no commit.
+    ``participants`` must hold the snapshot each Effects was decided from (for its channel).
+    Returns the ids of the messages each Effects sent.
+    """
+    messages: list[dict] = []
+    outbox: list[dict] = []
+    logs: list[dict] = []
+    states: list[dict] = []
+    jobs: list[dict] = []
+    variables: dict[tuple[str, str], dict] = {}
+    statuses: dict[str, str] = {}
+    cancelled: set[str] = set()
+    message_ids: list[list[str]] = []
+    for item in effects:
+        pid = item.participant_id
+        participant = participants[pid]
+        sent = []
+        for message in item.messages:
+            row = message_row(pid, message)
+            log = agv_row(pid, message.node_id, utcnow())
+            sent.append(row)
+            logs.append(log)
+            states.append(state_row(
+                pid,
+                node_id=message.node_id,
+                poll_template_id=message.template_id if message.is_poll else None,
+                outbound_at=row["created_at"],
+                outbound=1,
+            ))
+            record_event(db, pid, MESSAGE, message_data(row))
+            record_event(db, pid, TIMELINE, timeline_data(
+                log["id"], message.node_id, message.node_name, message.template_name, log["executed_at"]
+            ))
+        messages.extend(sent)
+        if sent and is_external(participant.channel):
+            outbox.extend(outbox_row(row, participant.channel, participant.external_id) for row in sent)
+        for write in item.variables:
+            variables[(pid, write.variable_id)] = {
+                "id": str(uuid.uuid4()),
+                "participant_id": pid,
+                "variable_id": write.variable_id,
+                **write.value._asdict(),
+            }
+        jobs.extend(job_row(pid, run.node_id, run.run_at, item.project_id, run.lane) for run in item.jobs)
+        if item.cancel_pending:
+            # Jobs this batch scheduled for the participant so far are dropped rather than written.
+            jobs = [row for row in jobs if row["participant_id"] != pid]
+            cancelled.add(pid)
+        if item.status:
+            statuses[pid] = item.status
+        message_ids.append([row["id"] for row in sent])
+
+    for status in set(statuses.values()):
+        db.execute(
+            update(Participant)
+            .where(Participant.id.in_([pid for pid, s in statuses.items() if s == status]))
+            .values(status=status)
+        )
+    if variables:
+        upsert_variables(db, list(variables.values()))
+    if cancelled:
+        db.execute(
+            update(ScheduledJob)
+            .where(
+                ScheduledJob.participant_id.in_(cancelled),
+                ScheduledJob.status == JobStatus.PENDING.value,
+            )
+            .values(status=JobStatus.CANCELLED.value)
+        )
+    if messages:
+        db.execute(insert(ParticipantMessage), messages)
+        if outbox:
+            db.execute(insert(OutboxMessage), outbox)
+            record_outbox(db, {row["channel"] for row in outbox})
+        db.execute(insert(NodeExecutionLog), logs)
+        apply_state(db, merge_state_rows(states))
+    if jobs:
+        db.execute(insert(ScheduledJob), jobs)
+        record_scheduled(db, min(row["run_at"] for row in jobs))
+    return message_ids
+
+
+def upsert_variables(db: Session, rows: list[dict]) -> None:
+    """Insert participant values, replacing existing ones (one statement on PostgreSQL and SQLite)."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        _upsert_variables_orm(db, rows)
+        return
+    stmt = dialect_insert(ParticipantVariable.__table__)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["participant_id", "variable_id"],
+            set_={name: stmt.excluded[name] for name in _VALUE_COLUMNS},
+        ),
+        rows,
+    )
+
+
+def _upsert_variables_orm(db: Session, rows: list[dict]) -> None:
+    """Read-modify-write fallback for dialects without INSERT ... ON CONFLICT."""
+    for row in rows:
+        existing = (
+            db.query(ParticipantVariable)
+            .filter(
+                ParticipantVariable.participant_id == row["participant_id"],
+                ParticipantVariable.variable_id == row["variable_id"],
+            )
+            .first()
+        )
+        if existing is None:
+            db.add(ParticipantVariable(**row))
+        else:
+            for name in _VALUE_COLUMNS:
+                setattr(existing, name, row[name])
+    db.flush()
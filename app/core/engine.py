@@ -3,211 +3,173 @@ DashMessaging protocol engine.
 
 Executes nodes: send message, log AGV, schedule dependent nodes.
 Handles keywords (iselect, iexit) and poll answers.
+
+What each of these does is decided by the pure core in app.core.protocol; the entry
+points here load participant snapshots, hand them to decide() and write the resulting
+effects with app.core.effects, one commit per call (per batch for execute_nodes_batch).
 """
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime
+from typing import NamedTuple, Optional, Sequence
+import time
 import uuid
 
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.models import (
-    Participant,
-    Node,
-    MessageTemplate,
-    Variable,
-    ParticipantMessage,
-    ParticipantVariable,
-    NodeExecutionLog,
-    ScheduledJob,
-    Keyword,
+from app.core.conditions import VariableValue, conditions_match, load_variable_values
+from app.core.clock import utcnow
+from app.core.effects import apply_effects, job_row, load_snapshots
+from app.core.graph import (
+    CompiledKeyword,
+    CompiledNode,
+    ProjectGraph,
+    get_project_graph,
 )
-from app.models.scheduled_job import JobStatus
-
-
-def _timedelta_from_timing(timing) -> timedelta:
-    """Convert TimingElement to timedelta."""
-    if not timing:
-        return timedelta(0)
-    return timedelta(
-        days=timing.days or 0,
-        hours=timing.hours or 0,
-        minutes=timing.minutes or 0,
-        seconds=timing.seconds or 0,
-    )
-
-
-def _resolve_text(template: MessageTemplate, language: str) -> str:
-    """Get message text in participant language."""
-    if not template:
-        return ""
-    if (language or "").lower() in ("spanish", "es"):
-        return (template.text_es or template.text_en) or ""
-    return (template.text_en or template.text_es) or ""
+from app.core.metrics import node_latency
+from app.core.protocol import (
+    KeywordReceived,
+    PollAnswerReceived,
+    RunNode,
+    advance,
+    decide,
+    due_at as _due_at,
+)
+from app.core.wakeup import record_scheduled
+from app.models import ParticipantMessage, ParticipantVariable, ScheduledJob
+from app.models.scheduled_job import JobLane, JobStatus
 
 
 def _condition_matches(
     db: Session,
     participant_id: str,
-    node: Node,
+    node,
     now: datetime,
 ) -> bool:
     """Evaluate node conditions for this participant. True = should run."""
     if not node.conditions:
         return True
-    for cond in node.conditions:
-        # Get participant's value for cond.variable_id
-        pv = (
-            db.query(ParticipantVariable)
-            .filter(
-                ParticipantVariable.participant_id == participant_id,
-                ParticipantVariable.variable_id == cond.variable_id,
-            )
-            .first()
-        )
-        if pv is None:
-            return False
-        # Compare by variable type
-        var = db.query(Variable).filter(Variable.id == cond.variable_id).first()
-        expected = (cond.expected_answer or "").strip().lower()
-        if var and var.type and "int" in (var.type or "").lower():
-            try:
-                val = pv.value_int
-                if val is None:
-                    return False
-                exp_val = int(expected) if expected and str(expected).strip().isdigit() else None
-                if exp_val is not None:
-                    if cond.operation == "equal":
-                        if val != exp_val:
-                            return False
-                    elif cond.operation == "gt":
-                        if val <= exp_val:
-                            return False
-                    elif cond.operation == "gte":
-                        if val < exp_val:
-                            return False
-                    elif cond.operation == "lt":
-                        if val >= exp_val:
-                            return False
-                    elif cond.operation == "lte":
-                        if val > exp_val:
-                            return False
-                    else:
-                        if val != exp_val:
-                            return False
-                else:
-                    if cond.operation == "lte":
-                        if val > 5:
-                            return False
-                    elif cond.operation == "gt":
-                        if val <= 5:
-                            return False
-                continue
-            except (TypeError, ValueError):
-                return False
-        else:
-            # Text comparison (e.g. yes/no)
-            val = (pv.value_text or "").strip().lower()
-            if cond.operation == "equal":
-                if val != expected:
-                    return False
-            else:
-                if val != expected:
-                    return False
-    return True
-
-
-def _create_outbound_message(
-    db: Session,
-    participant_id: str,
-    template: MessageTemplate,
-    language: str,
-) -> ParticipantMessage:
-    """Create and persist one OUTBOUND message from a template."""
-    text = _resolve_text(template, language)
-    msg = ParticipantMessage(
-        id=str(uuid.uuid4()),
-        participant_id=participant_id,
-        direction="OUTBOUND",
-        message_template_id=template.id,
-        text=text,
-    )
-    db.add(msg)
-    db.flush()
-    return msg
-
-
-def _log_agv(db: Session, participant_id: str, node_id: str) -> None:
-    """Record AGV: node was sent at this time."""
-    log = NodeExecutionLog(
-        id=str(uuid.uuid4()),
-        participant_id=participant_id,
-        node_id=node_id,
-        executed_at=datetime.utcnow(),
-    )
-    db.add(log)
-
-
-def _schedule_node(
+    compiled = node if isinstance(node, CompiledNode) else get_project_graph(db, node.project_id).nodes[node.id]
+    values = load_variable_values(db, participant_id, compiled.variable_ids)
+    return conditions_match(compiled.conditions, values)
+
+
+def execute_node(
     db: Session,
     participant_id: str,
     node_id: str,
-    run_at: datetime,
-) -> ScheduledJob:
-    """Create a PENDING scheduled job."""
-    job = ScheduledJob(
-        id=str(uuid.uuid4()),
-        participant_id=participant_id,
-        node_id=node_id,
-        run_at=run_at,
-        status=JobStatus.PENDING.value,
-    )
-    db.add(job)
-    db.flush()
-    return job
-
-
-def execute_node(db: Session, participant_id: str, node_id: str) -> Optional[ParticipantMessage]:
+    lane: str = JobLane.BULK.value,
+) -> Optional[ParticipantMessage]:
     """
-    Execute a single node for a participant: send message, log AGV, schedule dependents.
-    Returns the outbound message created, or None if not executed.
+    Execute a single node for a participant: send message, log AGV, schedule dependents
+    (in ``lane``). Returns the outbound message created, or None if not executed.
     """
-    participant = db.query(Participant).filter(Participant.id == participant_id).first()
-    if not participant or participant.status != "ACTIVE":
-        return None
-    node = db.query(Node).filter(Node.id == node_id).first()
-    if not node or node.project_id != participant.project_id:
+    participants, graphs = load_snapshots(db, [participant_id])
+    participant = participants.get(participant_id)
+    graph = graphs.get(participant.project_id) if participant else None
+    if not participant or not participant.is_active or not graph or node_id not in graph.nodes:
         return None
 
-    template = db.query(MessageTemplate).filter(MessageTemplate.id == node.message_template_id).first()
-    if not template:
-        return None
+    with node_latency.time(participant.project_id, node_id):
+        effects = decide(graph, participant, RunNode(node_id, lane), utcnow())
+        if not effects.messages:
+            return None
+        (message_ids,) = apply_effects(db, participants, [effects])
+        db.commit()
+    return db.get(ParticipantMessage, message_ids[0])
+
 
-    # 1. Send message
-    msg = _create_outbound_message(db, participant_id, template, participant.language or "English")
-    # 2. AGV
-    _log_agv(db, participant_id, node_id)
-
-    now = datetime.utcnow()
-    delay = _timedelta_from_timing(node.schedule_timing)
-    run_at = now + delay
-
-    # 3. Find dependent nodes and schedule if conditions match
-    # Nodes that activate AFTER this node (activation_type=AFTER_NODE, activation_source_node_id=node_id)
-    dependents = (
-        db.query(Node)
-        .filter(
-            Node.project_id == participant.project_id,
-            Node.activation_type == "AFTER_NODE",
-            Node.activation_source_node_id == node_id,
-        )
-        .all()
-    )
-    for dep in dependents:
-        if _condition_matches(db, participant_id, dep, now):
-            _schedule_node(db, participant_id, dep.id, run_at)
-
-    db.commit()
-    return msg
+class BatchOutcome(NamedTuple):
+    """Result of one (participant_id, node_id) pair in execute_nodes_batch."""
+
+    participant_id: str
+    node_id: str
+    message_id: Optional[str] = None  # None when the node was skipped (inactive participant, unknown node)
+    error: Optional[str] = None  # set when executing this pair failed
+
+
+class LeaseLostError(Exception):
+    """A scheduled job's lease was taken over (reaped and re-claimed) before it could be marked DONE."""
+
+
+def execute_nodes_batch(
+    db: Session,
+    jobs: Sequence[tuple[str, str]],
+    job_ids: Optional[Sequence[str]] = None,
+    lease_token: Optional[str] = None,
+    lanes: Optional[Sequence[str]] = None,
+) -> list[BatchOutcome]:
+    """
+    Execute many (participant_id, node_id) pairs with bulk reads and writes and a single commit.
+    Dependent jobs are scheduled in the lane of the pair that created them (``lanes``, default bulk).
+
+    Participants, project graphs and the participant variables needed by dependent conditions are
+    prefetched once; every pair is decided in memory and all effects are applied in bulk. If ``job_ids``
+    (aligned with ``jobs``) is given, those ScheduledJobs are marked DONE in the same commit unless they
+    failed; with ``lease_token`` only jobs still RUNNING under that claim are marked, and nothing is
+    committed for a job whose lease was lost (so a reaped and re-claimed job is not sent twice).
+    A failure while deciding one pair only fails that pair; if the bulk write itself fails, the batch
+    is rolled back and retried pair by pair so one bad row cannot sink the others.
+    """
+    if not jobs:
+        return []
+    started = time.perf_counter()
+    job_ids = list(job_ids) if job_ids is not None else [None] * len(jobs)
+    lanes = list(lanes) if lanes is not None else [JobLane.BULK.value] * len(jobs)
+    participants, graphs = load_snapshots(db, {pid for pid, _ in jobs})
+
+    now = utcnow()
+    decided = []
+    outcomes: list[BatchOutcome] = []
+    for (pid, node_id), lane in zip(jobs, lanes):
+        participant = participants.get(pid)
+        graph = graphs.get(participant.project_id) if participant else None
+        if not graph:
+            outcomes.append(BatchOutcome(pid, node_id))
+            continue
+        try:
+            effects = decide(graph, participant, RunNode(node_id, lane), now)
+        except Exception as exc:
+            outcomes.append(BatchOutcome(pid, node_id, error=str(exc) or exc.__class__.__name__))
+            continue
+        outcomes.append(BatchOutcome(pid, node_id))
+        if effects.messages:
+            decided.append((len(outcomes) - 1, effects))
+
+    done_ids = [job_id for job_id, outcome in zip(job_ids, outcomes) if job_id and outcome.error is None]
+    try:
+        message_ids = apply_effects(db, participants, [effects for _, effects in decided])
+        for (index, _), sent in zip(decided, message_ids):
+            outcomes[index] = outcomes[index]._replace(message_id=sent[0])
+        if done_ids:
+            done = db.query(ScheduledJob).filter(ScheduledJob.id.in_(done_ids))
+            if lease_token is not None:
+                done = done.filter(
+                    ScheduledJob.claimed_by == lease_token,
+                    ScheduledJob.status == JobStatus.RUNNING.value,
+                )
+            updated = done.update(
+                {ScheduledJob.status: JobStatus.DONE.value, ScheduledJob.finished_at: utcnow()},
+                synchronize_session=False,
+            )
+            if lease_token is not None and updated != len(done_ids):
+                raise LeaseLostError("lease lost")
+        db.commit()
+    except (SQLAlchemyError, LeaseLostError) as exc:
+        db.rollback()
+        if len(jobs) == 1:
+            return [outcomes[0]._replace(message_id=None, error=str(exc) or exc.__class__.__name__)]
+        return [
+            execute_nodes_batch(db, [job], [job_id], lease_token, [lane])[0]
+            for job, job_id, lane in zip(jobs, job_ids, lanes)
+        ]
+    executed = [o for o in outcomes if o.message_id is not None]
+    if executed:
+        share = (time.perf_counter() - started) / len(executed)  # one bulk write serves the whole batch
+        for outcome in executed:
+            node_latency.observe(share, participants[outcome.participant_id].project_id, outcome.node_id)
+    return outcomes
 
 
 def process_keyword(db: Session, participant_id: str, text: str) -> Optional[str]:
@@ -215,88 +177,63 @@ def process_keyword(db: Session, participant_id: str, text: str) -> Optional[str
     Process inbound text as keyword (e.g. iselect, iexit).
     Returns error message if invalid; None if handled.
     """
-    participant = db.query(Participant).filter(Participant.id == participant_id).first()
+    participants, graphs = load_snapshots(db, [participant_id])
+    participant = participants.get(participant_id)
     if not participant:
         return "Participant not found"
-    keyword_text = (text or "").strip().lower()
-    kw = (
-        db.query(Keyword)
-        .filter(
-            Keyword.project_id == participant.project_id,
-            Keyword.keyword_text == keyword_text,
-        )
-        .first()
-    )
-    if not kw:
-        return None  # Not a keyword; might be poll answer
-
-    if kw.action_type == "DEACTIVATE_PARTICIPANT" or keyword_text == "iexit":
-        # Optional exit node/message before deactivating
-        if kw.referenced_node_id:
-            node = db.query(Node).filter(Node.id == kw.referenced_node_id).first()
-            if node:
-                execute_node(db, participant_id, node.id)
-        # Then deactivate participant and cancel pending jobs
-        participant.status = "INACTIVE"
-        for job in db.query(ScheduledJob).filter(
-            ScheduledJob.participant_id == participant_id,
-            ScheduledJob.status == JobStatus.PENDING.value,
-        ).all():
-            job.status = JobStatus.CANCELLED.value
-        db.commit()
+    graph = graphs.get(participant.project_id)
+    if not graph:
         return None
-    if kw.action_type == "ACTIVATE_PARTICIPANT" or keyword_text in ("iselect", "ibuy"):
-        # Reactivate participant if previously inactive
-        participant.status = "ACTIVE"
-        # Set Start_Date variable to now
-        start_date_var = (
-            db.query(Variable)
-            .filter(
-                Variable.project_id == participant.project_id,
-                Variable.name == "Start_Date",
-            )
-            .first()
-        )
-        if start_date_var:
-            existing = (
-                db.query(ParticipantVariable)
-                .filter(
-                    ParticipantVariable.participant_id == participant_id,
-                    ParticipantVariable.variable_id == start_date_var.id,
-                )
-                .first()
-            )
-            now = datetime.utcnow()
-            if existing:
-                existing.value_datetime = now
-            else:
-                pv = ParticipantVariable(
-                    id=str(uuid.uuid4()),
-                    participant_id=participant_id,
-                    variable_id=start_date_var.id,
-                    value_datetime=now,
-                )
-                db.add(pv)
-        # Schedule nodes that activate on START_DATE (referenced by keyword's node or by Start_Date)
-        start_node = kw.referenced_node_id
-        if start_node:
-            node = db.query(Node).filter(Node.id == start_node).first()
-            if node:
-                timing = node.schedule_timing
-                delay = _timedelta_from_timing(timing) if timing else timedelta(0)
-                _schedule_node(db, participant_id, node.id, datetime.utcnow() + delay)
-        else:
-            # Find nodes with activation_type START_DATE for this project
-            for node in db.query(Node).filter(
-                Node.project_id == participant.project_id,
-                Node.activation_type == "START_DATE",
-            ).all():
-                if _condition_matches(db, participant_id, node, datetime.utcnow()):
-                    delay = _timedelta_from_timing(node.schedule_timing) or timedelta(0)
-                    _schedule_node(db, participant_id, node.id, datetime.utcnow() + delay)
+    effects = decide(graph, participant, KeywordReceived(text), utcnow())
+    if effects.status:  # otherwise not a keyword; might be poll answer
+        apply_effects(db, participants, [effects])
         db.commit()
-        return None
-    return None
+    return effects.error
+
+
+def activate_participants(
+    db: Session,
+    graph: ProjectGraph,
+    keyword: CompiledKeyword,
+    participant_ids: Sequence[str],
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Apply an ACTIVATE keyword to many new participants at once (no commit): bulk-insert their
+    Start_Date values and the START_DATE jobs process_keyword would create. Meant for participants
+    that have no variables yet (e.g. just imported). Zero-delay start nodes are scheduled as due jobs
+    rather than run inline, so the scheduler's batched path sends the first messages.
+    Returns the number of jobs scheduled.
+    """
+    if not participant_ids:
+        return 0
+    now = now or utcnow()
+    values = {}
+    if graph.start_date_variable_id:
+        db.execute(insert(ParticipantVariable), [
+            {
+                "id": str(uuid.uuid4()),
+                "participant_id": pid,
+                "variable_id": graph.start_date_variable_id,
+                "value_datetime": now,
+            }
+            for pid in participant_ids
+        ])
+        values[graph.start_date_variable_id] = VariableValue(value_datetime=now)
+    if keyword.referenced_node_id:
+        start_node = graph.nodes.get(keyword.referenced_node_id)
+        start_nodes = [start_node] if start_node else []
+    else:
+        start_nodes = [n for n in graph.start_nodes if conditions_match(n.conditions, values)]
+    jobs = [
+        job_row(pid, node.id, _due_at(node, pid, now), graph.project_id)
+        for pid in participant_ids
+        for node in start_nodes
+    ]
+    if jobs:
+        db.execute(insert(ScheduledJob), jobs)
+        record_scheduled(db, min(row["run_at"] for row in jobs))
+    return len(jobs)
 
 
 def process_poll_answer(
@@ -308,100 +245,67 @@ def process_poll_answer(
     Treat inbound text as answer to the last sent Poll. Store in variable and schedule dependent nodes.
     Returns error message if invalid; None if handled.
     """
-    participant = db.query(Participant).filter(Participant.id == participant_id).first()
-    if not participant or participant.status != "ACTIVE":
+    participants, graphs = load_snapshots(db, [participant_id], awaiting=True)
+    participant = participants.get(participant_id)
+    if not participant or not participant.is_active:
         return "Participant not found or inactive"
-
-    # Last outbound message that is a Poll (we're waiting for answer)
-    last_out = (
-        db.query(ParticipantMessage)
-        .join(MessageTemplate, ParticipantMessage.message_template_id == MessageTemplate.id)
-        .filter(
-            ParticipantMessage.participant_id == participant_id,
-            ParticipantMessage.direction == "OUTBOUND",
-            MessageTemplate.type == "POLL",
-        )
-        .order_by(ParticipantMessage.created_at.desc())
-        .first()
-    )
-    if not last_out or not last_out.message_template_id:
-        return None  # No poll waiting; might be keyword
-    template = db.query(MessageTemplate).get(last_out.message_template_id)
-    if not template or template.type != "POLL":
+    graph = graphs.get(participant.project_id)
+    if not graph:
         return None
+    effects = decide(graph, participant, PollAnswerReceived(text), utcnow())
+    if effects.variables:
+        apply_effects(db, participants, [effects])
+        db.commit()
+    return effects.error
 
-    # Normalize answer
-    raw = (text or "").strip()
-    answer_lower = raw.lower()
-    choices_en = template.choices_en or []
-    choices_es = template.choices_es or []
-    # Accept if matches any choice (en or es), case-insensitive
-    valid_choices = [str(c).lower() for c in choices_en] + [str(c).lower() for c in choices_es]
-    # Also allow numeric for rating poll (1-10)
-    try:
-        num = int(raw)
-        if 1 <= num <= 10:
-            valid_choices.extend([str(i) for i in range(1, 11)])
-    except ValueError:
-        pass
-    if not valid_choices:
-        valid_choices = ["yes", "no", "1", "2", "3", "4", "5", "6", "7", "8", "9", "10"]
-
-    # Store in variable
-    var = db.query(Variable).filter(Variable.id == template.variable_id).first() if template.variable_id else None
-    if not var:
+
+def process_poll_answers_batch(db: Session, answers: Sequence[tuple[str, str]]) -> list[Optional[str]]:
+    """
+    Process many (participant_id, text) poll answers with one snapshot load, one bulk write and
+    one commit. Answers are decided in order, so a participant answering twice in the batch sees
+    the effects of the first answer. Returns what process_poll_answer would for each answer.
+    """
+    if not answers:
+        return []
+    participants, graphs = load_snapshots(db, {pid for pid, _ in answers}, awaiting=True)
+    current = dict(participants)
+    now = utcnow()
+    errors: list[Optional[str]] = []
+    decided = []
+    for pid, text in answers:
+        participant = current.get(pid)
+        if not participant or not participant.is_active:
+            errors.append("Participant not found or inactive")
+            continue
+        graph = graphs.get(participant.project_id)
+        if not graph:
+            errors.append(None)
+            continue
+        effects = decide(graph, participant, PollAnswerReceived(text), now)
+        errors.append(effects.error)
+        if effects.variables:
+            decided.append(effects)
+            current[pid] = advance(participant, effects)
+    if decided:
+        apply_effects(db, participants, decided)
         db.commit()
-        return None
-    existing = (
-        db.query(ParticipantVariable)
-        .filter(
-            ParticipantVariable.participant_id == participant_id,
-            ParticipantVariable.variable_id == var.id,
-        )
-        .first()
-    )
-    if var.type and "int" in var.type.lower():
-        try:
-            value_int = int(raw)
-        except ValueError:
-            value_int = None
-        if existing:
-            existing.value_int = value_int
-            existing.value_text = raw
-        else:
-            db.add(ParticipantVariable(
-                id=str(uuid.uuid4()),
-                participant_id=participant_id,
-                variable_id=var.id,
-                value_int=value_int,
-                value_text=raw,
-            ))
-    else:
-        if existing:
-            existing.value_text = raw
-        else:
-            db.add(ParticipantVariable(
-                id=str(uuid.uuid4()),
-                participant_id=participant_id,
-                variable_id=var.id,
-                value_text=raw,
-            ))
-    db.flush()
-
-    now = datetime.utcnow()
-    # Nodes that activate AFTER this poll
-    dependents = (
-        db.query(Node)
-        .filter(
-            Node.project_id == participant.project_id,
-            Node.activation_type == "AFTER_POLL",
-            Node.activation_poll_id == template.id,
-        )
-        .all()
-    )
-    for dep in dependents:
-        if _condition_matches(db, participant_id, dep, now):
-            delay = _timedelta_from_timing(dep.schedule_timing) or timedelta(0)
-            _schedule_node(db, participant_id, dep.id, now + delay)
-    db.commit()
-    return None
+    return errors
+
+
+# Async entry points: the same engine logic, run by an AsyncSession on the event loop
+# (AsyncSession.run_sync drives the sync code through the async driver without a thread).
+
+
+async def execute_node_async(db: AsyncSession, participant_id: str, node_id: str) -> Optional[ParticipantMessage]:
+    """Async execute_node."""
+    return await db.run_sync(execute_node, participant_id, node_id)
+
+
+async def process_keyword_async(db: AsyncSession, participant_id: str, text: str) -> Optional[str]:
+    """Async process_keyword."""
+    return await db.run_sync(process_keyword, participant_id, text)
+
+
+async def process_poll_answer_async(db: AsyncSession, participant_id: str, text: str) -> Optional[str]:
+    """Async process_poll_answer."""
+    return await db.run_sync(process_poll_answer, participant_id, text)
@@ -0,0 +1,184 @@
+"""
+In-process pub/sub for participant conversation events.
+
+The engine records the outbound messages and timeline (AGV) entries it creates on
+the session; they are published to subscribers only once the transaction commits,
+and dropped if it rolls back. Subscribers are per participant (the chat page's SSE
+stream) and may live on an asyncio event loop while publishers run on scheduler or
+request worker threads, so delivery is thread-safe and never blocks the publisher.
+"""
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, NamedTuple, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.pagination import encode_cursor
+
+_PENDING_KEY = "conversation_events"
+_MAX_BUFFER = 1000
+
+MESSAGE = "message"
+TIMELINE = "timeline"
+
+
+class ConversationEvent(NamedTuple):
+    participant_id: str
+    type: str  # MESSAGE or TIMELINE
+    data: dict
+
+
+class Subscription:
+    """
+    Buffered feed of one participant's events. Events published before the consumer starts waiting
+    are kept; if the consumer falls more than _MAX_BUFFER events behind the feed is marked overflowed
+    (it should reconnect and reload history rather than silently miss events).
+    """
+
+    def __init__(self, bus: "EventBus", participant_id: str) -> None:
+        self.participant_id = participant_id
+        self.overflowed = False
+        self._bus = bus
+        self._buffer: deque[ConversationEvent] = deque()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    def _deliver(self, evt: ConversationEvent) -> None:
+        with self._lock:
+            if len(self._buffer) >= _MAX_BUFFER:
+                self.overflowed = True
+                self._buffer.clear()
+            else:
+                self._buffer.append(evt)
+            loop, ready = self._loop, self._ready
+        if loop is not None and ready is not None:
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+    def drain(self) -> list[ConversationEvent]:
+        """Take every buffered event without waiting."""
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+            return events
+
+    async def get(self, timeout: float) -> list[ConversationEvent]:
+        """Wait up to timeout seconds for events (empty list on timeout)."""
+        with self._lock:
+            if self._ready is None:
+                self._loop = asyncio.get_running_loop()
+                self._ready = asyncio.Event()
+            ready = self._ready
+        events = self.drain()
+        if events or self.overflowed:
+            return events
+        ready.clear()
+        events = self.drain()  # published between the first drain and clear()
+        if events:
+            return events
+        try:
+            await asyncio.wait_for(ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.drain()
+
+    def close(self) -> None:
+        self._bus.unsubscribe(self)
+
+
+class EventBus:
+    """Participant id -> live subscriptions, plus listeners that see every participant's events."""
+
+    def __init__(self) -> None:
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self._listeners: list[Callable[[list[ConversationEvent]], None]] = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[list[ConversationEvent]], None]) -> None:
+        """Call ``listener`` with every published batch, on the publishing thread (keep it cheap)."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[list[ConversationEvent]], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def subscribe(self, participant_id: str) -> Subscription:
+        sub = Subscription(self, participant_id)
+        with self._lock:
+            self._subscribers.setdefault(participant_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subscribers.get(sub.participant_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.participant_id]
+
+    def has_subscribers(self, participant_id: str) -> bool:
+        return participant_id in self._subscribers
+
+    def publish(self, events: list[ConversationEvent]) -> None:
+        with self._lock:
+            targets = [(evt, tuple(self._subscribers.get(evt.participant_id, ()))) for evt in events]
+            listeners = tuple(self._listeners)
+        for evt, subs in targets:
+            for sub in subs:
+                sub._deliver(evt)
+        for listener in listeners:
+            listener(events)
+
+
+bus = EventBus()
+
+
+def record_event(db: Session, participant_id: str, type: str, data: dict) -> None:
+    """Queue an event on the session; it is published when the transaction commits."""
+    db.info.setdefault(_PENDING_KEY, []).append(ConversationEvent(participant_id, type, data))
+
+
+def message_data(row: Any) -> dict:
+    """Event payload for a ParticipantMessage (ORM object or column dict), shaped like MessageResponse."""
+    get = row.get if isinstance(row, dict) else lambda key: getattr(row, key, None)
+    return {
+        "id": get("id"),
+        "participant_id": get("participant_id"),
+        "direction": get("direction"),
+        "message_template_id": get("message_template_id"),
+        "text": get("text"),
+        "created_at": get("created_at"),
+        "cursor": encode_cursor(get("created_at"), get("id")),
+    }
+
+
+def timeline_data(log_id: str, node_id: str, node_name: str, template_name: str, executed_at: datetime) -> dict:
+    """Event payload for a node execution, shaped like NodeFlowItem."""
+    return {
+        "id": log_id,
+        "node_id": node_id,
+        "node_name": node_name,
+        "template_name": template_name,
+        "executed_at": executed_at,
+        "cursor": encode_cursor(executed_at, log_id),
+    }
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session: Session) -> None:
+    events = session.info.pop(_PENDING_KEY, None)
+    if events:
+        bus.publish(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,187 @@
+"""
+Compiled, immutable per-project protocol graph.
+
+Project configuration (timing elements, variables, templates, nodes, conditions,
+keywords) almost never changes, so the engine reads it from an in-process cache
+instead of re-querying it for every executed node. Each project row carries a
+``config_version`` stamp that is replaced whenever any of its configuration rows
+are flushed through the ORM; a cached graph is rebuilt as soon as the stamp in the
+database no longer matches the one it was compiled from.
+"""
+import itertools
+import threading
+import uuid
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.compiled import (  # noqa: F401 - re-exported: the graph's value types
+    TIMING_FIELDS,
+    CompiledKeyword,
+    CompiledNode,
+    CompiledTemplate,
+    CompiledVariable,
+    ProjectGraph,
+    spread_from_timing,
+    timedelta_from_timing,
+)
+from app.core.conditions import compile_condition
+from app.models import (
+    Project,
+    TimingElement,
+    Variable,
+    MessageTemplate,
+    Node,
+    NodeCondition,
+    Keyword,
+)
+
+
+def _freeze(groups: dict) -> Mapping[str, tuple]:
+    return MappingProxyType({k: tuple(v) for k, v in groups.items()})
+
+
+def build_project_graph(db: Session, project_id: str, version: str = "") -> ProjectGraph:
+    """Load a project's configuration and compile it into a ProjectGraph."""
+    timings = {
+        t.id: t for t in db.query(TimingElement).filter(TimingElement.project_id == project_id).all()
+    }
+    variables = {
+        v.id: CompiledVariable(id=v.id, name=v.name, type=v.type or "")
+        for v in db.query(Variable).filter(Variable.project_id == project_id).all()
+    }
+    templates = {
+        t.id: CompiledTemplate(
+            id=t.id,
+            type=t.type,
+            name=t.name,
+            text_en=t.text_en,
+            text_es=t.text_es,
+            variable_id=t.variable_id,
+            choices_en=tuple(t.choices_en or ()),
+            choices_es=tuple(t.choices_es or ()),
+        )
+        for t in db.query(MessageTemplate).filter(MessageTemplate.project_id == project_id).all()
+    }
+    node_rows = db.query(Node).filter(Node.project_id == project_id).all()
+    conditions_by_node: dict[str, list] = {}
+    if node_rows:
+        for c in (
+            db.query(NodeCondition)
+            .join(Node, NodeCondition.node_id == Node.id)
+            .filter(Node.project_id == project_id)
+            .all()
+        ):
+            conditions_by_node.setdefault(c.node_id, []).append(
+                compile_condition(c, variables.get(c.variable_id))
+            )
+
+    nodes: dict[str, CompiledNode] = {}
+    after_node: dict[str, list] = {}
+    after_poll: dict[str, list] = {}
+    start_nodes: list[CompiledNode] = []
+    for n in node_rows:
+        conditions = tuple(conditions_by_node.get(n.id, ()))
+        node = CompiledNode(
+            id=n.id,
+            project_id=n.project_id,
+            name=n.name,
+            message_template_id=n.message_template_id,
+            activation_type=n.activation_type,
+            activation_source_node_id=n.activation_source_node_id,
+            activation_poll_id=n.activation_poll_id,
+            is_terminal=bool(n.is_terminal),
+            delay=timedelta_from_timing(timings.get(n.schedule_timing_id)),
+            spread=spread_from_timing(timings.get(n.schedule_timing_id)),
+            conditions=conditions,
+            variable_ids=frozenset(c.variable_id for c in conditions if c.variable_id),
+        )
+        nodes[n.id] = node
+        if node.activation_type == "AFTER_NODE" and node.activation_source_node_id:
+            after_node.setdefault(node.activation_source_node_id, []).append(node)
+        elif node.activation_type == "AFTER_POLL" and node.activation_poll_id:
+            after_poll.setdefault(node.activation_poll_id, []).append(node)
+        elif node.activation_type == "START_DATE":
+            start_nodes.append(node)
+
+    keywords: dict[str, CompiledKeyword] = {}
+    for k in db.query(Keyword).filter(Keyword.project_id == project_id).all():
+        keywords.setdefault(
+            k.keyword_text,
+            CompiledKeyword(
+                id=k.id,
+                keyword_text=k.keyword_text,
+                action_type=k.action_type,
+                referenced_node_id=k.referenced_node_id,
+            ),
+        )
+
+    start_date_variable_id = next((v.id for v in variables.values() if v.name == "Start_Date"), None)
+
+    return ProjectGraph(
+        project_id=project_id,
+        version=version,
+        nodes=MappingProxyType(nodes),
+        templates=MappingProxyType(templates),
+        variables=MappingProxyType(variables),
+        keywords=MappingProxyType(keywords),
+        after_node=_freeze(after_node),
+        after_poll=_freeze(after_poll),
+        start_nodes=tuple(start_nodes),
+        start_date_variable_id=start_date_variable_id,
+        condition_variable_ids=frozenset().union(*(n.variable_ids for n in nodes.values())),
+    )
+
+
+_cache: dict[str, ProjectGraph] = {}
+_cache_lock = threading.Lock()
+
+
+def get_project_graph(db: Session, project_id: str) -> Optional[ProjectGraph]:
+    """
+    Return the compiled graph for a project, rebuilding it if its config_version changed.
+    Costs one primary-key lookup when the cached graph is current. Returns None if the project does not exist.
+    """
+    row = db.query(Project.config_version).filter(Project.id == project_id).first()
+    if row is None:
+        return None
+    version = row[0] or ""
+    cached = _cache.get(project_id)
+    if cached is not None and cached.version == version:
+        return cached
+    graph = build_project_graph(db, project_id, version)
+    with _cache_lock:
+        _cache[project_id] = graph
+    return graph
+
+
+def clear_graph_cache() -> None:
+    """Drop all cached graphs (e.g. after bulk SQL edits that bypass the ORM)."""
+    with _cache_lock:
+        _cache.clear()
+
+
+_CONFIG_MODELS = (TimingElement, Variable, MessageTemplate, Node, NodeCondition, Keyword)
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_config_version(session: Session, flush_context, instances) -> None:
+    """Give a project a fresh config_version when any of its configuration rows change."""
+    project_ids = set()
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, _CONFIG_MODELS):
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        if isinstance(obj, NodeCondition):
+            node = session.get(Node, obj.node_id) if obj.node_id else None
+            if node is not None:
+                project_ids.add(node.project_id)
+        elif obj.project_id:
+            project_ids.add(obj.project_id)
+    for project_id in project_ids:
+        project = session.get(Project, project_id)
+        if project is not None:
+            project.config_version = str(uuid.uuid4())
@@ -0,0 +1,444 @@
+"""
+What-if impact analysis of protocol changes over the live population.
+
+A proposal names timing-element and node changes (see build_plan for the format) and
+is compared with the project as it stands, read-only: pending jobs and the participant
+values that changed conditions read are streamed in keyset-paginated batches and each
+batch is evaluated, current definition against proposed, in a process pool (or inline
+with ``workers=0``). The report counts the pending jobs whose send time shifts and by
+how much, the pending jobs the proposed conditions would not have scheduled, the active
+participants for whom a node's conditions flip, and the hourly load curve of pending
+sends before and after.
+
+A job's send time is re-derived from when the engine scheduled it (created_at), using
+the timing that produced it: its source node's for AFTER_NODE dependents, its own
+otherwise. The difference between the current and proposed due time is added to the
+stored run_at, so pacing is kept; campaign jobs are never shifted. Conditions are
+evaluated against current values, as the engine would if it scheduled the job now.
+"""
+import itertools
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Iterator, Mapping, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.conditions import OPERATIONS, compile_condition, conditions_match, load_variable_values_many
+from app.core.graph import TIMING_FIELDS, CompiledVariable, spread_from_timing, timedelta_from_timing
+from app.core.retiming import due_shift
+from app.models import Node, NodeCondition, Participant, ScheduledJob, TimingElement, Variable
+from app.models.scheduled_job import JobStatus
+
+_NODE_FIELDS = ("timing", "conditions")
+_CONDITION_FIELDS = ("variable", "operation", "expected_answer")
+
+
+class ImpactConfigError(ValueError):
+    pass
+
+
+class ConditionSpec(NamedTuple):
+    """Fields compile_condition needs (picklable, unlike a compiled Condition)."""
+
+    id: str
+    variable_id: Optional[str]
+    operation: str
+    expected_answer: Optional[str]
+
+
+class NodePlan(NamedTuple):
+    """One node's timing and conditions, current and proposed."""
+
+    id: str
+    name: str
+    activation_type: str
+    source_node_id: Optional[str]
+    delay: timedelta
+    spread: timedelta
+    new_delay: timedelta
+    new_spread: timedelta
+    conditions: tuple
+    new_conditions: tuple
+
+    @property
+    def timing_changed(self) -> bool:
+        return (self.delay, self.spread) != (self.new_delay, self.new_spread)
+
+    @property
+    def conditions_changed(self) -> bool:
+        return _condition_keys(self.conditions) != _condition_keys(self.new_conditions)
+
+
+def _condition_keys(conditions: tuple) -> frozenset:
+    """What a node's conditions test, regardless of their ids and order (all must match)."""
+    return frozenset(
+        (c.variable_id, (c.operation or "equal").strip().lower(), c.expected_answer) for c in conditions
+    )
+
+
+class ImpactPlan(NamedTuple):
+    project_id: str
+    nodes: Mapping[str, NodePlan]
+    variables: Mapping[str, CompiledVariable]
+
+    @property
+    def changed_nodes(self) -> list[NodePlan]:
+        return [n for n in self.nodes.values() if n.timing_changed or n.conditions_changed]
+
+    @property
+    def variable_ids(self) -> set[str]:
+        """Variables read by the current or proposed conditions of nodes whose conditions change."""
+        return {
+            c.variable_id
+            for n in self.nodes.values()
+            if n.conditions_changed
+            for c in n.conditions + n.new_conditions
+            if c.variable_id
+        }
+
+
+@dataclass
+class ImpactReport:
+    project_id: str
+    changed_nodes: list[str] = field(default_factory=list)
+    pending_jobs: int = 0
+    shifted_jobs: int = 0
+    unscheduled_jobs: int = 0  # pending jobs the proposed conditions would not have scheduled
+    active_participants: int = 0
+    affected_participants: int = 0  # with a shifted or unscheduled job, or a node whose conditions flip
+    min_shift_seconds: Optional[float] = None
+    max_shift_seconds: Optional[float] = None
+    mean_shift_seconds: Optional[float] = None
+    conditions: list[dict] = field(default_factory=list)  # {"node": name, "gained": n, "lost": n}
+    load_curve: list[dict] = field(default_factory=list)  # {"hour": start of hour, "before": n, "after": n}
+    wall_seconds: float = 0.0
+
+
+def _timing_values(timing) -> dict:
+    return {name: getattr(timing, name, None) or 0 for name in TIMING_FIELDS} if timing else {}
+
+
+def _int_fields(changes, allowed: tuple, what: str) -> dict:
+    if not isinstance(changes, Mapping):
+        raise ImpactConfigError(f"{what}: expected an object")
+    unknown = set(changes) - set(allowed)
+    if unknown:
+        raise ImpactConfigError(f"{what}: unknown field(s) {', '.join(sorted(unknown))}")
+    if not all(isinstance(v, int) for v in changes.values()):
+        raise ImpactConfigError(f"{what}: values must be integers")
+    return dict(changes)
+
+
+def build_plan(db: Session, project_id: str, proposal: Mapping) -> ImpactPlan:
+    """
+    Resolve a proposal against the project's current configuration. The proposal refers to
+    everything by name::
+
+        {"timings": {"Demo_Day": {"days": 14, "spread_seconds": 3600}},
+         "nodes": {"Node_5": {"timing": "1_Minute",
+                              "conditions": [{"variable": "Poll_2_Variable", "operation": "gt",
+                                              "expected_answer": "7"}]}}}
+
+    Timing fields left out keep their current values; a node's "timing" may be null (none)
+    and its "conditions" replace all of its current ones.
+    """
+    timings = {t.id: t for t in db.query(TimingElement).filter(TimingElement.project_id == project_id)}
+    timings_by_name = {t.name: t for t in timings.values()}
+    variables = {v.id: v for v in db.query(Variable).filter(Variable.project_id == project_id)}
+    variables_by_name = {v.name: v for v in variables.values()}
+    nodes = db.query(Node).filter(Node.project_id == project_id).all()
+    nodes_by_name = {n.name: n for n in nodes}
+    conditions: dict[str, list[ConditionSpec]] = {}
+    for c in db.query(NodeCondition).join(Node, NodeCondition.node_id == Node.id).filter(Node.project_id == project_id):
+        conditions.setdefault(c.node_id, []).append(ConditionSpec(c.id, c.variable_id, c.operation, c.expected_answer))
+
+    if not isinstance(proposal, Mapping):
+        raise ImpactConfigError("The proposal must be an object")
+    timing_changes = proposal.get("timings") or {}
+    node_changes = proposal.get("nodes") or {}
+    unknown = set(proposal) - {"timings", "nodes"}
+    if unknown:
+        raise ImpactConfigError(f"Unknown proposal section(s): {', '.join(sorted(unknown))}")
+    proposed = {name: _timing_values(t) for name, t in timings_by_name.items()}
+    for name, changes in timing_changes.items():
+        if name not in timings_by_name:
+            raise ImpactConfigError(f"Unknown timing element: {name}")
+        proposed[name].update(_int_fields(changes, TIMING_FIELDS, f"Timing {name}"))
+    for name, changes in node_changes.items():
+        if name not in nodes_by_name:
+            raise ImpactConfigError(f"Unknown node: {name}")
+        if not isinstance(changes, Mapping) or set(changes) - set(_NODE_FIELDS):
+            raise ImpactConfigError(f"Node {name}: expected an object with {' and/or '.join(_NODE_FIELDS)}")
+        if changes.get("timing") is not None and changes["timing"] not in timings_by_name:
+            raise ImpactConfigError(f"Node {name}: unknown timing element {changes['timing']}")
+
+    plans = {}
+    for node in nodes:
+        timing = timings.get(node.schedule_timing_id)
+        changes = node_changes.get(node.name, {})
+        new_timing_name = changes["timing"] if "timing" in changes else (timing.name if timing else None)
+        new_timing = SimpleNamespace(**proposed[new_timing_name]) if new_timing_name else None
+        current = tuple(conditions.get(node.id, ()))
+        new_conditions = current
+        if "conditions" in changes:
+            new_conditions = tuple(
+                _condition_spec(node.name, i, spec, variables_by_name) for i, spec in enumerate(changes["conditions"] or ())
+            )
+        plans[node.id] = NodePlan(
+            id=node.id,
+            name=node.name,
+            activation_type=node.activation_type,
+            source_node_id=node.activation_source_node_id,
+            delay=timedelta_from_timing(timing),
+            spread=spread_from_timing(timing),
+            new_delay=timedelta_from_timing(new_timing),
+            new_spread=spread_from_timing(new_timing),
+            conditions=current,
+            new_conditions=new_conditions,
+        )
+    return ImpactPlan(
+        project_id=project_id,
+        nodes=plans,
+        variables={v.id: CompiledVariable(id=v.id, name=v.name, type=v.type or "") for v in variables.values()},
+    )
+
+
+def _condition_spec(node_name: str, index: int, spec, variables_by_name: Mapping) -> ConditionSpec:
+    what = f"Node {node_name} condition {index + 1}"
+    if not isinstance(spec, Mapping) or set(spec) - set(_CONDITION_FIELDS):
+        raise ImpactConfigError(f"{what}: expected an object with {', '.join(_CONDITION_FIELDS)}")
+    variable = variables_by_name.get(spec.get("variable"))
+    if variable is None:
+        raise ImpactConfigError(f"{what}: unknown variable {spec.get('variable')}")
+    operation = str(spec.get("operation") or "equal").strip().lower()
+    if operation not in OPERATIONS:
+        raise ImpactConfigError(f"{what}: unknown operation {operation} (expected one of {', '.join(OPERATIONS)})")
+    expected = spec.get("expected_answer")
+    return ConditionSpec(f"proposed:{node_name}:{index}", variable.id, operation, None if expected is None else str(expected))
+
+
+@dataclass
+class _Tally:
+    """Partial results of some batches; merged into one ImpactReport."""
+
+    pending_jobs: int = 0
+    shifted_jobs: int = 0
+    unscheduled_jobs: int = 0
+    active_participants: int = 0
+    shift_total: float = 0.0
+    shift_min: Optional[float] = None
+    shift_max: Optional[float] = None
+    before: Counter = field(default_factory=Counter)  # hour -> pending sends
+    after: Counter = field(default_factory=Counter)
+    gained: Counter = field(default_factory=Counter)  # node id -> participants
+    lost: Counter = field(default_factory=Counter)
+    participants: set = field(default_factory=set)  # affected
+
+    def shift(self, seconds: float) -> None:
+        self.shifted_jobs += 1
+        self.shift_total += seconds
+        self.shift_min = seconds if self.shift_min is None else min(self.shift_min, seconds)
+        self.shift_max = seconds if self.shift_max is None else max(self.shift_max, seconds)
+
+    def merge(self, other: "_Tally") -> None:
+        self.pending_jobs += other.pending_jobs
+        self.unscheduled_jobs += other.unscheduled_jobs
+        self.active_participants += other.active_participants
+        self.shifted_jobs += other.shifted_jobs
+        self.shift_total += other.shift_total
+        for name, pick in (("shift_min", min), ("shift_max", max)):
+            ours, theirs = getattr(self, name), getattr(other, name)
+            setattr(self, name, theirs if ours is None else ours if theirs is None else pick(ours, theirs))
+        for name in ("before", "after", "gained", "lost"):
+            getattr(self, name).update(getattr(other, name))
+        self.participants |= other.participants
+
+
+def _hour(when: datetime) -> datetime:
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+class _Evaluator:
+    """Evaluates batches against one plan (built once per worker process)."""
+
+    def __init__(self, plan: ImpactPlan):
+        def compiled(specs):
+            return tuple(compile_condition(s, plan.variables.get(s.variable_id)) for s in specs)
+
+        self.conditions = {
+            n.id: (compiled(n.conditions), compiled(n.new_conditions))
+            for n in plan.nodes.values()
+            if n.conditions_changed
+        }
+        # The timing a node's jobs were scheduled with (see the module docstring).
+        self.timing = {
+            n.id: plan.nodes.get(n.source_node_id) if n.activation_type == "AFTER_NODE" else n
+            for n in plan.nodes.values()
+        }
+
+    def jobs(self, rows: list[tuple]) -> _Tally:
+        tally = _Tally()
+        for participant_id, node_id, run_at, created_at, campaign_id, values in rows:
+            tally.pending_jobs += 1
+            new_run_at = run_at
+            timing = self.timing.get(node_id)
+            if timing is not None and timing.timing_changed and campaign_id is None:
+                origin = created_at or run_at - timing.delay
+                shift = due_shift(
+                    participant_id, origin, timing.delay, timing.spread, timing.new_delay, timing.new_spread
+                )
+                if shift:
+                    new_run_at = run_at + shift
+                    tally.shift(shift.total_seconds())
+                    tally.participants.add(participant_id)
+            if node_id in self.conditions:
+                current, proposed = self.conditions[node_id]
+                if conditions_match(current, values) and not conditions_match(proposed, values):
+                    tally.unscheduled_jobs += 1
+                    tally.participants.add(participant_id)
+            tally.before[_hour(run_at)] += 1
+            tally.after[_hour(new_run_at)] += 1
+        return tally
+
+    def participants(self, rows: list[tuple]) -> _Tally:
+        tally = _Tally()
+        for participant_id, values in rows:
+            tally.active_participants += 1
+            for node_id, (current, proposed) in self.conditions.items():
+                was, now = conditions_match(current, values), conditions_match(proposed, values)
+                if was != now:
+                    (tally.gained if now else tally.lost)[node_id] += 1
+                    tally.participants.add(participant_id)
+        return tally
+
+
+_worker: Optional[_Evaluator] = None
+
+
+def _init_worker(plan: ImpactPlan) -> None:
+    global _worker
+    _worker = _Evaluator(plan)
+
+
+def _evaluate_in_worker(kind: str, rows: list[tuple]) -> _Tally:
+    return getattr(_worker, kind)(rows)
+
+
+def _job_batches(db: Session, plan: ImpactPlan, batch_size: int) -> Iterator[tuple[str, list]]:
+    """The project's PENDING jobs with their participants' condition values, by job id."""
+    last = ""
+    while True:
+        rows = (
+            db.query(
+                ScheduledJob.id,
+                ScheduledJob.participant_id,
+                ScheduledJob.node_id,
+                ScheduledJob.run_at,
+                ScheduledJob.created_at,
+                ScheduledJob.campaign_id,
+            )
+            .join(Participant, Participant.id == ScheduledJob.participant_id)
+            .filter(
+                Participant.project_id == plan.project_id,
+                ScheduledJob.status == JobStatus.PENDING.value,
+                ScheduledJob.id > last,
+            )
+            .order_by(ScheduledJob.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return
+        last = rows[-1].id
+        values = load_variable_values_many(db, {r.participant_id for r in rows}, plan.variable_ids)
+        yield "jobs", [
+            (r.participant_id, r.node_id, r.run_at, r.created_at, r.campaign_id, values.get(r.participant_id, {}))
+            for r in rows
+        ]
+
+
+def _participant_batches(db: Session, plan: ImpactPlan, batch_size: int) -> Iterator[tuple[str, list]]:
+    """The project's ACTIVE participants with their condition values, by id."""
+    last = ""
+    while True:
+        ids = [
+            pid for (pid,) in db.query(Participant.id)
+            .filter(Participant.project_id == plan.project_id, Participant.status == "ACTIVE", Participant.id > last)
+            .order_by(Participant.id)
+            .limit(batch_size)
+        ]
+        if not ids:
+            return
+        last = ids[-1]
+        values = load_variable_values_many(db, ids, plan.variable_ids)
+        yield "participants", [(pid, values.get(pid, {})) for pid in ids]
+
+
+def _evaluate(plan: ImpactPlan, batches: Iterator[tuple[str, list]], workers: int) -> _Tally:
+    tally = _Tally()
+    if workers <= 0:
+        evaluator = _Evaluator(plan)
+        for kind, rows in batches:
+            tally.merge(getattr(evaluator, kind)(rows))
+        return tally
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(plan,)) as pool:
+        running = set()
+        for kind, rows in batches:
+            if len(running) >= 2 * workers:  # keep reading while the pool works, within bounds
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tally.merge(future.result())
+            running.add(pool.submit(_evaluate_in_worker, kind, rows))
+        for future in running:
+            tally.merge(future.result())
+    return tally
+
+
+def analyze_impact(
+    db: Session,
+    project_id: str,
+    proposal: Mapping,
+    workers: int = 0,
+    batch_size: int = 5000,
+) -> ImpactReport:
+    """Compare ``proposal`` with the project over its pending jobs and active participants; writes nothing."""
+    started = time.perf_counter()
+    try:
+        plan = build_plan(db, project_id, proposal)
+        batches = _job_batches(db, plan, batch_size)
+        conditions_changed = any(n.conditions_changed for n in plan.nodes.values())
+        if conditions_changed:
+            batches = itertools.chain(batches, _participant_batches(db, plan, batch_size))
+        tally = _evaluate(plan, batches, workers)
+        if not conditions_changed:
+            tally.active_participants = (
+                db.query(Participant)
+                .filter(Participant.project_id == project_id, Participant.status == "ACTIVE")
+                .count()
+            )
+    finally:
+        db.rollback()
+    hours = sorted(set(tally.before) | set(tally.after))
+    return ImpactReport(
+        project_id=project_id,
+        changed_nodes=sorted(n.name for n in plan.changed_nodes),
+        pending_jobs=tally.pending_jobs,
+        shifted_jobs=tally.shifted_jobs,
+        unscheduled_jobs=tally.unscheduled_jobs,
+        active_participants=tally.active_participants,
+        affected_participants=len(tally.participants),
+        min_shift_seconds=tally.shift_min,
+        max_shift_seconds=tally.shift_max,
+        mean_shift_seconds=round(tally.shift_total / tally.shifted_jobs, 3) if tally.shifted_jobs else None,
+        conditions=[
+            {"node": plan.nodes[node_id].name, "gained": tally.gained[node_id], "lost": tally.lost[node_id]}
+            for node_id in sorted(plan.nodes, key=lambda i: plan.nodes[i].name)
+            if plan.nodes[node_id].conditions_changed
+        ],
+        load_curve=[{"hour": hour, "before": tally.before[hour], "after": tally.after[hour]} for hour in hours],
+        wall_seconds=round(time.perf_counter() - started, 3),
+    )
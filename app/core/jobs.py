@@ -0,0 +1,17 @@
+"""Scheduled job statuses and claim lanes (kept free of model imports for app.core.protocol)."""
+import enum
+
+
+class JobStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    CANCELLED = "CANCELLED"
+    FAILED = "FAILED"  # gave up after SCHEDULER_MAX_ATTEMPTS
+
+
+class JobLane(str, enum.Enum):
+    """Claim queue, in priority order."""
+
+    INTERACTIVE = "interactive"  # follow-ups to an inbound message the participant is waiting for
+    BULK = "bulk"  # START_DATE schedules, campaigns and their follow-ups
@@ -0,0 +1,235 @@
+"""
+Process metrics in the Prometheus text exposition format (served at /metrics).
+
+Counters and histograms are updated in memory by the code paths they measure
+(scheduler, engine, inbound messages, DB pool checkouts) and labelled by a small
+set of values; gauges that describe the database (jobs by status) are computed at
+scrape time. Values are per process, as Prometheus expects: with several workers
+or replicas, aggregate with sum() / histogram_quantile() over the scraped targets.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Sequence
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0, 3600.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(v) for v in labels)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[:-1]) if series else 0
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), series[:-1]):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A gauge whose samples are produced by ``collect`` at scrape time: (label values, value) pairs."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[..., list[tuple[tuple, float]]]] = None,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+
+    def samples(self, *args) -> list[str]:
+        if self.collect is None:
+            return []
+        return [
+            f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+            for key, value in self.collect(*args)
+        ]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, *collect_args) -> str:
+        """All metrics in exposition format; scrape-time gauges are collected with ``collect_args``."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples(*collect_args) if isinstance(metric, Gauge) else metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+scheduler_lag = registry.register(Histogram(
+    "dash_scheduler_lag_seconds",
+    "Time from a job's run_at to the scheduler starting it.",
+    ("lane",),
+    LAG_BUCKETS,
+))
+jobs_executed = registry.register(Counter(
+    "dash_scheduler_jobs_executed_total",
+    "Scheduled jobs executed successfully.",
+    ("lane",),
+))
+jobs_failed = registry.register(Counter(
+    "dash_scheduler_jobs_failed_total",
+    "Scheduled job executions that failed (retried with backoff or marked FAILED).",
+    ("lane",),
+))
+node_latency = registry.register(Histogram(
+    "dash_execute_node_seconds",
+    "Node execution latency; batched executions are amortized over the batch.",
+    ("project", "node"),
+))
+inbound_latency = registry.register(Histogram(
+    "dash_inbound_message_seconds",
+    "Inbound message processing latency (store, keyword and poll answer handling).",
+))
+pool_checkout = registry.register(Histogram(
+    "dash_db_pool_checkout_seconds",
+    "Time to check a connection out of the database pool (includes waiting for a free one).",
+))
+
+
+def _scheduled_jobs(db) -> list[tuple[tuple, float]]:
+    from sqlalchemy import func
+
+    from app.models import ScheduledJob
+
+    rows = db.query(ScheduledJob.status, func.count()).group_by(ScheduledJob.status).all()
+    return sorted(((status,), count) for status, count in rows)
+
+
+registry.register(Gauge(
+    "dash_scheduled_jobs",
+    "Scheduled jobs by status.",
+    ("status",),
+    _scheduled_jobs,
+))
+
+
+def instrument_pool(pool, histogram: Histogram = pool_checkout) -> None:
+    """Time every checkout of ``pool`` (Engine.connect goes through Pool.connect)."""
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    pool.connect = timed_connect
@@ -0,0 +1,220 @@
+"""
+Transactional outbox for external channels.
+
+The engine writes one outbox row per OUTBOUND message to a participant on an external
+channel, in the same transaction as the message itself, so a message is delivered if
+and only if its node execution committed. The dispatcher (app.core.dispatcher) claims
+rows with a lease, sends them outside any database transaction and records the
+outcome: SENT, back to PENDING after a backoff, or FAILED.
+"""
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import bindparam, event, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.channels.base import DeliveryResult, OutboundMessage
+from app.config import settings
+from app.core.clock import utcnow
+from app.models import OutboxMessage
+from app.models.outbox_message import OutboxStatus
+
+_PENDING_KEY = "outbox_channels"
+_ready: dict[str, threading.Event] = {}
+_ready_lock = threading.Lock()
+
+
+def is_external(channel: Optional[str]) -> bool:
+    return bool(channel) and channel != "web"
+
+
+def outbox_row(message: dict, channel: str, recipient: Optional[str]) -> dict:
+    """Column values for the outbox row delivering one OUTBOUND message row."""
+    return {
+        "id": str(uuid.uuid4()),
+        "message_id": message["id"],
+        "participant_id": message["participant_id"],
+        "channel": channel,
+        "recipient": recipient,
+        "text": message["text"],
+        "status": OutboxStatus.PENDING.value,
+        "available_at": message["created_at"],
+        "attempts": 0,
+    }
+
+
+def ready_event(channel: str) -> threading.Event:
+    """Set when a transaction that queued messages for channel commits (the dispatcher clears it)."""
+    with _ready_lock:
+        return _ready.setdefault(channel, threading.Event())
+
+
+def record_outbox(db: Session, channels: Iterable[str]) -> None:
+    """Remember that this session queued messages for channels; the dispatcher is woken on commit."""
+    db.info.setdefault(_PENDING_KEY, set()).update(channels)
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_dispatcher(session: Session) -> None:
+    for channel in session.info.pop(_PENDING_KEY, ()):
+        ready_event(channel).set()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def claim_outbox(
+    db: Session,
+    channel: str,
+    limit: int,
+    lease_token: str,
+    now: Optional[datetime] = None,
+) -> list[OutboundMessage]:
+    """
+    Lease up to ``limit`` deliverable PENDING rows of one channel (status SENDING, attempts + 1)
+    and return them; the caller commits. Same single-statement claim as the scheduler's.
+    """
+    now = now or utcnow()
+    dialect = db.get_bind().dialect
+    candidates = (
+        select(OutboxMessage.id)
+        .where(
+            OutboxMessage.status == OutboxStatus.PENDING.value,
+            OutboxMessage.channel == channel,
+            OutboxMessage.available_at <= now,
+        )
+        .order_by(OutboxMessage.available_at)
+        .limit(limit)
+    )
+    if dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+    lease = {
+        "status": OutboxStatus.SENDING.value,
+        "claimed_by": lease_token,
+        "lease_expires_at": now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS),
+        "attempts": func.coalesce(OutboxMessage.attempts, 0) + 1,
+    }
+    columns = (
+        OutboxMessage.id,
+        OutboxMessage.message_id,
+        OutboxMessage.participant_id,
+        OutboxMessage.channel,
+        OutboxMessage.recipient,
+        OutboxMessage.text,
+        OutboxMessage.attempts,
+    )
+    pending = (OutboxMessage.status == OutboxStatus.PENDING.value,)
+    if dialect.update_returning:
+        stmt = (
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(candidates), *pending)
+            .values(**lease)
+            .returning(*columns)
+            .execution_options(synchronize_session=False)
+        )
+        return [OutboundMessage(*row) for row in db.execute(stmt).all()]
+    claimed = []
+    for row in db.execute(select(*columns).where(OutboxMessage.id.in_(candidates))).all():
+        result = db.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == row.id, *pending)
+            .values(**lease)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            claimed.append(OutboundMessage(*row[:-1], (row.attempts or 0) + 1))
+    return claimed
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Capped exponential backoff after the given number of delivery attempts."""
+    seconds = settings.OUTBOX_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1))
+    return timedelta(seconds=min(seconds, settings.OUTBOX_RETRY_MAX_SECONDS))
+
+
+def complete_outbox(
+    db: Session,
+    messages: list[OutboundMessage],
+    results: list[DeliveryResult],
+    lease_token: str,
+    now: Optional[datetime] = None,
+) -> None:
+    """
+    Record delivery results for rows still held under lease_token (one executemany UPDATE for
+    the sent rows and one for the failed ones) and commit.
+    """
+    now = now or utcnow()
+    attempts = {m.id: m.attempts for m in messages}
+    table = OutboxMessage.__table__
+    held = (
+        table.c.id == bindparam("b_id"),
+        table.c.claimed_by == lease_token,
+        table.c.status == OutboxStatus.SENDING.value,
+    )
+    sent = [
+        {"b_id": r.outbox_id, "b_provider": r.provider_message_id}
+        for r in results
+        if r.error is None
+    ]
+    failed = []
+    for r in results:
+        if r.error is None:
+            continue
+        exhausted = not r.retryable or attempts.get(r.outbox_id, 0) >= settings.OUTBOX_MAX_ATTEMPTS
+        failed.append({
+            "b_id": r.outbox_id,
+            "b_status": (OutboxStatus.FAILED if exhausted else OutboxStatus.PENDING).value,
+            "b_available_at": now + retry_delay(attempts.get(r.outbox_id, 1)),
+            "b_error": r.error[:1000],
+        })
+    release = {"claimed_by": None, "lease_expires_at": None}
+    if sent:
+        db.execute(
+            update(table).where(*held).values(
+                status=OutboxStatus.SENT.value, sent_at=now, provider_message_id=bindparam("b_provider"), **release
+            ),
+            sent,
+        )
+    if failed:
+        db.execute(
+            update(table).where(*held).values(
+                status=bindparam("b_status"),
+                available_at=bindparam("b_available_at"),
+                last_error=bindparam("b_error"),
+                **release,
+            ),
+            failed,
+        )
+    db.commit()
+
+
+def reap_outbox(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Return SENDING rows whose lease expired (dispatcher died mid-send) to PENDING, or FAILED once
+    they used all attempts. Returns the number of rows reaped. Such a row may be sent twice;
+    adapters pass the outbox id as an idempotency key so providers can drop the duplicate.
+    """
+    now = now or utcnow()
+    expired = (
+        OutboxMessage.status == OutboxStatus.SENDING.value,
+        or_(OutboxMessage.lease_expires_at.is_(None), OutboxMessage.lease_expires_at < now),
+    )
+    reset = {"claimed_by": None, "lease_expires_at": None, "last_error": "lease expired"}
+    exhausted = db.execute(
+        update(OutboxMessage)
+        .where(*expired, func.coalesce(OutboxMessage.attempts, 0) >= settings.OUTBOX_MAX_ATTEMPTS)
+        .values(status=OutboxStatus.FAILED.value, **reset)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    requeued = db.execute(
+        update(OutboxMessage)
+        .where(*expired)
+        .values(status=OutboxStatus.PENDING.value, **reset)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return exhausted + requeued
@@ -0,0 +1,195 @@
+"""
+Bulk participant import from CSV or NDJSON.
+
+Rows are read from a text stream one at a time, validated, de-duplicated by
+external_id (within the file and against the project) and inserted in batches,
+one commit per batch, so memory stays flat and a bad row never aborts the
+import. Optionally each batch is activated with one of the project's ACTIVATE
+keywords, which schedules its START_DATE nodes in bulk.
+"""
+import csv
+import json
+import uuid
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional, TextIO
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.engine import activate_participants
+from app.core.graph import CompiledKeyword, ProjectGraph, get_project_graph
+from app.models import Participant
+
+FORMATS = ("csv", "ndjson")
+LANGUAGES = {"english": "English", "en": "English", "spanish": "Spanish", "es": "Spanish"}
+CHANNELS = ("web", "sms", "facebook", "webhook")
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportConfigError(ValueError):
+    """The import cannot start (unknown project, format or keyword)."""
+
+
+@dataclass
+class RowError:
+    line: int
+    message: str
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    duplicates: int = 0
+    activated: int = 0
+    scheduled_jobs: int = 0
+    error_count: int = 0
+    errors: list[RowError] = field(default_factory=list)  # first MAX_REPORTED_ERRORS only
+
+    def add_error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(line, message))
+
+
+def detect_format(filename: Optional[str], explicit: Optional[str] = None) -> str:
+    """Explicit format, else by extension (.ndjson / .jsonl), else csv."""
+    fmt = (explicit or "").strip().lower()
+    if not fmt:
+        name = (filename or "").lower()
+        fmt = "ndjson" if name.endswith((".ndjson", ".jsonl")) else "csv"
+    if fmt not in FORMATS:
+        raise ImportConfigError(f"Unsupported format {explicit!r} (expected csv or ndjson)")
+    return fmt
+
+
+def iter_records(stream: TextIO, fmt: str) -> Iterator[tuple[int, object]]:
+    """Yield (line number, raw record) pairs; malformed NDJSON lines yield the exception instead."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as exc:
+            yield line_no, exc
+
+
+def validate_record(record: object) -> dict:
+    """Normalize one record to participant columns; raises ValueError with a readable message."""
+    if isinstance(record, Exception):
+        raise ValueError(f"Invalid JSON: {record}")
+    if not isinstance(record, dict):
+        raise ValueError("Expected an object per line")
+    external_id = str(record.get("external_id") or "").strip() or None
+    if external_id and len(external_id) > 255:
+        raise ValueError("external_id longer than 255 characters")
+    language_raw = str(record.get("language") or "").strip()
+    language = LANGUAGES.get(language_raw.lower(), "English" if not language_raw else None)
+    if language is None:
+        raise ValueError(f"Unsupported language {language_raw!r}")
+    channel = str(record.get("channel") or "").strip().lower() or "web"
+    if channel not in CHANNELS:
+        raise ValueError(f"Unsupported channel {channel!r}")
+    return {"external_id": external_id, "language": language, "channel": channel}
+
+
+class ParticipantImporter:
+    """Accumulates one import: call add() per record, then finish(); the caller owns the session."""
+
+    def __init__(
+        self,
+        db: Session,
+        project_id: str,
+        activate_keyword: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> None:
+        graph = get_project_graph(db, project_id)
+        if graph is None:
+            raise ImportConfigError("Project not found")
+        self.keyword: Optional[CompiledKeyword] = None
+        if activate_keyword:
+            self.keyword = graph.keywords.get(activate_keyword.strip().lower())
+            if self.keyword is None or self.keyword.action_type != "ACTIVATE_PARTICIPANT":
+                raise ImportConfigError(f"{activate_keyword!r} is not an activation keyword of this project")
+        self.db = db
+        self.graph: ProjectGraph = graph
+        self.project_id = project_id
+        self.batch_size = max(1, batch_size)
+        self.result = ImportResult()
+        self._seen: set[str] = set()
+        self._batch: list[dict] = []
+
+    def add(self, line: int, record: object) -> None:
+        try:
+            row = validate_record(record)
+        except ValueError as exc:
+            self.result.add_error(line, str(exc))
+            return
+        external_id = row["external_id"]
+        if external_id:
+            if external_id in self._seen:
+                self.result.duplicates += 1
+                return
+            self._seen.add(external_id)
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Insert (and optionally activate) the pending batch in one transaction."""
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        external_ids = [r["external_id"] for r in batch if r["external_id"]]
+        existing = set()
+        if external_ids:
+            existing = {
+                external_id
+                for (external_id,) in self.db.query(Participant.external_id).filter(
+                    Participant.project_id == self.project_id,
+                    Participant.external_id.in_(external_ids),
+                )
+            }
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "project_id": self.project_id,
+                "external_id": r["external_id"],
+                "language": r["language"],
+                "channel": r["channel"],
+                "status": "ACTIVE",
+            }
+            for r in batch
+            if r["external_id"] not in existing
+        ]
+        self.result.duplicates += len(batch) - len(rows)
+        if rows:
+            self.db.execute(insert(Participant), rows)
+            if self.keyword is not None:
+                ids = [r["id"] for r in rows]
+                self.result.scheduled_jobs += activate_participants(self.db, self.graph, self.keyword, ids)
+                self.result.activated += len(ids)
+        self.db.commit()
+        self.result.created += len(rows)
+
+    def finish(self) -> ImportResult:
+        self.flush()
+        return self.result
+
+
+def import_participants(
+    db: Session,
+    project_id: str,
+    records: Iterable[tuple[int, object]],
+    activate_keyword: Optional[str] = None,
+    batch_size: int = 1000,
+) -> ImportResult:
+    """Import (line, record) pairs, e.g. from iter_records(). Raises ImportConfigError before any write."""
+    importer = ParticipantImporter(db, project_id, activate_keyword, batch_size)
+    for line, record in records:
+        importer.add(line, record)
+    return importer.finish()
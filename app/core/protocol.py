@@ -0,0 +1,237 @@
+"""
+Pure protocol core.
+
+Every engine decision -- which message a node sends, which dependents run inline and
+which are scheduled, what a keyword or a poll answer changes -- depends only on the
+compiled project graph, a snapshot of one participant and the event being handled.
+decide() makes that decision without a session and returns it as Effects (messages to
+send, variables to write, jobs to schedule, jobs to cancel); app.core.effects applies
+a batch of them with bulk writes. Flows can therefore be evaluated in memory, exactly
+as the engine runs them, by threading a snapshot through advance().
+"""
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Mapping, NamedTuple, Optional, Union
+
+from app.config import settings
+from app.core.conditions import VariableValue, conditions_match, parse_int
+from app.core.compiled import CompiledNode, CompiledTemplate, ProjectGraph
+from app.core.jobs import JobLane
+from app.core.spread import spread_run_at
+
+ACTIVE = "ACTIVE"
+INACTIVE = "INACTIVE"
+
+
+@dataclass(frozen=True)
+class ParticipantSnapshot:
+    """What the protocol needs to know about one participant (see app.core.effects.load_snapshots)."""
+
+    id: str
+    project_id: str
+    status: str
+    language: Optional[str] = None
+    channel: Optional[str] = None
+    external_id: Optional[str] = None
+    values: Mapping[str, VariableValue] = field(default_factory=dict)  # variables node conditions read
+    awaiting_poll_template_id: Optional[str] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.status == ACTIVE
+
+
+class RunNode(NamedTuple):
+    """A node falls due for the participant (a scheduled job, or an explicit execute_node)."""
+
+    node_id: str
+    lane: str = JobLane.BULK.value  # lane of the jobs its dependents are scheduled in
+
+
+class KeywordReceived(NamedTuple):
+    """Inbound text to handle as a keyword (iselect, iexit, ...)."""
+
+    text: str
+
+
+class PollAnswerReceived(NamedTuple):
+    """Inbound text to handle as the answer to the poll the participant was last sent."""
+
+    text: str
+
+
+Event = Union[RunNode, KeywordReceived, PollAnswerReceived]
+
+
+class OutboundMessage(NamedTuple):
+    """One node execution: the message sent and the AGV entry logged for it."""
+
+    node_id: str
+    node_name: str
+    template_id: str
+    template_name: str
+    text: str
+    is_poll: bool
+
+
+class VariableWrite(NamedTuple):
+    variable_id: str
+    value: VariableValue  # replaces the participant's whole value
+
+
+class ScheduledRun(NamedTuple):
+    node_id: str
+    run_at: datetime
+    lane: str
+
+
+@dataclass
+class Effects:
+    """Everything one event changes for one participant, in the order it happened."""
+
+    participant_id: str
+    project_id: str
+    messages: list[OutboundMessage] = field(default_factory=list)
+    variables: list[VariableWrite] = field(default_factory=list)
+    jobs: list[ScheduledRun] = field(default_factory=list)
+    cancel_pending: bool = False  # cancel the participant's PENDING jobs, including those scheduled above
+    status: Optional[str] = None  # new participant status, if it changes
+    error: Optional[str] = None  # reported to the sender; nothing else is set
+
+
+def resolve_text(template: CompiledTemplate, language: Optional[str]) -> str:
+    """Get message text in participant language."""
+    if not template:
+        return ""
+    if (language or "").lower() in ("spanish", "es"):
+        return (template.text_es or template.text_en) or ""
+    return (template.text_en or template.text_es) or ""
+
+
+def due_at(node: CompiledNode, participant_id: str, now: datetime) -> datetime:
+    """When the node's timing falls due for the participant: now + delay, spread over the timing's window."""
+    return spread_run_at(now + node.delay, participant_id, node.spread)
+
+
+class _Decision:
+    """Mutable working state while deciding one event (values change as variables are written)."""
+
+    def __init__(self, graph: ProjectGraph, participant: ParticipantSnapshot, now: datetime):
+        self.graph = graph
+        self.participant = participant
+        self.now = now
+        self.values = dict(participant.values)
+        self.effects = Effects(participant.id, participant.project_id)
+
+    def write(self, variable_id: str, value: VariableValue) -> None:
+        self.effects.variables.append(VariableWrite(variable_id, value))
+        self.values[variable_id] = value
+
+    def matching(self, candidates) -> list[CompiledNode]:
+        return [n for n in candidates if conditions_match(n.conditions, self.values)]
+
+    def run(self, node: CompiledNode, depth: int, lane: str) -> bool:
+        """Send the node's message and activate its AFTER_NODE dependents; False if it has no template."""
+        template = self.graph.templates.get(node.message_template_id)
+        if not template:
+            return False
+        self.effects.messages.append(OutboundMessage(
+            node.id,
+            node.name,
+            template.id,
+            template.name,
+            resolve_text(template, self.participant.language or "English"),
+            template.type == "POLL",
+        ))
+        run_at = due_at(node, self.participant.id, self.now)
+        for dep in self.matching(self.graph.after_node.get(node.id, ())):
+            self.run_or_schedule(dep, run_at, depth, lane)
+        return True
+
+    def run_or_schedule(self, node: CompiledNode, run_at: datetime, depth: int, lane: str) -> None:
+        """
+        Run a node that is already due inline instead of scheduling it. Chains of zero-delay nodes
+        are bounded by ENGINE_INLINE_CHAIN_DEPTH; past the bound (and for any delayed node) a job is
+        scheduled in ``lane``.
+        """
+        if run_at <= self.now and depth < settings.ENGINE_INLINE_CHAIN_DEPTH:
+            self.run(node, depth + 1, lane)
+        else:
+            self.effects.jobs.append(ScheduledRun(node.id, run_at, lane))
+
+    def node_due(self, event: RunNode) -> None:
+        node = self.graph.nodes.get(event.node_id)
+        if node and self.participant.is_active:
+            self.run(node, 0, event.lane)
+
+    def keyword(self, event: KeywordReceived) -> None:
+        keyword_text = (event.text or "").strip().lower()
+        kw = self.graph.keywords.get(keyword_text)
+        if not kw:
+            return  # Not a keyword; might be poll answer
+        if kw.action_type == "DEACTIVATE_PARTICIPANT" or keyword_text == "iexit":
+            # Optional exit node/message, then deactivate and cancel pending jobs
+            exit_node = self.graph.nodes.get(kw.referenced_node_id) if kw.referenced_node_id else None
+            if exit_node and self.participant.is_active:
+                self.run(exit_node, 0, JobLane.INTERACTIVE.value)
+            self.effects.status = INACTIVE
+            self.effects.cancel_pending = True
+        elif kw.action_type == "ACTIVATE_PARTICIPANT" or keyword_text in ("iselect", "ibuy"):
+            # (Re)activate, set Start_Date to now and start the nodes referenced by the keyword or by Start_Date
+            self.effects.status = ACTIVE
+            if self.graph.start_date_variable_id:
+                self.write(self.graph.start_date_variable_id, VariableValue(value_datetime=self.now))
+            if kw.referenced_node_id:
+                start_node = self.graph.nodes.get(kw.referenced_node_id)
+                start_nodes = [start_node] if start_node else []
+            else:
+                start_nodes = self.matching(self.graph.start_nodes)
+            for node in start_nodes:
+                self.run_or_schedule(node, due_at(node, self.participant.id, self.now), 0, JobLane.BULK.value)
+
+    def poll_answer(self, event: PollAnswerReceived) -> None:
+        if not self.participant.is_active:
+            self.effects.error = "Participant not found or inactive"
+            return
+        poll_template_id = self.participant.awaiting_poll_template_id
+        template = self.graph.templates.get(poll_template_id) if poll_template_id else None
+        if not template or template.type != "POLL":
+            return  # No poll waiting; might be keyword
+        var = self.graph.variables.get(template.variable_id) if template.variable_id else None
+        if not var:
+            return
+        raw = (event.text or "").strip()
+        self.write(var.id, VariableValue(value_text=raw, value_int=parse_int(raw) if var.is_int else None))
+        # Nodes that activate AFTER this poll answer the participant directly: interactive lane
+        for dep in self.matching(self.graph.after_poll.get(template.id, ())):
+            self.run_or_schedule(dep, due_at(dep, self.participant.id, self.now), 0, JobLane.INTERACTIVE.value)
+
+
+def decide(graph: ProjectGraph, participant: ParticipantSnapshot, event: Event, now: datetime) -> Effects:
+    """The effects of ``event`` for ``participant`` at ``now`` (no database access)."""
+    decision = _Decision(graph, participant, now)
+    if isinstance(event, RunNode):
+        decision.node_due(event)
+    elif isinstance(event, KeywordReceived):
+        decision.keyword(event)
+    elif isinstance(event, PollAnswerReceived):
+        decision.poll_answer(event)
+    else:
+        raise TypeError(f"Unknown protocol event: {event!r}")
+    return decision.effects
+
+
+def advance(participant: ParticipantSnapshot, effects: Effects) -> ParticipantSnapshot:
+    """The participant's snapshot once ``effects`` are applied (for deciding the next event in memory)."""
+    values = dict(participant.values)
+    values.update((w.variable_id, w.value) for w in effects.variables)
+    awaiting = participant.awaiting_poll_template_id
+    for message in effects.messages:
+        if message.is_poll:
+            awaiting = message.template_id
+    return replace(
+        participant,
+        status=effects.status or participant.status,
+        values=values,
+        awaiting_poll_template_id=awaiting,
+    )
@@ -0,0 +1,125 @@
+"""
+Token-bucket rate limits for the scheduler (per project) and the dispatcher (per channel).
+
+A bucket holds up to ``rate * RATE_LIMIT_BURST_SECONDS`` tokens and refills at ``rate``
+tokens per second; one token is one job executed or one message sent. Work over the
+limit is never held while waiting: the scheduler claims only what the bucket grants and
+paces the rest by moving run_at forward (see pace_slots), the dispatcher claims only
+what its channel bucket grants. Buckets live in the process, so with several scheduler
+processes each enforces the limit on its own share.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Hashable, Optional
+
+from app.config import settings
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, now: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def available(self, now: float) -> int:
+        self._refill(now)
+        return int(self.tokens)
+
+    def take(self, count: int, now: float) -> int:
+        """Take up to ``count`` whole tokens; returns how many were granted."""
+        self._refill(now)
+        granted = max(0, min(count, int(self.tokens)))
+        self.tokens -= granted
+        return granted
+
+    def wait_seconds(self, count: int, now: float) -> float:
+        """Seconds until ``count`` tokens are available (0 if they already are)."""
+        self._refill(now)
+        return max(0.0, (min(count, self.capacity) - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    Token buckets by key (project id, channel name), created on first use. ``rate_for(key)``
+    gives the key's rate in tokens per second; 0 or None means unlimited.
+    """
+
+    def __init__(
+        self,
+        rate_for: Callable[[Hashable], Optional[float]],
+        burst_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate_for = rate_for
+        self.burst_seconds = burst_seconds if burst_seconds is not None else settings.RATE_LIMIT_BURST_SECONDS
+        self.clock = clock
+        self._buckets: dict[Hashable, TokenBucket] = {}
+        self._horizons: dict[Hashable, datetime] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: Hashable) -> Optional[TokenBucket]:
+        rate = self.rate_for(key)
+        if not rate or rate <= 0:
+            return None
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.rate != rate:
+            bucket = self._buckets[key] = TokenBucket(rate, rate * self.burst_seconds, self.clock())
+        return bucket
+
+    def limited(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._bucket(key) is not None
+
+    def available(self, key: Hashable) -> Optional[int]:
+        """Whole tokens available now, or None if the key is unlimited."""
+        with self._lock:
+            bucket = self._bucket(key)
+            return None if bucket is None else bucket.available(self.clock())
+
+    def take(self, key: Hashable, count: int) -> int:
+        with self._lock:
+            bucket = self._bucket(key)
+            return count if bucket is None else bucket.take(count, self.clock())
+
+    def wait_seconds(self, key: Hashable, count: int = 1) -> float:
+        with self._lock:
+            bucket = self._bucket(key)
+            return 0.0 if bucket is None else bucket.wait_seconds(count, self.clock())
+
+    def pace_slots(self, key: Hashable, count: int, now: datetime) -> list[datetime]:
+        """
+        ``count`` future run times spaced at the key's rate, starting when the bucket next has a
+        token and continuing after the slots handed out by earlier calls, so deferred work becomes
+        due no faster than it can be granted.
+        """
+        with self._lock:
+            bucket = self._bucket(key)
+            if bucket is None or count <= 0:
+                return [now] * max(0, count)
+            start = now + timedelta(seconds=bucket.wait_seconds(1, self.clock()))
+            horizon = self._horizons.get(key)
+            if horizon is not None and horizon > start:
+                start = horizon
+            step = timedelta(seconds=1.0 / bucket.rate)
+            slots = [start + step * i for i in range(count)]
+            self._horizons[key] = slots[-1] + step
+            return slots
+
+
+def project_rate(project_id: Optional[str]) -> Optional[float]:
+    """Jobs per second allowed for a project (per-project override, else the default; jobs without one: unlimited)."""
+    if project_id is None:
+        return None
+    return settings.RATE_LIMIT_PROJECTS.get(project_id, settings.RATE_LIMIT_PROJECT_PER_SECOND)
+
+
+def channel_rate(channel: str) -> Optional[float]:
+    """Messages per second allowed for a channel (None = unlimited)."""
+    return settings.RATE_LIMIT_CHANNELS.get(channel)
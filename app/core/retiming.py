@@ -0,0 +1,200 @@
+"""
+Rescheduling pending jobs when a TimingElement changes.
+
+A pending job's run_at came from the timing that produced it -- its node's, or its
+source node's for AFTER_NODE dependents (see app.core.protocol) -- applied to when it
+was scheduled (created_at): origin + delay, moved forward onto the participant's phase
+when the timing spreads (app.core.spread). Retiming moves each job by the difference
+between its old and new due time from that origin, so offsets added later (pacing)
+are kept. Campaign jobs keep their run_at.
+
+When the spread window stays the same and the delay changes by whole windows (or the
+timing does not spread), every job moves by exactly the delay change, so one UPDATE
+retimes them all on PostgreSQL and SQLite. Any other change depends on each
+participant's phase, which run_at alone cannot give once pacing has moved a job; those
+jobs (and other dialects) are rewritten from Python in batches of executemany UPDATEs.
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Iterator, Mapping, NamedTuple, Optional
+
+from sqlalchemy import bindparam, cast, func, literal, select, update, String
+from sqlalchemy.orm import Session
+
+from app.core.graph import TIMING_FIELDS, spread_from_timing, timedelta_from_timing
+from app.core.spread import spread_run_at
+from app.core.wakeup import record_scheduled
+from app.models import Node, ScheduledJob, TimingElement
+from app.models.scheduled_job import JobStatus
+
+BATCH_SIZE = 5000
+
+
+class RetimeResult(NamedTuple):
+    jobs: int  # pending jobs scheduled with the timing
+    shifted_jobs: int  # of those, jobs whose run_at changes
+    shift_seconds: float  # change of the delay itself
+    min_shift_seconds: Optional[float] = None  # actual moves (spreading rounds them to the window)
+    max_shift_seconds: Optional[float] = None
+
+
+def due_shift(
+    participant_id: str,
+    origin: datetime,
+    delay: timedelta,
+    spread: timedelta,
+    new_delay: timedelta,
+    new_spread: timedelta,
+) -> timedelta:
+    """How far a job scheduled at ``origin`` moves when its timing changes."""
+    return spread_run_at(origin + new_delay, participant_id, new_spread) - spread_run_at(
+        origin + delay, participant_id, spread
+    )
+
+
+def proposed_timing(timing: TimingElement, changes: Mapping[str, Optional[int]]) -> SimpleNamespace:
+    """The timing's fields with ``changes`` applied (None leaves a field as it is)."""
+    unknown = set(changes) - set(TIMING_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown timing field(s): {', '.join(sorted(unknown))}")
+    values = {name: getattr(timing, name) or 0 for name in TIMING_FIELDS}
+    values.update((name, value) for name, value in changes.items() if value is not None)
+    return SimpleNamespace(**values)
+
+
+def timing_node_ids(db: Session, timing_id: str) -> list[str]:
+    """Nodes whose jobs are scheduled with this timing (own timing, or the source node's for AFTER_NODE)."""
+    sources = select(Node.id).where(Node.schedule_timing_id == timing_id)
+    return list(db.execute(
+        select(Node.id).where(
+            ((Node.activation_type != "AFTER_NODE") & (Node.schedule_timing_id == timing_id))
+            | ((Node.activation_type == "AFTER_NODE") & Node.activation_source_node_id.in_(sources))
+        )
+    ).scalars())
+
+
+def _affected(node_ids: list[str]) -> tuple:
+    return (
+        ScheduledJob.status == JobStatus.PENDING.value,
+        ScheduledJob.node_id.in_(node_ids),
+        ScheduledJob.campaign_id.is_(None),
+    )
+
+
+def _plus(db: Session, when, seconds):
+    """SQL ``when + seconds`` for a DateTime column (SQLite stores them as ISO text)."""
+    if db.get_bind().dialect.name == "sqlite":
+        modifier = cast(seconds, String) + literal(" seconds")
+        moved = func.strftime("%Y-%m-%d %H:%M:%S", when, modifier, type_=String)
+        return moved + func.substr(when, 20, type_=String)  # keep the stored microseconds
+    return when + func.make_interval(0, 0, 0, 0, 0, 0, seconds)
+
+
+def _uniform_shift(db: Session, delay: timedelta, spread: timedelta, new_delay: timedelta, new_spread: timedelta) -> bool:
+    """Whether every job moves by the delay change itself (see the module docstring)."""
+    window = int(spread.total_seconds())
+    change = int((new_delay - delay).total_seconds())
+    return (
+        spread == new_spread
+        and (not window or change % window == 0)
+        and db.get_bind().dialect.name in ("postgresql", "sqlite")
+    )
+
+
+def _job_batches(db: Session, node_ids: list[str]) -> Iterator[list]:
+    last = ""
+    while True:
+        rows = db.execute(
+            select(ScheduledJob.id, ScheduledJob.participant_id, ScheduledJob.run_at, ScheduledJob.created_at)
+            .where(*_affected(node_ids), ScheduledJob.id > last)
+            .order_by(ScheduledJob.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        last = rows[-1].id
+        yield rows
+
+
+def _python_moves(db: Session, node_ids: list[str], delay, spread, new_delay, new_spread) -> Iterator[list[tuple]]:
+    """(job id, new run_at, move) for every affected job, computed per participant."""
+    for rows in _job_batches(db, node_ids):
+        moves = []
+        for r in rows:
+            origin = r.created_at or r.run_at - delay
+            shift = due_shift(r.participant_id, origin, delay, spread, new_delay, new_spread)
+            moves.append((r.id, r.run_at + shift, shift))
+        yield moves
+
+
+def retime_pending_jobs(
+    db: Session,
+    timing: TimingElement,
+    new_timing,
+    apply: bool = True,
+) -> RetimeResult:
+    """
+    Move the pending jobs scheduled with ``timing`` to where ``new_timing`` (anything with
+    TimingElement's fields) would have put them. With ``apply=False`` only count and measure
+    the moves (the preview); otherwise update run_at (no commit).
+    """
+    delay, spread = timedelta_from_timing(timing), spread_from_timing(timing)
+    new_delay, new_spread = timedelta_from_timing(new_timing), spread_from_timing(new_timing)
+    change = (new_delay - delay).total_seconds()
+    node_ids = timing_node_ids(db, timing.id)
+    if not node_ids:
+        return RetimeResult(0, 0, change)
+
+    if _uniform_shift(db, delay, spread, new_delay, new_spread):
+        jobs = db.execute(select(func.count()).where(*_affected(node_ids))).scalar()
+        if apply and jobs and change:
+            db.execute(
+                update(ScheduledJob)
+                .where(*_affected(node_ids))
+                .values(run_at=_plus(db, ScheduledJob.run_at, int(change)))
+                .execution_options(synchronize_session=False)
+            )
+        shifted = jobs if change else 0
+        result = RetimeResult(jobs, shifted, change, *((change, change) if jobs else (None, None)))
+    else:
+        jobs = shifted = 0
+        low = high = None
+        table = ScheduledJob.__table__
+        for moves in _python_moves(db, node_ids, delay, spread, new_delay, new_spread):
+            jobs += len(moves)
+            changed = [(job_id, run_at) for job_id, run_at, shift in moves if shift]
+            shifted += len(changed)
+            seconds = [shift.total_seconds() for _, _, shift in moves]
+            low = min(seconds) if low is None else min(low, *seconds)
+            high = max(seconds) if high is None else max(high, *seconds)
+            if apply and changed:
+                db.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("b_id"), table.c.status == JobStatus.PENDING.value)
+                    .values(run_at=bindparam("b_run_at")),
+                    [{"b_id": job_id, "b_run_at": run_at} for job_id, run_at in changed],
+                )
+        result = RetimeResult(jobs, shifted, change, low, high)
+    if apply and result.shifted_jobs:
+        earliest = db.execute(select(func.min(ScheduledJob.run_at)).where(*_affected(node_ids))).scalar()
+        if earliest is not None:
+            record_scheduled(db, earliest)
+    return result
+
+
+def update_timing(
+    db: Session,
+    timing: TimingElement,
+    changes: Mapping[str, Optional[int]],
+    reschedule: bool = False,
+) -> Optional[RetimeResult]:
+    """
+    Apply ``changes`` to a TimingElement and commit. With ``reschedule`` its pending jobs are
+    retimed in the same transaction (returns what moved); otherwise they keep their run_at.
+    """
+    new_timing = proposed_timing(timing, changes)
+    result = retime_pending_jobs(db, timing, new_timing) if reschedule else None
+    for name in TIMING_FIELDS:
+        setattr(timing, name, getattr(new_timing, name))
+    db.commit()
+    return result
@@ -1,69 +1,562 @@
 """
 Background scheduler: process PENDING scheduled jobs whose run_at <= now.
+
+Due jobs are claimed atomically (PENDING -> RUNNING in one statement), so any
+number of scheduler threads, uvicorn workers or replicas can run side by side
+without executing the same job twice. Each claimed batch is split by participant
+and executed on a pool of worker threads. A claim is a lease: jobs whose worker
+dies are reaped back to the queue, and failing jobs are retried with capped
+exponential backoff until they are marked FAILED. Between drains the scheduler sleeps
+until the next due run_at (see app.core.wakeup) rather than polling.
+
+Jobs are claimed per lane (JobLane): every lane has a reserved share of each batch, so
+replies a participant is waiting for never queue behind a bulk backlog, and bulk work
+still progresses under interactive load. Within a lane the batch is shared
+round-robin between the projects that have due jobs, and a project's share is capped
+by its token bucket (app.core.ratelimit); due jobs a throttled project cannot run yet
+are paced by moving their run_at forward in bulk.
 """
+import itertools
+import os
+import socket
 import threading
 import time
-from datetime import datetime
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple, Optional, Sequence
+
+from sqlalchemy import bindparam, exists, func, or_, select, update
+from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.db import SessionLocal
-from app.core.engine import execute_node
-from app.models import ScheduledJob
-from app.models.scheduled_job import JobStatus
+from app.db import SessionLocal, engine
+from app.core.clock import utcnow
+from app.core.engine import execute_nodes_batch
+from app.core.metrics import jobs_executed, jobs_failed, scheduler_lag
+from app.core.ratelimit import RateLimiter, project_rate
+from app.core.wakeup import due_times, record_scheduled, start_listener
+from app.models import Project, ScheduledJob
+from app.models.scheduled_job import JobLane, JobStatus
 
 
-def _run_scheduler_once():
-    """Process one batch of due jobs."""
-    db = SessionLocal()
-    try:
-        now = datetime.utcnow()
-        jobs = (
-            db.query(ScheduledJob)
-            .filter(
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+LANES = tuple(lane.value for lane in JobLane)  # priority order
+
+
+class ClaimedJob(NamedTuple):
+    id: str
+    participant_id: str
+    node_id: str
+    attempts: int
+    lane: str = JobLane.BULK.value
+    run_at: Optional[datetime] = None
+
+
+def _new_lease_token() -> str:
+    """Identifies one claim: the worker process plus a per-claim suffix (used to fence DONE updates)."""
+    return f"{WORKER_ID}/{uuid.uuid4().hex[:12]}"
+
+
+def claim_due_jobs(
+    db: Session,
+    limit: int,
+    lease_token: Optional[str] = None,
+    now: Optional[datetime] = None,
+    filters: Sequence = (),
+) -> list[ClaimedJob]:
+    """
+    Lease up to ``limit`` due PENDING jobs (status RUNNING, claimed_by, lease_expires_at,
+    attempts + 1) and return them; the caller commits. ``filters`` narrows the candidates
+    (e.g. to one project).
+
+    On PostgreSQL the candidate rows are selected with FOR UPDATE SKIP LOCKED inside a single
+    UPDATE ... RETURNING, so concurrent claimers skip each other's rows instead of blocking or
+    double-claiming. SQLite serializes writers, so the same single statement is atomic there too.
+    Dialects without UPDATE ... RETURNING fall back to per-row compare-and-set updates.
+    """
+    now = now or utcnow()
+    lease_token = lease_token or _new_lease_token()
+    lease = {
+        "status": JobStatus.RUNNING.value,
+        "claimed_by": lease_token,
+        "lease_expires_at": now + timedelta(seconds=settings.SCHEDULER_LEASE_SECONDS),
+        "attempts": func.coalesce(ScheduledJob.attempts, 0) + 1,
+        "started_at": now,
+    }
+    dialect = db.get_bind().dialect
+    candidates = (
+        select(ScheduledJob.id)
+        .where(
+            ScheduledJob.status == JobStatus.PENDING.value,
+            ScheduledJob.run_at <= now,
+            *filters,
+        )
+        .order_by(ScheduledJob.run_at)
+        .limit(limit)
+    )
+    if dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    columns = (
+        ScheduledJob.id,
+        ScheduledJob.participant_id,
+        ScheduledJob.node_id,
+        ScheduledJob.attempts,
+        ScheduledJob.lane,
+        ScheduledJob.run_at,
+    )
+    if dialect.update_returning:
+        stmt = (
+            update(ScheduledJob)
+            .where(
+                ScheduledJob.id.in_(candidates),
                 ScheduledJob.status == JobStatus.PENDING.value,
-                ScheduledJob.run_at <= now,
             )
-            .limit(50)
-            .all()
+            .values(**lease)
+            .returning(*columns)
+            .execution_options(synchronize_session=False)
         )
-        for job in jobs:
-            try:
-                job.status = JobStatus.RUNNING.value
-                db.commit()
-                job_db = SessionLocal()
-                try:
-                    execute_node(job_db, job.participant_id, job.node_id)
-                finally:
-                    job_db.close()
-                job.status = JobStatus.DONE.value
-                db.commit()
-            except Exception:
-                db.rollback()
-                job.status = JobStatus.PENDING.value
-                db.commit()
+        return [ClaimedJob(*row) for row in db.execute(stmt).all()]
+
+    claimed = []
+    for row in db.execute(select(*columns).where(ScheduledJob.id.in_(candidates))).all():
+        result = db.execute(
+            update(ScheduledJob)
+            .where(ScheduledJob.id == row.id, ScheduledJob.status == JobStatus.PENDING.value)
+            .values(**lease)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            claimed.append(ClaimedJob(*row)._replace(attempts=(row.attempts or 0) + 1))
+    return claimed
+
+
+def _project_filter(project_id: Optional[str]):
+    return ScheduledJob.project_id.is_(None) if project_id is None else ScheduledJob.project_id == project_id
+
+
+def due_projects(db: Session, now: datetime, filters: Sequence = ()) -> list[Optional[str]]:
+    """Projects with due PENDING jobs (None stands for jobs without a project), one index probe per project."""
+    def due(*where):
+        return exists().where(
+            ScheduledJob.status == JobStatus.PENDING.value, ScheduledJob.run_at <= now, *filters, *where
+        )
+
+    projects = list(db.execute(
+        select(Project.id).where(due(ScheduledJob.project_id == Project.id)).order_by(Project.id)
+    ).scalars())
+    if db.execute(select(due(ScheduledJob.project_id.is_(None)))).scalar():
+        projects.append(None)
+    return projects
+
+
+_round_robin = itertools.count()
+
+
+def claim_fair(
+    db: Session,
+    limit: int,
+    lease_token: str,
+    limiter: Optional[RateLimiter] = None,
+    now: Optional[datetime] = None,
+    filters: Sequence = (),
+) -> tuple[list[ClaimedJob], list[Optional[str]]]:
+    """
+    Claim up to ``limit`` due jobs shared round-robin between projects: every project with due
+    jobs gets an equal share (capacity a project leaves unused goes to the others), capped by the
+    tokens its bucket grants. Returns the claimed jobs and the projects that still have due jobs
+    but no tokens left (to be paced). ``filters`` narrows the jobs (e.g. to one lane). The caller commits.
+    """
+    now = now or utcnow()
+    projects = due_projects(db, now, filters)
+    if projects:
+        start = next(_round_robin) % len(projects)
+        projects = projects[start:] + projects[:start]
+    claimed: list[ClaimedJob] = []
+    throttled: list[Optional[str]] = []
+    remaining = limit
+    while remaining > 0 and projects:
+        share = max(1, remaining // len(projects))
+        more = []
+        for project_id in projects:
+            if remaining <= 0:
+                break
+            quota = min(share, remaining)
+            allowed = limiter.available(project_id) if limiter is not None else None
+            if allowed is not None and allowed < quota:
+                quota = allowed
+                throttled.append(project_id)
+            if quota <= 0:
+                continue
+            jobs = claim_due_jobs(db, quota, lease_token, now, filters=(*filters, _project_filter(project_id)))
+            if limiter is not None:
+                limiter.take(project_id, len(jobs))
+            claimed.extend(jobs)
+            remaining -= len(jobs)
+            if len(jobs) < quota and project_id in throttled:
+                throttled.remove(project_id)  # ran out of due jobs before tokens
+            elif len(jobs) == quota and project_id not in throttled:
+                more.append(project_id)
+        projects = more
+    return claimed, throttled
+
+
+def pace_due_jobs(
+    db: Session,
+    project_id: str,
+    limiter: RateLimiter,
+    limit: int,
+    now: Optional[datetime] = None,
+    filters: Sequence = (),
+) -> int:
+    """
+    Move up to ``limit`` of a throttled project's due PENDING jobs (oldest first) to future run
+    times spaced at the project's rate, in one executemany UPDATE, so they become due as tokens
+    refill instead of being claimed and held. Returns the number of jobs paced; the caller commits.
+    """
+    now = now or utcnow()
+    ids = list(db.execute(
+        select(ScheduledJob.id)
+        .where(
+            ScheduledJob.status == JobStatus.PENDING.value,
+            ScheduledJob.run_at <= now,
+            _project_filter(project_id),
+            *filters,
+        )
+        .order_by(ScheduledJob.run_at)
+        .limit(limit)
+    ).scalars())
+    if not ids:
+        return 0
+    slots = limiter.pace_slots(project_id, len(ids), now)
+    table = ScheduledJob.__table__
+    db.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"), table.c.status == JobStatus.PENDING.value)
+        .values(run_at=bindparam("b_run_at")),
+        [{"b_id": job_id, "b_run_at": run_at} for job_id, run_at in zip(ids, slots)],
+    )
+    record_scheduled(db, slots[0])
+    return len(ids)
+
+
+def lane_reservations(limit: int) -> dict[str, int]:
+    """Slots of a ``limit``-job batch reserved for each lane (SCHEDULER_LANE_RESERVED), in priority order."""
+    reserved: dict[str, int] = {}
+    left = limit
+    for lane in LANES:
+        reserved[lane] = min(left, int(limit * settings.SCHEDULER_LANE_RESERVED.get(lane, 0)))
+        left -= reserved[lane]
+    return reserved
+
+
+def claim_lanes(
+    db: Session,
+    limit: int,
+    lease_token: str,
+    limiter: Optional[RateLimiter] = None,
+    now: Optional[datetime] = None,
+    filters: Sequence = (),
+) -> tuple[list[ClaimedJob], list[tuple[Optional[str], str]]]:
+    """
+    Claim up to ``limit`` due jobs lane by lane: first each lane's reserved slots, then the capacity
+    left over, offered to the lanes in priority order. Each lane's claim is fair across projects
+    (claim_fair); ``filters`` narrows the candidates. Returns the claimed jobs and the throttled
+    (project, lane) pairs. The caller commits.
+    """
+    now = now or utcnow()
+    claimed: list[ClaimedJob] = []
+    throttled: dict[tuple[Optional[str], str], None] = {}
+    hungry = []
+    for lane, quota in lane_reservations(limit).items():
+        jobs: list[ClaimedJob] = []
+        if quota > 0:
+            jobs, lane_throttled = claim_fair(db, quota, lease_token, limiter, now, (ScheduledJob.lane == lane, *filters))
+            claimed.extend(jobs)
+            throttled.update(dict.fromkeys((project_id, lane) for project_id in lane_throttled))
+        if len(jobs) == quota:
+            hungry.append(lane)
+    for lane in hungry:
+        remaining = limit - len(claimed)
+        if remaining <= 0:
+            break
+        jobs, lane_throttled = claim_fair(db, remaining, lease_token, limiter, now, (ScheduledJob.lane == lane, *filters))
+        claimed.extend(jobs)
+        throttled.update(dict.fromkeys((project_id, lane) for project_id in lane_throttled))
+    return claimed, list(throttled)
+
+
+class LaneStats:
+    """Per-lane claim counters and claim lag (claim time - run_at) of this process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.claimed = dict.fromkeys(LANES, 0)
+        self.last_lag = dict.fromkeys(LANES, 0.0)
+        self.max_lag = dict.fromkeys(LANES, 0.0)
+
+    def record(self, jobs: list[ClaimedJob], now: datetime) -> None:
+        with self._lock:
+            for lane in LANES:
+                lags = [(now - job.run_at).total_seconds() for job in jobs if job.lane == lane and job.run_at]
+                if not lags:
+                    continue
+                self.claimed[lane] += len(lags)
+                self.last_lag[lane] = max(lags)
+                self.max_lag[lane] = max(self.max_lag[lane], self.last_lag[lane])
+
+
+lane_stats = LaneStats()
+
+
+def lane_lag(db: Session, now: Optional[datetime] = None) -> list[dict]:
+    """
+    Per-lane backlog and lag: due PENDING jobs, the oldest due run_at and how long it has waited,
+    plus this process's claim counters.
+    """
+    now = now or utcnow()
+    rows = {
+        lane: (count, oldest)
+        for lane, count, oldest in db.query(
+            ScheduledJob.lane, func.count(), func.min(ScheduledJob.run_at)
+        )
+        .filter(ScheduledJob.status == JobStatus.PENDING.value, ScheduledJob.run_at <= now)
+        .group_by(ScheduledJob.lane)
+    }
+    lanes = []
+    for lane in LANES:
+        due, oldest = rows.get(lane, (0, None))
+        lanes.append({
+            "lane": lane,
+            "due": due,
+            "oldest_due_at": oldest,
+            "lag_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+            "claimed": lane_stats.claimed[lane],
+            "last_claim_lag_seconds": lane_stats.last_lag[lane],
+            "max_claim_lag_seconds": lane_stats.max_lag[lane],
+        })
+    return lanes
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Capped exponential backoff after the given number of attempts."""
+    seconds = settings.SCHEDULER_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1))
+    return timedelta(seconds=min(seconds, settings.SCHEDULER_RETRY_MAX_SECONDS))
+
+
+def fail_jobs(
+    db: Session,
+    failures: list[tuple[ClaimedJob, str]],
+    lease_token: str,
+    now: Optional[datetime] = None,
+) -> None:
+    """
+    Release failed jobs still held under lease_token: back to PENDING after a backoff, or FAILED once
+    SCHEDULER_MAX_ATTEMPTS is reached. One UPDATE per distinct (attempt count, error).
+    """
+    now = now or utcnow()
+    groups: dict[tuple[int, str], list[str]] = {}
+    for job, error in failures:
+        groups.setdefault((job.attempts, (error or "")[:1000]), []).append(job.id)
+    for (attempts, error), job_ids in groups.items():
+        if attempts >= settings.SCHEDULER_MAX_ATTEMPTS:
+            values = {"status": JobStatus.FAILED.value, "finished_at": now}
+        else:
+            values = {"status": JobStatus.PENDING.value, "run_at": now + retry_delay(attempts)}
+        db.execute(
+            update(ScheduledJob)
+            .where(
+                ScheduledJob.id.in_(job_ids),
+                ScheduledJob.claimed_by == lease_token,
+                ScheduledJob.status == JobStatus.RUNNING.value,
+            )
+            .values(claimed_by=None, lease_expires_at=None, last_error=error, **values)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+
+def reap_expired_leases(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Return RUNNING jobs whose lease expired (their worker died or hung) to the queue, or mark them
+    FAILED if they already used all attempts. Returns the number of jobs reaped.
+    """
+    now = now or utcnow()
+    expired = (
+        ScheduledJob.status == JobStatus.RUNNING.value,
+        or_(ScheduledJob.lease_expires_at.is_(None), ScheduledJob.lease_expires_at < now),
+    )
+    reset = {"claimed_by": None, "lease_expires_at": None, "last_error": "lease expired"}
+    exhausted = db.execute(
+        update(ScheduledJob)
+        .where(*expired, func.coalesce(ScheduledJob.attempts, 0) >= settings.SCHEDULER_MAX_ATTEMPTS)
+        .values(status=JobStatus.FAILED.value, finished_at=now, **reset)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    requeued = db.execute(
+        update(ScheduledJob)
+        .where(*expired)
+        .values(status=JobStatus.PENDING.value, **reset)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return exhausted + requeued
+
+
+def _execute_claimed(
+    jobs: list[ClaimedJob],
+    lease_token: str,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> None:
+    """Execute one chunk of claimed jobs in its own session; failures are retried with backoff."""
+    db = session_factory()
+    try:
+        try:
+            outcomes = execute_nodes_batch(
+                db,
+                [(job.participant_id, job.node_id) for job in jobs],
+                [job.id for job in jobs],
+                lease_token,
+                [job.lane for job in jobs],
+            )
+        except Exception as exc:
+            db.rollback()
+            error = str(exc) or exc.__class__.__name__
+            for job in jobs:
+                jobs_failed.inc(job.lane)
+            fail_jobs(db, [(job, error) for job in jobs], lease_token)
+            return
+        failed = [(job, outcome.error) for job, outcome in zip(jobs, outcomes) if outcome.error is not None]
+        for job, outcome in zip(jobs, outcomes):
+            (jobs_failed if outcome.error is not None else jobs_executed).inc(job.lane)
+        if failed:
+            fail_jobs(db, failed, lease_token)
+    finally:
+        db.close()
+
+
+def _partition(jobs: list[ClaimedJob], parts: int) -> list[list[ClaimedJob]]:
+    """Split jobs into chunks, keeping each participant's jobs in one chunk (and in run_at order)."""
+    chunks: list[list[ClaimedJob]] = [[] for _ in range(max(1, parts))]
+    for job in jobs:
+        chunks[hash(job.participant_id) % len(chunks)].append(job)
+    return [chunk for chunk in chunks if chunk]
+
+
+limiter = RateLimiter(project_rate)
+
+
+def _run_scheduler_once(
+    executor: Optional[ThreadPoolExecutor] = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+    filters: Sequence = (),
+) -> int:
+    """
+    Claim one batch of due jobs (lane reservations, fair across projects, rate-limited) and execute
+    it, pacing the due jobs of throttled projects in the same transaction as the claim. ``filters``
+    narrows the jobs considered (e.g. to one project). Returns the number of jobs claimed.
+    """
+    lease_token = _new_lease_token()
+    now = utcnow()
+    db = session_factory()
+    try:
+        claimed, throttled = claim_lanes(db, settings.SCHEDULER_BATCH_SIZE, lease_token, limiter, now, filters)
+        for project_id, lane in throttled:
+            pace_due_jobs(
+                db, project_id, limiter, settings.SCHEDULER_BATCH_SIZE, now, (ScheduledJob.lane == lane, *filters)
+            )
+        db.commit()
     finally:
         db.close()
+    lane_stats.record(claimed, now)
+    for job in claimed:
+        if job.run_at is not None:
+            scheduler_lag.observe(max(0.0, (now - job.run_at).total_seconds()), job.lane)
+    if not claimed:
+        return 0
+    claimed.sort(key=lambda job: job.run_at or now)  # lanes were claimed separately; keep run_at order per participant
+    chunks = _partition(claimed, settings.SCHEDULER_WORKERS)
+    if executor is None or len(chunks) == 1:
+        for chunk in chunks:
+            _execute_claimed(chunk, lease_token, session_factory)
+    else:
+        list(executor.map(_execute_claimed, chunks, [lease_token] * len(chunks), [session_factory] * len(chunks)))
+    return len(claimed)
+
+
+def _reap() -> None:
+    db = SessionLocal()
+    try:
+        reap_expired_leases(db)
+    finally:
+        db.close()
+
+
+def _next_due_at(db: Session) -> Optional[datetime]:
+    """Earliest run_at among PENDING jobs (primes the in-memory due-time heap)."""
+    return db.query(func.min(ScheduledJob.run_at)).filter(
+        ScheduledJob.status == JobStatus.PENDING.value
+    ).scalar()
+
+
+def _prime_due_times() -> None:
+    db = SessionLocal()
+    try:
+        next_due = _next_due_at(db)
+    finally:
+        db.close()
+    if next_due is not None:
+        due_times.push(next_due)
 
 
 _running = False
 _thread = None
+_stop_listener: Optional[threading.Event] = None
 
 
 def start_scheduler():
-    """Start background thread that polls scheduled jobs."""
-    global _running, _thread
+    """
+    Start the background scheduler thread.
+
+    It drains due jobs, then sleeps until the earliest known run_at (or until a wakeup arrives from
+    this or another process); SCHEDULER_POLL_INTERVAL_SECONDS only bounds how long it idles.
+    """
+    global _running, _thread, _stop_listener
     if _running:
         return
     _running = True
-    interval = max(1, getattr(settings, "SCHEDULER_POLL_INTERVAL_SECONDS", 1))
+    max_idle = max(1, getattr(settings, "SCHEDULER_POLL_INTERVAL_SECONDS", 30))
+    _stop_listener = threading.Event()
+    start_listener(engine, due_times, _stop_listener)
 
     def loop():
-        while _running:
-            try:
-                _run_scheduler_once()
-            except Exception:
-                pass
-            time.sleep(interval)
+        with ThreadPoolExecutor(
+            max_workers=max(1, settings.SCHEDULER_WORKERS),
+            thread_name_prefix="scheduler-worker",
+        ) as executor:
+            next_reap = 0.0
+            while _running:
+                if time.monotonic() >= next_reap:
+                    try:
+                        _reap()
+                    except Exception:
+                        pass
+                    next_reap = time.monotonic() + settings.SCHEDULER_REAP_INTERVAL_SECONDS
+                try:
+                    claimed = _run_scheduler_once(executor)
+                except Exception:
+                    claimed = 0
+                # A full batch means more work is probably due: drain without sleeping.
+                if claimed >= settings.SCHEDULER_BATCH_SIZE:
+                    continue
+                try:
+                    _prime_due_times()
+                except Exception:
+                    pass
+                due_times.wait(min(max_idle, max(0.0, next_reap - time.monotonic())))
 
     _thread = threading.Thread(target=loop, daemon=True)
     _thread.start()
@@ -73,3 +566,6 @@ def stop_scheduler():
     """Stop the background scheduler."""
     global _running
     _running = False
+    if _stop_listener is not None:
+        _stop_listener.set()
+    due_times.wake()
@@ -0,0 +1,345 @@
+"""
+Discrete-event simulation of a protocol in virtual time.
+
+A project's configuration is copied into a scratch database (in-memory SQLite by
+default) together with a synthetic population, and the real engine and scheduler
+code paths run under a VirtualClock (app.core.clock): participants are enrolled
+with the project's activation keyword, due jobs are claimed and executed in
+scheduler-sized batches, and every poll a participant receives is answered after a
+scripted delay with a scripted answer distribution. Between events the clock jumps
+straight to the next due job, answer or enrollment, so 30 days of protocol cost
+only the work done in them.
+
+Event times are rounded up to ``resolution`` (a minute by default), which groups
+work into batches the way a loaded scheduler would; set it to zero for exact times.
+Rate limits apply in virtual time. The report gives message volume per hour, the
+peak minute and hour, the most jobs due at one instant and the most polls open
+(sent, answer pending) at once.
+
+Jobs deliberately go through the scheduler's claim, pacing, lease and retry code, not
+just app.core.protocol.decide(): the peaks it reports come from that code, which reads
+and writes the jobs table. Evaluating flows alone needs no database (advance() a
+snapshot through decide()).
+"""
+import heapq
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Mapping, Optional
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.core.clock import VirtualClock, use_clock
+from app.core.engine import activate_participants, execute_nodes_batch, process_poll_answers_batch
+from app.core.events import MESSAGE, ConversationEvent, bus
+from app.core.graph import ProjectGraph, get_project_graph
+from app.core.ratelimit import RateLimiter, project_rate
+from app.core.scheduler import claim_lanes, fail_jobs, pace_due_jobs
+from app.db import Base
+from app.models import (
+    Keyword,
+    MessageTemplate,
+    Node,
+    NodeCondition,
+    Participant,
+    Project,
+    ScheduledJob,
+    TimingElement,
+    Variable,
+)
+from app.models.scheduled_job import JobLane, JobStatus
+
+
+class SimulationError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class AnswerScript:
+    """How a population answers one poll: weighted answers, how many answer at all, and how fast."""
+
+    answers: Mapping[str, float]  # answer text -> weight
+    response_rate: float = 1.0
+    delay_minutes: tuple[float, float] = (1.0, 60.0)  # uniform range
+
+
+@dataclass
+class SimulationReport:
+    participants: int
+    start: datetime
+    end: datetime
+    wall_seconds: float = 0.0
+    messages: int = 0
+    answers: int = 0
+    jobs: int = 0
+    messages_per_hour: list[dict] = field(default_factory=list)  # {"hour": start of hour, "messages": n}
+    peak_messages_per_hour: int = 0
+    peak_hour: Optional[datetime] = None
+    peak_messages_per_minute: int = 0
+    peak_due_jobs: int = 0  # most jobs due at one instant
+    peak_due_at: Optional[datetime] = None
+    peak_open_polls: int = 0  # most polls sent whose (scripted) answer had not arrived yet
+
+
+def scratch_session_factory(url: Optional[str] = None) -> Callable[[], Session]:
+    """Sessions on a fresh scratch database with all tables (in-memory SQLite when ``url`` is None)."""
+    if url is None:
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def clone_project(source: Session, target: Session, project_id: str) -> None:
+    """Copy a project's configuration rows (same ids) into another database and commit."""
+    def rows(model, *where) -> list[dict]:
+        table = model.__table__
+        return [dict(row._mapping) for row in source.execute(select(table).where(*where))]
+
+    project = rows(Project, Project.id == project_id)
+    if not project:
+        raise SimulationError("Project not found")
+    nodes = rows(Node, Node.project_id == project_id)
+    # Parents before the nodes that follow them, for databases that check foreign keys per row.
+    ids = {n["id"] for n in nodes}
+    ordered, placed = [], set()
+    while nodes:
+        ready = [n for n in nodes if n["activation_source_node_id"] not in ids - placed] or nodes
+        ordered.extend(ready)
+        placed.update(n["id"] for n in ready)
+        nodes = [n for n in nodes if n["id"] not in placed]
+    for model, values in (
+        (Project, project),
+        (TimingElement, rows(TimingElement, TimingElement.project_id == project_id)),
+        (Variable, rows(Variable, Variable.project_id == project_id)),
+        (MessageTemplate, rows(MessageTemplate, MessageTemplate.project_id == project_id)),
+        (Node, ordered),
+        (NodeCondition, rows(NodeCondition, NodeCondition.node_id.in_([n["id"] for n in ordered]))),
+        (Keyword, rows(Keyword, Keyword.project_id == project_id)),
+    ):
+        if values:
+            target.execute(insert(model), values)
+    target.commit()
+
+
+def _ceil(when: datetime, start: datetime, resolution: timedelta) -> datetime:
+    if not resolution:
+        return when
+    steps = math.ceil((when - start) / resolution)
+    return start + max(0, steps) * resolution
+
+
+class Simulator:
+    """Drives one scratch database (already holding the project) through virtual time."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        project_id: str,
+        scripts: Optional[Mapping[str, AnswerScript]] = None,
+        keyword: Optional[str] = None,
+        start: Optional[datetime] = None,
+        resolution: timedelta = timedelta(minutes=1),
+        batch_size: Optional[int] = None,
+        seed: int = 0,
+    ) -> None:
+        self.db = session_factory()
+        self.project_id = project_id
+        self.graph: ProjectGraph = get_project_graph(self.db, project_id)
+        if self.graph is None:
+            raise SimulationError("Project not found")
+        activations = [k for k in self.graph.keywords.values() if k.action_type == "ACTIVATE_PARTICIPANT"]
+        if keyword:
+            activations = [k for k in activations if k.keyword_text == keyword.strip().lower()]
+        if not activations:
+            raise SimulationError(f"No activation keyword {keyword!r}" if keyword else "Project has no activation keyword")
+        self.keyword = activations[0]
+        self.scripts = dict(scripts or {})
+        self.start = start or datetime(2030, 1, 1)
+        self.clock = VirtualClock(self.start)
+        self.resolution = resolution
+        self.batch_size = batch_size or max(settings.SCHEDULER_BATCH_SIZE, 1000)
+        self.rng = random.Random(seed)
+        self.limiter = RateLimiter(project_rate, clock=lambda: (self.clock.now() - self.start).total_seconds())
+        self._enrollments: list[tuple[datetime, int]] = []
+        self._answers: list[tuple[datetime, int, str, str]] = []  # (at, seq, participant id, text) heap
+        self._seq = 0
+        self._open_polls: set[str] = set()
+        self._minutes: dict[datetime, int] = {}
+        self.report = SimulationReport(0, self.start, self.start)
+
+    def enroll(self, count: int, over_hours: float = 0, at: Optional[datetime] = None) -> None:
+        """Enroll ``count`` participants, all at ``at`` (default: the start) or in hourly groups over ``over_hours``."""
+        at = at or self.start
+        hours = max(1, int(math.ceil(over_hours))) if over_hours else 1
+        for hour in range(hours):
+            size = count // hours + (1 if hour < count % hours else 0)
+            if size:
+                self._enrollments.append((at + timedelta(hours=hour), size))
+        self._enrollments.sort()
+        self.report.participants += count
+
+    def _script(self, template_id: str) -> AnswerScript:
+        template = self.graph.templates[template_id]
+        script = self.scripts.get(template.name)
+        if script is None:
+            script = AnswerScript({str(choice): 1.0 for choice in (template.choices_en or ["yes"])})
+            self.scripts[template.name] = script
+        return script
+
+    def _on_events(self, events: list[ConversationEvent]) -> None:
+        """Bus listener: count outbound messages and script the answer to every poll sent."""
+        now = self.clock.now()
+        minute = now.replace(second=0, microsecond=0)
+        for evt in events:
+            if evt.type != MESSAGE or evt.data.get("direction") != "OUTBOUND":
+                continue
+            self.report.messages += 1
+            self._minutes[minute] = self._minutes.get(minute, 0) + 1
+            template = self.graph.templates.get(evt.data.get("message_template_id"))
+            if template is None or template.type != "POLL":
+                continue
+            self._open_polls.discard(evt.participant_id)
+            script = self._script(template.id)
+            if self.rng.random() >= script.response_rate:
+                continue
+            answers, weights = zip(*script.answers.items())
+            text = self.rng.choices(answers, weights)[0]
+            delay = timedelta(minutes=self.rng.uniform(*script.delay_minutes))
+            self._seq += 1
+            heapq.heappush(self._answers, (now + delay, self._seq, evt.participant_id, text))
+            self._open_polls.add(evt.participant_id)
+        self.report.peak_open_polls = max(self.report.peak_open_polls, len(self._open_polls))
+
+    def _next_event(self) -> Optional[datetime]:
+        due = self.db.execute(
+            select(func.min(ScheduledJob.run_at)).where(ScheduledJob.status == JobStatus.PENDING.value)
+        ).scalar()
+        candidates = [t for t in (
+            due,
+            self._answers[0][0] if self._answers else None,
+            self._enrollments[0][0] if self._enrollments else None,
+        ) if t is not None]
+        if not candidates:
+            return None
+        return max(self.clock.now(), _ceil(min(candidates), self.start, self.resolution))
+
+    def _enroll_due(self, now: datetime) -> None:
+        while self._enrollments and self._enrollments[0][0] <= now:
+            _, size = self._enrollments.pop(0)
+            for offset in range(0, size, 10000):
+                ids = [str(uuid.uuid4()) for _ in range(min(10000, size - offset))]
+                self.db.execute(insert(Participant), [
+                    {"id": pid, "project_id": self.project_id, "language": "English", "channel": "web",
+                     "status": "ACTIVE", "created_at": now}
+                    for pid in ids
+                ])
+                activate_participants(self.db, self.graph, self.keyword, ids, now)
+                self.db.commit()
+
+    def _answer_due(self, now: datetime) -> None:
+        """Deliver every answer due by ``now``, in arrival order, in batches (one commit each)."""
+        due = []
+        while self._answers and self._answers[0][0] <= now:
+            _, _, participant_id, text = heapq.heappop(self._answers)
+            self._open_polls.discard(participant_id)
+            due.append((participant_id, text))
+        for offset in range(0, len(due), self.batch_size):
+            process_poll_answers_batch(self.db, due[offset:offset + self.batch_size])
+        self.report.answers += len(due)
+
+    def _drain_due(self, now: datetime) -> None:
+        due_now = 0
+        while True:
+            lease_token = f"simulator/{uuid.uuid4().hex[:12]}"
+            claimed, throttled = claim_lanes(self.db, self.batch_size, lease_token, self.limiter, now)
+            for project_id, lane in throttled:
+                pace_due_jobs(self.db, project_id, self.limiter, self.batch_size, now, (ScheduledJob.lane == lane,))
+            self.db.commit()
+            if not claimed:
+                break
+            due_now += len(claimed)
+            claimed.sort(key=lambda job: job.run_at or now)
+            outcomes = execute_nodes_batch(
+                self.db,
+                [(job.participant_id, job.node_id) for job in claimed],
+                [job.id for job in claimed],
+                lease_token,
+                [job.lane or JobLane.BULK.value for job in claimed],
+            )
+            failed = [(job, o.error) for job, o in zip(claimed, outcomes) if o.error is not None]
+            if failed:
+                fail_jobs(self.db, failed, lease_token, now)
+            self.report.jobs += len(claimed) - len(failed)
+        if due_now > self.report.peak_due_jobs:
+            self.report.peak_due_jobs, self.report.peak_due_at = due_now, now
+
+    def run(self, days: float) -> SimulationReport:
+        """Simulate ``days`` of protocol from the start (enroll first); returns the report."""
+        end = self.start + timedelta(days=days)
+        started = time.perf_counter()
+        bus.add_listener(self._on_events)
+        try:
+            with use_clock(self.clock):
+                idle_at = None
+                while True:
+                    now = self._next_event()
+                    if now is not None and now == idle_at:
+                        # Nothing runnable is left at this instant (e.g. a job in an unknown lane): move on.
+                        now += self.resolution or timedelta(seconds=1)
+                    if now is None or now > end:
+                        break
+                    self.clock.set(now)
+                    work = self.report.jobs + self.report.answers
+                    self._enroll_due(now)
+                    self._answer_due(now)
+                    self._drain_due(now)
+                    idle_at = now if self.report.jobs + self.report.answers == work else None
+        finally:
+            bus.remove_listener(self._on_events)
+            self.db.close()
+        self.report.end = end
+        self.report.wall_seconds = round(time.perf_counter() - started, 3)
+        self._summarize()
+        return self.report
+
+    def _summarize(self) -> None:
+        hours: dict[datetime, int] = {}
+        for minute, count in self._minutes.items():
+            hour = minute.replace(minute=0)
+            hours[hour] = hours.get(hour, 0) + count
+        self.report.messages_per_hour = [{"hour": hour, "messages": count} for hour, count in sorted(hours.items())]
+        if hours:
+            self.report.peak_hour, self.report.peak_messages_per_hour = max(hours.items(), key=lambda item: item[1])
+        self.report.peak_messages_per_minute = max(self._minutes.values(), default=0)
+
+
+def simulate_project(
+    source: Session,
+    project_id: str,
+    participants: int,
+    days: float,
+    scripts: Optional[Mapping[str, AnswerScript]] = None,
+    enroll_hours: float = 0,
+    keyword: Optional[str] = None,
+    scratch_url: Optional[str] = None,
+    resolution: timedelta = timedelta(minutes=1),
+    seed: int = 0,
+) -> SimulationReport:
+    """Copy a project into a scratch database and simulate ``participants`` enrolled in it for ``days``."""
+    session_factory = scratch_session_factory(scratch_url)
+    target = session_factory()
+    try:
+        clone_project(source, target, project_id)
+    finally:
+        target.close()
+    simulator = Simulator(session_factory, project_id, scripts, keyword, resolution=resolution, seed=seed)
+    simulator.enroll(participants, enroll_hours)
+    return simulator.run(days)
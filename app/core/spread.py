@@ -0,0 +1,37 @@
+"""
+Run-time spreading for mass activations.
+
+When a cohort is activated at once, every START_DATE node and every timed descendant
+would otherwise become due at the same instant. A TimingElement with spread_seconds
+spreads the run times it produces over that window: each participant gets a fixed
+phase in the window (from a hash of its id), and a run time is moved forward to the
+next instant on that participant's phase. The result is deterministic, never earlier
+than the unspread time, and monotonic in it, so the order of a participant's own
+nodes is preserved; and because a participant stays on its phase, chained timings
+that are multiples of the window do not accumulate extra delay.
+"""
+import hashlib
+from datetime import datetime, timedelta
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROS = 1_000_000
+
+
+def participant_phase(participant_id: str, window: timedelta) -> int:
+    """The participant's offset in the window, in microseconds (uniform over [0, window))."""
+    window_us = int(window.total_seconds() * _MICROS)
+    if window_us <= 0:
+        return 0
+    digest = hashlib.sha256(participant_id.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % window_us
+
+
+def spread_run_at(run_at: datetime, participant_id: str, window: timedelta) -> datetime:
+    """The first instant >= run_at on the participant's phase of a ``window``-long grid (run_at if no window)."""
+    window_us = int(window.total_seconds() * _MICROS)
+    if window_us <= 0:
+        return run_at
+    elapsed = run_at - _EPOCH
+    position = (elapsed.days * 86400 + elapsed.seconds) * _MICROS + elapsed.microseconds
+    shift = (participant_phase(participant_id, window) - position) % window_us
+    return run_at + timedelta(microseconds=shift)
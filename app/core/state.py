@@ -0,0 +1,118 @@
+"""
+Per-participant conversation state.
+
+participant_states summarizes what the engine used to derive from message history on
+every inbound message: the poll awaiting an answer, the last node sent, last activity
+times and message counts. It is written with an upsert in the same transaction as the
+messages it summarizes, so it cannot drift from the history, and read back with a
+primary-key lookup.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.clock import utcnow
+from app.models import ParticipantState
+
+_COLUMNS = (
+    "awaiting_poll_template_id",
+    "last_node_id",
+    "last_outbound_at",
+    "last_inbound_at",
+    "outbound_count",
+    "inbound_count",
+)
+
+
+def state_row(
+    participant_id: str,
+    *,
+    node_id: Optional[str] = None,
+    poll_template_id: Optional[str] = None,
+    outbound_at: Optional[datetime] = None,
+    inbound_at: Optional[datetime] = None,
+    outbound: int = 0,
+    inbound: int = 0,
+) -> dict:
+    """
+    A state change for one participant: None leaves a field unchanged, counts are increments.
+    """
+    return {
+        "participant_id": participant_id,
+        "awaiting_poll_template_id": poll_template_id,
+        "last_node_id": node_id,
+        "last_outbound_at": outbound_at,
+        "last_inbound_at": inbound_at,
+        "outbound_count": outbound,
+        "inbound_count": inbound,
+        "updated_at": utcnow(),
+    }
+
+
+def merge_state_rows(rows: list[dict]) -> list[dict]:
+    """Fold state changes (in order) into one row per participant, so a batch upserts each row once."""
+    merged: dict[str, dict] = {}
+    for row in rows:
+        current = merged.get(row["participant_id"])
+        if current is None:
+            merged[row["participant_id"]] = dict(row)
+            continue
+        for name in _COLUMNS:
+            if name.endswith("_count"):
+                current[name] += row[name]
+            elif row[name] is not None:
+                current[name] = row[name]
+        current["updated_at"] = row["updated_at"]
+    return list(merged.values())
+
+
+def apply_state(db: Session, rows: list[dict]) -> None:
+    """Upsert state changes (one statement for all rows on PostgreSQL and SQLite)."""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        _apply_state_orm(db, rows)
+        return
+    table = ParticipantState.__table__
+    stmt = insert(table)
+    values = {
+        name: func.coalesce(stmt.excluded[name], table.c[name])
+        for name in _COLUMNS
+        if not name.endswith("_count")
+    }
+    values["outbound_count"] = table.c.outbound_count + stmt.excluded.outbound_count
+    values["inbound_count"] = table.c.inbound_count + stmt.excluded.inbound_count
+    values["updated_at"] = stmt.excluded.updated_at
+    db.execute(stmt.on_conflict_do_update(index_elements=[table.c.participant_id], set_=values), rows)
+
+
+def _apply_state_orm(db: Session, rows: list[dict]) -> None:
+    """Read-modify-write fallback for dialects without INSERT ... ON CONFLICT."""
+    for row in rows:
+        state = db.get(ParticipantState, row["participant_id"], with_for_update=True)
+        if state is None:
+            state = ParticipantState(participant_id=row["participant_id"], outbound_count=0, inbound_count=0)
+            db.add(state)
+        for name in _COLUMNS:
+            if name.endswith("_count"):
+                setattr(state, name, (getattr(state, name) or 0) + row[name])
+            elif row[name] is not None:
+                setattr(state, name, row[name])
+        state.updated_at = row["updated_at"]
+    db.flush()
+
+
+def awaiting_poll_template_id(db: Session, participant_id: str) -> Optional[str]:
+    """Template id of the poll an inbound answer belongs to (primary-key lookup)."""
+    return (
+        db.query(ParticipantState.awaiting_poll_template_id)
+        .filter(ParticipantState.participant_id == participant_id)
+        .scalar()
+    )
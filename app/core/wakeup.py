@@ -0,0 +1,184 @@
+"""
+Scheduler wakeups.
+
+Instead of scanning scheduled_jobs on a fixed interval, the scheduler sleeps until
+the earliest known run_at. Known run_at values live in an in-memory min-heap that
+is primed from the database after every drain and fed by the engine whenever a
+transaction that inserted jobs commits. Other processes are reached through
+PostgreSQL LISTEN/NOTIFY, or through a small signal file next to a SQLite database.
+"""
+import heapq
+import os
+import select
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+NOTIFY_CHANNEL = "dash_scheduler"
+_PENDING_KEY = "wakeup_run_at"
+_MAX_ENTRIES = 10000
+
+
+class DueTimeQueue:
+    """Min-heap of upcoming run_at values with a condition the scheduler can sleep on."""
+
+    def __init__(self) -> None:
+        self._heap: list[datetime] = []
+        self._cond = threading.Condition()
+        self._woken = False
+
+    def push(self, run_at: datetime) -> None:
+        with self._cond:
+            if len(self._heap) >= _MAX_ENTRIES and run_at >= self._heap[0]:
+                # Later entries are rediscovered by the DB prime once they become the earliest.
+                return
+            heapq.heappush(self._heap, run_at)
+            if self._heap[0] == run_at:
+                self._cond.notify_all()
+
+    def wake(self) -> None:
+        """Wake the sleeper immediately (e.g. a cross-process signal or shutdown)."""
+        with self._cond:
+            self._woken = True
+            self._cond.notify_all()
+
+    def next_due(self) -> Optional[datetime]:
+        with self._cond:
+            return self._heap[0] if self._heap else None
+
+    def wait(self, max_idle_seconds: float) -> None:
+        """
+        Block until the earliest run_at is due, a wake() arrives, or max_idle_seconds elapse.
+        Entries that are due are removed.
+        """
+        deadline = time.monotonic() + max_idle_seconds
+        with self._cond:
+            while True:
+                if self._woken:
+                    self._woken = False
+                    return
+                now = datetime.utcnow()
+                if self._heap and self._heap[0] <= now:
+                    while self._heap and self._heap[0] <= now:
+                        heapq.heappop(self._heap)
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                if self._heap:
+                    remaining = min(remaining, (self._heap[0] - now).total_seconds())
+                self._cond.wait(remaining)
+
+
+due_times = DueTimeQueue()
+
+
+def record_scheduled(db: Session, run_at: datetime) -> None:
+    """Remember that this session inserted a job due at run_at; published when it commits."""
+    current = db.info.get(_PENDING_KEY)
+    if current is None or run_at < current:
+        db.info[_PENDING_KEY] = run_at
+
+
+def _sqlite_signal_path(bind) -> Optional[str]:
+    url = getattr(bind, "url", None)
+    if url is None or url.get_backend_name() != "sqlite":
+        return None
+    if not url.database or url.database == ":memory:":
+        return None
+    return os.path.abspath(url.database) + ".wakeup"
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_postgres(session: Session) -> None:
+    run_at = session.info.get(_PENDING_KEY)
+    if run_at is None:
+        return
+    bind = session.get_bind()
+    if bind.dialect.name == "postgresql":
+        # Delivered to listeners only if (and when) the transaction commits.
+        session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": NOTIFY_CHANNEL, "payload": run_at.isoformat()},
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_local(session: Session) -> None:
+    run_at = session.info.pop(_PENDING_KEY, None)
+    if run_at is None:
+        return
+    due_times.push(run_at)
+    path = _sqlite_signal_path(session.get_bind())
+    if path:
+        try:
+            with open(path, "a"):
+                os.utime(path, None)
+        except OSError:
+            pass
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _listen_postgres(engine: Engine, queue: DueTimeQueue, stop: threading.Event) -> None:
+    while not stop.is_set():
+        conn = None
+        try:
+            conn = engine.raw_connection()
+            conn.detach()  # autocommit LISTEN connection must not go back to the pool
+            dbapi_conn = conn.driver_connection
+            dbapi_conn.autocommit = True
+            with dbapi_conn.cursor() as cur:
+                cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            while not stop.is_set():
+                if select.select([dbapi_conn], [], [], 1.0) == ([], [], []):
+                    continue
+                dbapi_conn.poll()
+                while dbapi_conn.notifies:
+                    note = dbapi_conn.notifies.pop(0)
+                    try:
+                        queue.push(datetime.fromisoformat(note.payload))
+                    except ValueError:
+                        queue.wake()
+        except Exception:
+            stop.wait(5)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+def _watch_signal_file(path: str, queue: DueTimeQueue, stop: threading.Event) -> None:
+    last = None
+    while not stop.is_set():
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if last is not None and mtime != last:
+            queue.wake()
+        last = mtime
+        stop.wait(0.2)
+
+
+def start_listener(engine: Engine, queue: DueTimeQueue, stop: threading.Event) -> Optional[threading.Thread]:
+    """Start a thread relaying wakeups from other processes into queue (None if unsupported)."""
+    if engine.dialect.name == "postgresql":
+        thread = threading.Thread(target=_listen_postgres, args=(engine, queue, stop), daemon=True)
+    else:
+        path = _sqlite_signal_path(engine)
+        if not path:
+            return None
+        thread = threading.Thread(target=_watch_signal_file, args=(path, queue, stop), daemon=True)
+    thread.start()
+    return thread
@@ -1,17 +1,57 @@
 """Database session and engine."""
+from typing import Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from app.config import settings
+from app.core.metrics import instrument_pool
 
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
     echo=settings.DEBUG,
 )
+instrument_pool(engine.pool)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    """The same database through its async driver (postgresql -> asyncpg, sqlite -> aiosqlite)."""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+_async_engine: Optional[AsyncEngine] = None
+_async_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Async engine for the event-loop routes, created on first use (needs asyncpg / aiosqlite)."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            async_database_url(settings.DATABASE_URL),
+            pool_pre_ping=True,
+            echo=settings.DEBUG,
+        )
+        instrument_pool(_async_engine.sync_engine.pool)
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, class_=AsyncSession)
+    return _async_engine
+
+
+def new_async_session() -> AsyncSession:
+    get_async_engine()
+    return _async_sessionmaker()
+
 
 def get_db():
     """Dependency yielding a DB session."""
@@ -20,3 +60,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency yielding an AsyncSession (routes that run on the event loop)."""
+    async with new_async_session() as db:
+        yield db
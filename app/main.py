@@ -1,7 +1,10 @@
 """FastAPI application entry point."""
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Response
+from sqlalchemy.orm import Session
+
+from app.db import get_db
 
 
 def _ensure_seed_projects():
@@ -64,10 +67,13 @@ def _ensure_seed_projects():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup/shutdown lifecycle."""
+    from app.core.dispatcher import start_dispatcher, stop_dispatcher
     from app.core.scheduler import start_scheduler, stop_scheduler
     _ensure_seed_projects()
     start_scheduler()
+    start_dispatcher()
     yield
+    stop_dispatcher()
     stop_scheduler()
 
 
@@ -89,9 +95,20 @@ def health():
     return {"status": "ok"}
 
 
-from app.routes import projects, participants, web, admin
+@app.get("/metrics", include_in_schema=False)
+def metrics(db: Session = Depends(get_db)):
+    """Prometheus metrics: job backlog, scheduler lag, throughput, node and inbound latency, pool waits."""
+    from app.core.metrics import CONTENT_TYPE, registry
+    return Response(registry.render(db), media_type=CONTENT_TYPE)
+
+
+from app.routes import projects, participants, web, admin, campaigns, cohorts, scheduler, timings
 
 app.include_router(web.router, tags=["web"])
 app.include_router(admin.router, tags=["admin"])
 app.include_router(projects.router, prefix="/api/projects", tags=["projects"])
+app.include_router(campaigns.router, prefix="/api/projects", tags=["campaigns"])
+app.include_router(cohorts.router, prefix="/api/projects", tags=["cohorts"])
+app.include_router(timings.router, prefix="/api/projects", tags=["timings"])
 app.include_router(participants.router, prefix="/api/participants", tags=["participants"])
+app.include_router(scheduler.router, prefix="/api/scheduler", tags=["scheduler"])
@@ -9,8 +9,11 @@ from app.models.keyword import Keyword
 from app.models.participant import Participant
 from app.models.participant_message import ParticipantMessage
 from app.models.participant_variable import ParticipantVariable
+from app.models.participant_state import ParticipantState
 from app.models.node_execution_log import NodeExecutionLog
 from app.models.scheduled_job import ScheduledJob
+from app.models.campaign import Campaign
+from app.models.outbox_message import OutboxMessage
 
 __all__ = [
     "Project",
@@ -23,6 +26,9 @@ __all__ = [
     "Participant",
     "ParticipantMessage",
     "ParticipantVariable",
+    "ParticipantState",
     "NodeExecutionLog",
     "ScheduledJob",
+    "Campaign",
+    "OutboxMessage",
 ]
@@ -0,0 +1,22 @@
+"""Campaign - one node broadcast to a project's participants (fanned out into ScheduledJobs)."""
+from sqlalchemy import Column, DateTime, String, ForeignKey, Integer
+from sqlalchemy.orm import relationship
+
+from app.core.clock import utcnow
+from app.db import Base
+
+
+class Campaign(Base):
+    __tablename__ = "campaigns"
+
+    id = Column(String(36), primary_key=True)
+    project_id = Column(String(36), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    node_id = Column(String(36), ForeignKey("nodes.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String(255), nullable=True)
+    language = Column(String(20), nullable=True)  # audience filter; None = every language
+    run_at = Column(DateTime, nullable=False)
+    job_count = Column(Integer, default=0)  # jobs created by the fan-out
+    created_at = Column(DateTime, default=utcnow)
+
+    project = relationship("Project")
+    node = relationship("Node")
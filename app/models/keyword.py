@@ -1,5 +1,5 @@
 """Keyword model - e.g. iselect, iexit."""
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.db import Base
@@ -7,6 +7,9 @@ from app.db import Base
 
 class Keyword(Base):
     __tablename__ = "keywords"
+    __table_args__ = (
+        Index("ix_keywords_project_text", "project_id", "keyword_text"),
+    )
 
     id = Column(String(36), primary_key=True)
     project_id = Column(String(36), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
@@ -1,5 +1,5 @@
 """Node model - logical container for message delivery."""
-from sqlalchemy import Column, String, ForeignKey, Boolean
+from sqlalchemy import Column, String, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 
 from app.db import Base
@@ -7,6 +7,10 @@ from app.db import Base
 
 class Node(Base):
     __tablename__ = "nodes"
+    __table_args__ = (
+        Index("ix_nodes_project_activation_source", "project_id", "activation_type", "activation_source_node_id"),
+        Index("ix_nodes_project_activation_poll", "project_id", "activation_type", "activation_poll_id"),
+    )
 
     id = Column(String(36), primary_key=True)
     project_id = Column(String(36), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
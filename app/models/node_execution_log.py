@@ -1,18 +1,21 @@
 """Node execution log - AGV (Automatic Generated Variable) timestamp."""
-from datetime import datetime
-from sqlalchemy import Column, DateTime, String, ForeignKey
+from sqlalchemy import Column, DateTime, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
+from app.core.clock import utcnow
 from app.db import Base
 
 
 class NodeExecutionLog(Base):
     __tablename__ = "node_execution_logs"
+    __table_args__ = (
+        Index("ix_node_execution_logs_participant_executed", "participant_id", "executed_at"),
+    )
 
     id = Column(String(36), primary_key=True)
     participant_id = Column(String(36), ForeignKey("participants.id", ondelete="CASCADE"), nullable=False)
     node_id = Column(String(36), ForeignKey("nodes.id", ondelete="CASCADE"), nullable=False)
-    executed_at = Column(DateTime, default=datetime.utcnow)
+    executed_at = Column(DateTime, default=utcnow)
 
     participant = relationship("Participant", back_populates="execution_logs")
     node = relationship("Node")
@@ -0,0 +1,41 @@
+"""Outbox message - an OUTBOUND message waiting to be delivered through an external channel."""
+from sqlalchemy import Column, DateTime, String, ForeignKey, Index, Integer, Text
+from sqlalchemy.orm import relationship
+
+from app.core.clock import utcnow
+from app.db import Base
+import enum
+
+
+class OutboxStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    SENDING = "SENDING"  # claimed by a dispatcher (leased)
+    SENT = "SENT"
+    FAILED = "FAILED"  # permanent provider error or OUTBOX_MAX_ATTEMPTS reached
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        Index("ix_outbox_messages_status_available", "status", "available_at"),
+    )
+
+    id = Column(String(36), primary_key=True)
+    message_id = Column(String(36), ForeignKey("participant_messages.id", ondelete="CASCADE"), nullable=False)
+    participant_id = Column(String(36), ForeignKey("participants.id", ondelete="CASCADE"), nullable=False)
+    channel = Column(String(20), nullable=False)  # sms, facebook, webhook
+    recipient = Column(String(255), nullable=True)  # channel address (participant external_id)
+    text = Column(Text, nullable=True)
+    status = Column(String(20), default=OutboxStatus.PENDING.value)
+    available_at = Column(DateTime, nullable=False)  # next delivery attempt
+    created_at = Column(DateTime, default=utcnow)
+
+    # Lease held by the dispatcher that claimed the row (SENDING)
+    claimed_by = Column(String(64), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    provider_message_id = Column(String(255), nullable=True)
+
+    message = relationship("ParticipantMessage")
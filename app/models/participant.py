@@ -1,23 +1,28 @@
 """Participant model."""
-from datetime import datetime
-from sqlalchemy import Column, DateTime, String, ForeignKey
+from sqlalchemy import Column, DateTime, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
+from app.core.clock import utcnow
 from app.db import Base
 
 
 class Participant(Base):
     __tablename__ = "participants"
+    __table_args__ = (
+        Index("ix_participants_project_external", "project_id", "external_id"),
+    )
 
     id = Column(String(36), primary_key=True)
     project_id = Column(String(36), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
     external_id = Column(String(255), nullable=True)  # simulated user id for demo
     language = Column(String(20), default="English")
     status = Column(String(20), default="ACTIVE")  # ACTIVE, INACTIVE
-    created_at = Column(DateTime, default=datetime.utcnow)
+    channel = Column(String(20), default="web")  # web (chat UI only), sms, facebook, webhook
+    created_at = Column(DateTime, default=utcnow)
 
     project = relationship("Project", back_populates="participants")
     messages = relationship("ParticipantMessage", back_populates="participant", order_by="ParticipantMessage.created_at", cascade="all, delete-orphan")
     variables = relationship("ParticipantVariable", back_populates="participant", cascade="all, delete-orphan")
     execution_logs = relationship("NodeExecutionLog", back_populates="participant", cascade="all, delete-orphan")
     scheduled_jobs = relationship("ScheduledJob", back_populates="participant", cascade="all, delete-orphan")
+    state = relationship("ParticipantState", back_populates="participant", uselist=False, cascade="all, delete-orphan")
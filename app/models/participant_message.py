@@ -1,8 +1,8 @@
 """Participant message - inbound/outbound history."""
-from datetime import datetime
-from sqlalchemy import Column, DateTime, String, ForeignKey, Text, Enum
+from sqlalchemy import Column, DateTime, String, ForeignKey, Text, Enum, Index
 from sqlalchemy.orm import relationship
 
+from app.core.clock import utcnow
 from app.db import Base
 import enum
 
@@ -14,12 +14,15 @@ class MessageDirection(str, enum.Enum):
 
 class ParticipantMessage(Base):
     __tablename__ = "participant_messages"
+    __table_args__ = (
+        Index("ix_participant_messages_participant_created", "participant_id", "created_at"),
+    )
 
     id = Column(String(36), primary_key=True)
     participant_id = Column(String(36), ForeignKey("participants.id", ondelete="CASCADE"), nullable=False)
     direction = Column(String(20), nullable=False)  # INBOUND, OUTBOUND
     message_template_id = Column(String(36), ForeignKey("message_templates.id", ondelete="SET NULL"), nullable=True)
     text = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow)
 
     participant = relationship("Participant", back_populates="messages")
@@ -0,0 +1,22 @@
+"""Participant conversation state - one row per participant, maintained by the engine."""
+from sqlalchemy import Column, DateTime, String, ForeignKey, Integer
+from sqlalchemy.orm import relationship
+
+from app.core.clock import utcnow
+from app.db import Base
+
+
+class ParticipantState(Base):
+    __tablename__ = "participant_states"
+
+    participant_id = Column(String(36), ForeignKey("participants.id", ondelete="CASCADE"), primary_key=True)
+    # Last POLL sent: inbound answers are routed to it (kept after it is answered, like the history scan was).
+    awaiting_poll_template_id = Column(String(36), ForeignKey("message_templates.id", ondelete="SET NULL"), nullable=True)
+    last_node_id = Column(String(36), ForeignKey("nodes.id", ondelete="SET NULL"), nullable=True)
+    last_outbound_at = Column(DateTime, nullable=True)
+    last_inbound_at = Column(DateTime, nullable=True)
+    outbound_count = Column(Integer, nullable=False, default=0)
+    inbound_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+
+    participant = relationship("Participant", back_populates="state")
@@ -1,5 +1,5 @@
 """Participant variable - protocol-related participant-specific variable values."""
-from sqlalchemy import Column, String, ForeignKey, Text, Integer, DateTime
+from sqlalchemy import Column, String, ForeignKey, Text, Integer, DateTime, Index
 from sqlalchemy.orm import relationship
 
 from app.db import Base
@@ -7,6 +7,9 @@ from app.db import Base
 
 class ParticipantVariable(Base):
     __tablename__ = "participant_variables"
+    __table_args__ = (
+        Index("ux_participant_variables_participant_variable", "participant_id", "variable_id", unique=True),
+    )
 
     id = Column(String(36), primary_key=True)
     participant_id = Column(String(36), ForeignKey("participants.id", ondelete="CASCADE"), nullable=False)
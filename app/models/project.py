@@ -1,8 +1,8 @@
 """Project model."""
-from datetime import datetime
 from sqlalchemy import Column, DateTime, String, Enum
 from sqlalchemy.orm import relationship
 
+from app.core.clock import utcnow
 from app.db import Base
 import enum
 
@@ -19,8 +19,9 @@ class Project(Base):
     name = Column(String(255), nullable=False)
     description = Column(String(1000), nullable=True)
     status = Column(String(20), default=ProjectStatus.ACTIVE.value)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+    config_version = Column(String(36), nullable=True)  # replaced whenever protocol config changes (graph cache key)
 
     timing_elements = relationship("TimingElement", back_populates="project", cascade="all, delete-orphan")
     variables = relationship("Variable", back_populates="project", cascade="all, delete-orphan")
@@ -1,27 +1,38 @@
 """Scheduled job - when to run which node for which participant."""
-from datetime import datetime
-from sqlalchemy import Column, DateTime, String, ForeignKey, Enum
+from sqlalchemy import Column, DateTime, String, ForeignKey, Enum, Index, Integer, Text
 from sqlalchemy.orm import relationship
 
+from app.core.clock import utcnow
+from app.core.jobs import JobLane, JobStatus  # noqa: F401 - the models' job vocabulary
 from app.db import Base
-import enum
-
-
-class JobStatus(str, enum.Enum):
-    PENDING = "PENDING"
-    RUNNING = "RUNNING"
-    DONE = "DONE"
-    CANCELLED = "CANCELLED"
 
 
 class ScheduledJob(Base):
     __tablename__ = "scheduled_jobs"
+    __table_args__ = (
+        Index("ix_scheduled_jobs_status_run_at", "status", "run_at"),
+        Index("ix_scheduled_jobs_participant_status", "participant_id", "status"),
+        Index("ix_scheduled_jobs_campaign_status", "campaign_id", "status"),
+        Index("ix_scheduled_jobs_status_project_run_at", "status", "project_id", "run_at"),
+        Index("ix_scheduled_jobs_status_lane_run_at", "status", "lane", "run_at"),
+    )
 
     id = Column(String(36), primary_key=True)
     participant_id = Column(String(36), ForeignKey("participants.id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(String(36), nullable=True)  # participant's project, denormalized for fair per-project claims
     node_id = Column(String(36), ForeignKey("nodes.id", ondelete="CASCADE"), nullable=False)
     run_at = Column(DateTime, nullable=False)
     status = Column(String(20), default=JobStatus.PENDING.value)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    lane = Column(String(20), nullable=False, default=JobLane.BULK.value)
+    created_at = Column(DateTime, default=utcnow)
+    started_at = Column(DateTime, nullable=True)  # last claim (started_at - run_at = scheduler lag)
+    finished_at = Column(DateTime, nullable=True)  # marked DONE or FAILED
+
+    # Lease held by the scheduler worker that claimed the job (RUNNING)
+    claimed_by = Column(String(64), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    campaign_id = Column(String(36), ForeignKey("campaigns.id", ondelete="SET NULL"), nullable=True)
 
     participant = relationship("Participant", back_populates="scheduled_jobs")
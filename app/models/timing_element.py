@@ -22,5 +22,7 @@ class TimingElement(Base):
     hours = Column(Integer, default=0)
     minutes = Column(Integer, default=0)
     seconds = Column(Integer, default=0)
+    # Spread run times of this timing over a window, by participant (0 = exact); see app.core.spread
+    spread_seconds = Column(Integer, default=0)
 
     project = relationship("Project", back_populates="timing_elements")
@@ -0,0 +1,61 @@
+"""Campaign (project-wide broadcast) API routes."""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.models import Campaign, Project
+from app.schemas.campaign import CampaignCreate, CampaignResponse
+from app.core.cohort import CohortCondition
+from app.core.campaigns import CampaignError, campaign_progress, cancel_campaign, create_campaign
+
+router = APIRouter()
+
+
+def _get_campaign(db: Session, project_id: str, campaign_id: str) -> Campaign:
+    campaign = (
+        db.query(Campaign)
+        .filter(Campaign.id == campaign_id, Campaign.project_id == project_id)
+        .first()
+    )
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign
+
+
+def _response(db: Session, campaign: Campaign) -> CampaignResponse:
+    response = CampaignResponse.model_validate(campaign)
+    response.progress = campaign_progress(db, campaign.id)
+    return response
+
+
+@router.post("/{project_id}/campaigns", response_model=CampaignResponse)
+def create_project_campaign(project_id: str, body: CampaignCreate, db: Session = Depends(get_db)):
+    """
+    Broadcast a node to every ACTIVE participant of the project (optionally one language and/or
+    a cohort of participants matching variable conditions).
+    Jobs are enqueued in one statement and delivered by the scheduler at run_at.
+    """
+    if not db.query(Project.id).filter(Project.id == project_id).first():
+        raise HTTPException(status_code=404, detail="Project not found")
+    try:
+        campaign = create_campaign(
+            db, project_id, body.node_id, run_at=body.run_at, language=body.language, name=body.name,
+            conditions=[CohortCondition(c.variable, c.operation, c.value) for c in body.conditions],
+        )
+    except CampaignError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _response(db, campaign)
+
+
+@router.get("/{project_id}/campaigns/{campaign_id}", response_model=CampaignResponse)
+def get_campaign(project_id: str, campaign_id: str, db: Session = Depends(get_db)):
+    """Campaign with its delivery progress (job counts by status)."""
+    return _response(db, _get_campaign(db, project_id, campaign_id))
+
+
+@router.post("/{project_id}/campaigns/{campaign_id}/cancel", response_model=CampaignResponse)
+def cancel_project_campaign(project_id: str, campaign_id: str, db: Session = Depends(get_db)):
+    """Cancel the campaign's jobs that have not been sent yet."""
+    campaign = _get_campaign(db, project_id, campaign_id)
+    cancel_campaign(db, campaign.id)
+    return _response(db, campaign)
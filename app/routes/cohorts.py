@@ -0,0 +1,67 @@
+"""Cohort (participant selection) API routes."""
+import json
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.models import Project
+from app.schemas.cohort import CohortCountResponse, CohortPageResponse, CohortQuery
+from app.core.cohort import CohortCondition, CohortError, count_cohort, iter_cohort_pages, select_cohort
+
+router = APIRouter()
+
+
+def _conditions(body: CohortQuery) -> list[CohortCondition]:
+    return [CohortCondition(c.variable, c.operation, c.value) for c in body.conditions]
+
+
+def _require_project(db: Session, project_id: str) -> None:
+    if not db.query(Project.id).filter(Project.id == project_id).first():
+        raise HTTPException(status_code=404, detail="Project not found")
+
+
+@router.post("/{project_id}/cohorts/query", response_model=CohortPageResponse)
+def query_cohort(project_id: str, body: CohortQuery, db: Session = Depends(get_db)):
+    """
+    One page of participant ids matching all conditions (NodeCondition vocabulary, e.g.
+    {"variable": "Age_Var", "operation": "gt", "value": "18"}). Pass next_cursor as ``after``.
+    """
+    _require_project(db, project_id)
+    try:
+        page = select_cohort(
+            db, project_id, _conditions(body), body.status, body.language, body.after, body.limit
+        )
+    except CohortError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return CohortPageResponse(participant_ids=page.participant_ids, next_cursor=page.next_cursor)
+
+
+@router.post("/{project_id}/cohorts/count", response_model=CohortCountResponse)
+def count_project_cohort(project_id: str, body: CohortQuery, db: Session = Depends(get_db)):
+    """Size of the cohort (one COUNT query)."""
+    _require_project(db, project_id)
+    try:
+        return CohortCountResponse(count=count_cohort(db, project_id, _conditions(body), body.status, body.language))
+    except CohortError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post("/{project_id}/cohorts/export")
+def export_cohort(project_id: str, body: CohortQuery, db: Session = Depends(get_db)):
+    """Stream the whole cohort as NDJSON, one {"participant_id": ...} per line, fetched page by page."""
+    _require_project(db, project_id)
+    pages = iter_cohort_pages(db, project_id, _conditions(body), body.status, body.language, body.limit)
+    try:
+        first = next(pages, [])  # fails fast on bad conditions, before the response starts
+    except CohortError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    def lines():
+        page = first
+        while page:
+            yield "".join(json.dumps({"participant_id": pid}) + "\n" for pid in page)
+            page = next(pages, [])
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
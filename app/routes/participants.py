@@ -1,12 +1,33 @@
 """Participant and message API routes."""
+import io
+import json
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, Response, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db import get_db
+from app.config import settings
+from app.db import get_async_db, get_db
 from app.models import Participant, ParticipantMessage, NodeExecutionLog, Node, MessageTemplate
-from app.schemas.participant import ParticipantCreate, ParticipantResponse, MessageSend, MessageResponse, NodeFlowItem
-from app.core.engine import process_keyword, process_poll_answer
+from app.schemas.participant import (
+    ParticipantCreate,
+    ParticipantResponse,
+    MessageSend,
+    MessageResponse,
+    NodeFlowItem,
+    ParticipantImportResponse,
+)
+from app.core.engine import process_keyword_async, process_poll_answer_async
+from app.core.events import MESSAGE, Subscription, bus, message_data, record_event
+from app.core.metrics import inbound_latency
+from app.core.pagination import InvalidCursor, is_after, keyset_page, latest_cursor
+from app.core.participant_import import ImportConfigError, detect_format, import_participants, iter_records
+from app.core.state import apply_state, state_row
 
 router = APIRouter()
 
@@ -24,6 +45,7 @@ def create_participant(body: ParticipantCreate, db: Session = Depends(get_db)):
         language=body.language or "English",
         status="ACTIVE",
         external_id=body.external_id,
+        channel=body.channel,
     )
     db.add(p)
     db.commit()
@@ -31,44 +53,130 @@ def create_participant(body: ParticipantCreate, db: Session = Depends(get_db)):
     return p
 
 
+@router.post("/import", response_model=ParticipantImportResponse)
+def import_participants_file(
+    project_id: str = Form(...),
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    activate: Optional[str] = Form(None),
+    batch_size: int = Form(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+):
+    """
+    Bulk-create participants from a CSV (header: external_id, language) or NDJSON upload.
+    Rows are validated and inserted in batches; duplicates by external_id are skipped and invalid
+    rows are reported by line. ``activate`` names an activation keyword (e.g. iselect) applied to
+    every created participant. Batches are committed as they go.
+    """
+    from app.models import Project
+    if not db.query(Project.id).filter(Project.id == project_id).first():
+        raise HTTPException(status_code=404, detail="Project not found")
+    try:
+        fmt = detect_format(file.filename, format)
+        stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        result = import_participants(db, project_id, iter_records(stream, fmt), activate, batch_size)
+    except ImportConfigError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+    return result
+
+
 @router.get("/{participant_id}", response_model=ParticipantResponse)
-def get_participant(participant_id: str, db: Session = Depends(get_db)):
+async def get_participant(participant_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get participant by id."""
-    p = db.query(Participant).filter(Participant.id == participant_id).first()
+    p = await db.get(Participant, participant_id)
     if not p:
         raise HTTPException(status_code=404, detail="Participant not found")
     return p
 
 
 @router.get("/{participant_id}/messages", response_model=list[MessageResponse])
-def list_messages(participant_id: str, db: Session = Depends(get_db)):
-    """List all messages for a participant (inbound + outbound)."""
-    p = db.query(Participant).filter(Participant.id == participant_id).first()
-    if not p:
+async def list_messages(
+    participant_id: str,
+    response: Response,
+    since: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    List a participant's messages (inbound + outbound), oldest first, one page at a time.
+    Pass the X-Next-Cursor header (or any message's cursor) as ``since`` to fetch newer messages,
+    or a cursor as ``before`` to page back through older history. A ``since`` page starts with the
+    messages of the SINCE_LOOKBACK_SECONDS before the cursor again, so one that committed late is
+    not skipped; de-duplicate by id.
+    """
+    if not await db.get(Participant, participant_id):
         raise HTTPException(status_code=404, detail="Participant not found")
-    messages = (
-        db.query(ParticipantMessage)
-        .filter(ParticipantMessage.participant_id == participant_id)
-        .order_by(ParticipantMessage.created_at.asc())
-        .all()
+    rows = await db.run_sync(
+        lambda sync_db: _page(
+            _messages_query(sync_db, participant_id),
+            ParticipantMessage.created_at,
+            ParticipantMessage.id,
+            limit,
+            since,
+            before,
+        )
     )
-    return messages
+    items = [MessageResponse.model_validate(m) for m in rows]
+    _set_next_cursor(response, items, since)
+    return items
+
+
+def _messages_query(db: Session, participant_id: str):
+    return db.query(ParticipantMessage).filter(ParticipantMessage.participant_id == participant_id)
+
+
+def _lookback() -> timedelta:
+    return timedelta(seconds=settings.SINCE_LOOKBACK_SECONDS)
+
+
+def _page(query, ts_column, id_column, limit: int, since=None, before=None, tail=False) -> list:
+    try:
+        return keyset_page(
+            query, ts_column, id_column, limit, since=since, before=before, tail=tail, lookback=_lookback()
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def _set_next_cursor(response: Response, items: list, since: Optional[str]) -> None:
+    """Cursor to poll with next: the newest item returned, or the caller's own cursor if nothing is new."""
+    next_cursor = latest_cursor(items[-1].cursor if items else None, since)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
 
 
 @router.post("/{participant_id}/message", response_model=MessageResponse)
-def send_message(participant_id: str, body: MessageSend, db: Session = Depends(get_db)):
+async def send_message(participant_id: str, body: MessageSend, db: AsyncSession = Depends(get_async_db)):
     """
     Participant sends a message (keyword or poll answer).
-    Stores INBOUND message, then processes as keyword or poll answer; outbound replies come from scheduler.
+    Stores INBOUND message, then processes as keyword or poll answer. Replies that are due at once
+    (the keyword's start node, zero-delay poll follow-ups and their zero-delay chains, up to
+    ENGINE_INLINE_CHAIN_DEPTH) are sent in the same request; anything with a delay, or past that
+    depth, is scheduled as a job for the scheduler.
     """
-    p = db.query(Participant).filter(Participant.id == participant_id).first()
-    if not p:
+    if not await db.get(Participant, participant_id):
         raise HTTPException(status_code=404, detail="Participant not found")
     text = (body.text or "").strip()
     if not text:
         raise HTTPException(status_code=400, detail="Message text required")
 
-    # Store inbound message
+    with inbound_latency.time():
+        inbound = await db.run_sync(_store_inbound, participant_id, text)
+
+        # Try keyword first
+        err = await process_keyword_async(db, participant_id, text)
+        if err:
+            raise HTTPException(status_code=400, detail=err)
+        # Try poll answer (no error if not applicable)
+        await process_poll_answer_async(db, participant_id, text)
+    return inbound
+
+
+def _store_inbound(db: Session, participant_id: str, text: str) -> MessageResponse:
+    """Store an INBOUND message (and its conversation-state update) and commit."""
     inbound = ParticipantMessage(
         id=str(uuid.uuid4()),
         participant_id=participant_id,
@@ -77,36 +185,47 @@ def send_message(participant_id: str, body: MessageSend, db: Session = Depends(g
         text=text,
     )
     db.add(inbound)
+    db.flush()
+    record_event(db, participant_id, MESSAGE, message_data(inbound))
+    apply_state(db, [state_row(participant_id, inbound_at=inbound.created_at, inbound=1)])
+    response = MessageResponse.model_validate(inbound)
     db.commit()
-    db.refresh(inbound)
-
-    # Try keyword first
-    err = process_keyword(db, participant_id, text)
-    if err:
-        raise HTTPException(status_code=400, detail=err)
-    # Try poll answer (no error if not applicable)
-    process_poll_answer(db, participant_id, text)
-    return inbound
+    return response
 
 
 @router.get("/{participant_id}/timeline", response_model=list[NodeFlowItem])
-def get_timeline(participant_id: str, db: Session = Depends(get_db)):
-    """Return execution timeline of nodes for this participant (for UI flow visualization)."""
-    p = db.query(Participant).filter(Participant.id == participant_id).first()
-    if not p:
+async def get_timeline(
+    participant_id: str,
+    response: Response,
+    since: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Return the execution timeline of nodes for this participant (for UI flow visualization),
+    paginated with the same since/before cursors as the message list.
+    """
+    if not await db.get(Participant, participant_id):
         raise HTTPException(status_code=404, detail="Participant not found")
-    rows = (
+    items = await db.run_sync(_timeline, participant_id, limit, since, before)
+    _set_next_cursor(response, items, since)
+    return items
+
+
+def _timeline(db: Session, participant_id: str, limit: int, since=None, before=None, tail=False) -> list[NodeFlowItem]:
+    query = (
         db.query(NodeExecutionLog, Node, MessageTemplate)
         .join(Node, NodeExecutionLog.node_id == Node.id)
         .join(MessageTemplate, Node.message_template_id == MessageTemplate.id)
         .filter(NodeExecutionLog.participant_id == participant_id)
-        .order_by(NodeExecutionLog.executed_at.asc())
-        .all()
     )
+    rows = _page(query, NodeExecutionLog.executed_at, NodeExecutionLog.id, limit, since, before, tail)
     items: list[NodeFlowItem] = []
     for log, node, tpl in rows:
         items.append(
             NodeFlowItem(
+                id=log.id,
                 node_id=node.id,
                 node_name=node.name,
                 template_name=tpl.name,
@@ -114,3 +233,102 @@ def get_timeline(participant_id: str, db: Session = Depends(get_db)):
             )
         )
     return items
+
+
+@router.get("/{participant_id}/events")
+async def stream_events(participant_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Server-Sent Events stream of the conversation: one ``snapshot`` event, then ``message`` and
+    ``timeline`` events as the engine commits them.
+
+    The first snapshot holds the latest PAGE_SIZE messages and timeline entries (``reset: true``).
+    Every event id carries both cursors, so when EventSource reconnects with Last-Event-ID the
+    snapshot only holds what was missed (``reset: false``), unless more than a page was missed.
+    Like ``since`` polling it re-reads the SINCE_LOOKBACK_SECONDS before those cursors, so rows that
+    committed late are delivered on reconnect; clients de-duplicate by id.
+    """
+    if not await db.get(Participant, participant_id):
+        raise HTTPException(status_code=404, detail="Participant not found")
+    # Subscribe before reading history so nothing committed in between is missed (clients dedupe by id).
+    sub = bus.subscribe(participant_id)
+    try:
+        snapshot = await db.run_sync(_snapshot, participant_id, request.headers.get("last-event-id"))
+    except Exception:
+        sub.close()
+        raise
+    finally:
+        await db.close()  # don't hold a pooled connection for the life of the stream
+    return StreamingResponse(
+        _event_stream(request, sub, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _snapshot(db: Session, participant_id: str, last_event_id: Optional[str]) -> dict:
+    limit = settings.PAGE_SIZE
+    message_cursor, _, timeline_cursor = (last_event_id or "").partition(".")
+    if message_cursor or timeline_cursor:
+        try:
+            messages = keyset_page(
+                _messages_query(db, participant_id), ParticipantMessage.created_at, ParticipantMessage.id,
+                limit + 1, since=message_cursor or None, lookback=_lookback(),
+            )
+            timeline = _timeline(db, participant_id, limit + 1, since=timeline_cursor or None)
+        except (InvalidCursor, HTTPException):
+            messages = timeline = None
+        if messages is not None:
+            messages = [MessageResponse.model_validate(m) for m in messages]
+        if (
+            messages is not None
+            and sum(is_after(m.cursor, message_cursor) for m in messages) <= limit
+            and sum(is_after(t.cursor, timeline_cursor) for t in timeline) <= limit
+        ):
+            return {
+                "reset": False,
+                "messages": messages,
+                "timeline": timeline,
+                "cursors": [message_cursor, timeline_cursor],
+            }
+    messages = [
+        MessageResponse.model_validate(m)
+        for m in keyset_page(
+            _messages_query(db, participant_id), ParticipantMessage.created_at, ParticipantMessage.id, limit, tail=True
+        )
+    ]
+    timeline = _timeline(db, participant_id, limit, tail=True)
+    return {"reset": True, "messages": messages, "timeline": timeline, "cursors": ["", ""]}
+
+
+def _sse(event: str, data, event_id: Optional[str] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+async def _event_stream(request: Request, sub: Subscription, snapshot: dict):
+    """Yield the snapshot, then live events; a comment line keeps idle connections open."""
+    message_cursor, timeline_cursor = snapshot.pop("cursors", ["", ""])
+    # Cursors only move forward: a late row (snapshot look-back, or an event committed out of order) is sent
+    # but does not rewind the Last-Event-ID.
+    if snapshot.get("messages"):
+        message_cursor = latest_cursor(snapshot["messages"][-1].cursor, message_cursor)
+    if snapshot.get("timeline"):
+        timeline_cursor = latest_cursor(snapshot["timeline"][-1].cursor, timeline_cursor)
+    try:
+        yield _sse("snapshot", snapshot, f"{message_cursor}.{timeline_cursor}")
+        # An overflowed feed ends the stream; EventSource reconnects and receives the missed rows.
+        while not sub.overflowed:
+            if await request.is_disconnected():
+                break
+            events = await sub.get(settings.SSE_KEEPALIVE_SECONDS)
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            for evt in events:
+                if evt.type == MESSAGE:
+                    message_cursor = latest_cursor(evt.data.get("cursor"), message_cursor) or ""
+                else:
+                    timeline_cursor = latest_cursor(evt.data.get("cursor"), timeline_cursor) or ""
+                yield _sse(evt.type, evt.data, f"{message_cursor}.{timeline_cursor}")
+    finally:
+        sub.close()
@@ -0,0 +1,15 @@
+"""Scheduler status API routes."""
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.schemas.scheduler import LaneStatus
+from app.core.scheduler import lane_lag
+
+router = APIRouter()
+
+
+@router.get("/lanes", response_model=list[LaneStatus])
+def get_lanes(db: Session = Depends(get_db)):
+    """Backlog and lag per claim lane (interactive, bulk)."""
+    return lane_lag(db)
@@ -0,0 +1,47 @@
+"""Timing element API routes."""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.models import TimingElement
+from app.schemas.timing import RetimeResponse, TimingResponse, TimingUpdate
+from app.core.retiming import proposed_timing, retime_pending_jobs, update_timing
+
+router = APIRouter()
+
+
+def _get_timing(db: Session, project_id: str, timing_id: str) -> TimingElement:
+    timing = (
+        db.query(TimingElement)
+        .filter(TimingElement.id == timing_id, TimingElement.project_id == project_id)
+        .first()
+    )
+    if not timing:
+        raise HTTPException(status_code=404, detail="Timing element not found")
+    return timing
+
+
+def _changes(body: TimingUpdate) -> dict:
+    return body.model_dump(exclude={"reschedule"}, exclude_none=True)
+
+
+@router.post("/{project_id}/timings/{timing_id}/reschedule-preview", response_model=RetimeResponse)
+def preview_timing_change(project_id: str, body: TimingUpdate, timing_id: str, db: Session = Depends(get_db)):
+    """How many PENDING jobs the change would move and by how much (nothing is written)."""
+    timing = _get_timing(db, project_id, timing_id)
+    result = retime_pending_jobs(db, timing, proposed_timing(timing, _changes(body)), apply=False)
+    return RetimeResponse(**result._asdict())
+
+
+@router.patch("/{project_id}/timings/{timing_id}", response_model=TimingResponse)
+def patch_timing(project_id: str, body: TimingUpdate, timing_id: str, db: Session = Depends(get_db)):
+    """
+    Edit a timing element. With ``reschedule`` the PENDING jobs scheduled with it move to the
+    run times the new timing gives them, in the same transaction; otherwise they keep theirs.
+    """
+    timing = _get_timing(db, project_id, timing_id)
+    result = update_timing(db, timing, _changes(body), body.reschedule)
+    response = TimingResponse.model_validate(timing)
+    if result is not None:
+        response.rescheduled = RetimeResponse(**result._asdict())
+    return response
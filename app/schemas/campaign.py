@@ -0,0 +1,29 @@
+"""Campaign schemas."""
+from datetime import datetime
+from typing import Optional, List
+from pydantic import BaseModel
+
+from app.schemas.cohort import CohortConditionIn
+
+
+class CampaignCreate(BaseModel):
+    node_id: str
+    name: Optional[str] = None
+    run_at: Optional[datetime] = None  # UTC; default now
+    language: Optional[str] = None  # only participants with this language
+    conditions: List[CohortConditionIn] = []  # cohort conditions on participant variables (all must hold)
+
+
+class CampaignResponse(BaseModel):
+    id: str
+    project_id: str
+    node_id: str
+    name: Optional[str] = None
+    language: Optional[str] = None
+    run_at: datetime
+    job_count: int
+    created_at: Optional[datetime] = None
+    progress: dict[str, int] = {}  # job counts by status
+
+    class Config:
+        from_attributes = True
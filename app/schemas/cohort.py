@@ -0,0 +1,26 @@
+"""Cohort query schemas."""
+from typing import Optional, List
+from pydantic import BaseModel, Field
+
+
+class CohortConditionIn(BaseModel):
+    variable: str  # variable name or id
+    operation: str = "equal"  # equal, gt, gte, lt, lte, in, not_in
+    value: Optional[str] = None
+
+
+class CohortQuery(BaseModel):
+    conditions: List[CohortConditionIn] = []
+    status: Optional[str] = "ACTIVE"  # null = any status
+    language: Optional[str] = None
+    after: Optional[str] = None  # next_cursor of the previous page
+    limit: int = Field(1000, ge=1, le=10000)
+
+
+class CohortPageResponse(BaseModel):
+    participant_ids: List[str]
+    next_cursor: Optional[str] = None
+
+
+class CohortCountResponse(BaseModel):
+    count: int
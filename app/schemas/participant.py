@@ -1,19 +1,23 @@
 """Participant and message schemas."""
 from datetime import datetime
-from typing import Optional, List
-from pydantic import BaseModel
+from typing import Literal, Optional, List
+from pydantic import BaseModel, computed_field
+
+from app.core.pagination import encode_cursor
 
 
 class ParticipantCreate(BaseModel):
     project_id: str
     language: str = "English"
-    external_id: Optional[str] = None
+    external_id: Optional[str] = None  # channel address: phone number (sms), page-scoped id (facebook)
+    channel: Literal["web", "sms", "facebook", "webhook"] = "web"
 
 
 class ParticipantResponse(BaseModel):
     id: str
     project_id: str
     language: Optional[str] = None
+    channel: Optional[str] = None
     status: str
     created_at: Optional[datetime] = None
 
@@ -33,15 +37,45 @@ class MessageResponse(BaseModel):
     text: Optional[str] = None
     created_at: Optional[datetime] = None
 
+    @computed_field
+    @property
+    def cursor(self) -> str:
+        """Keyset cursor for this message (use as ``since`` / ``before``)."""
+        return encode_cursor(self.created_at, self.id)
+
     class Config:
         from_attributes = True
 
 
 class NodeFlowItem(BaseModel):
+    id: Optional[str] = None  # node execution log id
     node_id: str
     node_name: str
     template_name: str
     executed_at: Optional[datetime] = None
 
+    @computed_field
+    @property
+    def cursor(self) -> str:
+        """Keyset cursor for this timeline entry (use as ``since`` / ``before``)."""
+        return encode_cursor(self.executed_at, self.id or "")
+
+    class Config:
+        from_attributes = True
+
+
+class ImportRowError(BaseModel):
+    line: int
+    message: str
+
+
+class ParticipantImportResponse(BaseModel):
+    created: int
+    duplicates: int
+    activated: int
+    scheduled_jobs: int
+    error_count: int
+    errors: List[ImportRowError] = []
+
     class Config:
         from_attributes = True
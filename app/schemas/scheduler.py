@@ -0,0 +1,14 @@
+"""Scheduler status schemas."""
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+
+class LaneStatus(BaseModel):
+    lane: str
+    due: int  # PENDING jobs whose run_at has passed
+    oldest_due_at: Optional[datetime] = None
+    lag_seconds: float  # how long the oldest due job has waited
+    claimed: int  # jobs claimed by this process
+    last_claim_lag_seconds: float  # worst run_at-to-claim delay in this process's last claim
+    max_claim_lag_seconds: float
@@ -0,0 +1,35 @@
+"""Timing element schemas."""
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class TimingUpdate(BaseModel):
+    days: Optional[int] = Field(None, ge=0)
+    hours: Optional[int] = Field(None, ge=0)
+    minutes: Optional[int] = Field(None, ge=0)
+    seconds: Optional[int] = Field(None, ge=0)
+    spread_seconds: Optional[int] = Field(None, ge=0)
+    reschedule: bool = False  # also move PENDING jobs scheduled with this timing (ignored by the preview)
+
+
+class RetimeResponse(BaseModel):
+    jobs: int  # PENDING jobs scheduled with the timing
+    shifted_jobs: int
+    shift_seconds: float  # change of the delay
+    min_shift_seconds: Optional[float] = None  # actual moves (spreading rounds them to the window)
+    max_shift_seconds: Optional[float] = None
+
+
+class TimingResponse(BaseModel):
+    id: str
+    project_id: str
+    name: str
+    days: Optional[int] = 0
+    hours: Optional[int] = 0
+    minutes: Optional[int] = 0
+    seconds: Optional[int] = 0
+    spread_seconds: Optional[int] = 0
+    rescheduled: Optional[RetimeResponse] = None  # set when the update rescheduled pending jobs
+
+    class Config:
+        from_attributes = True
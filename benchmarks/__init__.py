@@ -0,0 +1,10 @@
+"""
+Benchmarks for the engine and scheduler hot paths.
+
+    python -m benchmarks run [--database-url URL] [--participants 100,1000] [--nodes 10] [--fanout 4] [-o out.json]
+    python -m benchmarks compare BASELINE.json CURRENT.json [--threshold 0.15]
+
+Each run builds synthetic projects (app.seed-style rows, see benchmarks.synthetic) in the
+target database and writes machine-readable JSON; compare flags cases whose throughput
+dropped by more than the threshold against a stored baseline.
+"""
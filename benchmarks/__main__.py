@@ -0,0 +1,86 @@
+"""Command line for the benchmark suite (see benchmarks/__init__.py)."""
+import argparse
+import json
+import os
+import sys
+
+
+def _ints(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    # The scheduler and engine use app.db's engine, which is bound to DATABASE_URL at import.
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+    from app.db import Base, SessionLocal, engine
+    import app.models  # noqa: F401 - register models
+    from benchmarks.runner import CASES, run_suite
+
+    cases = args.cases.split(",") if args.cases else list(CASES)
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        print(f"Unknown cases: {', '.join(sorted(unknown))} (expected {', '.join(CASES)})", file=sys.stderr)
+        return 2
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    def progress(result: dict) -> None:
+        print(
+            f"{result['backend']} {result['case']:<20} p={result['participants']} n={result['nodes']} "
+            f"f={result['fanout']}: {result['ops_per_second']:.1f} ops/s, p95 {result['p95_ms']:.2f} ms",
+            file=sys.stderr,
+        )
+
+    report = run_suite(SessionLocal, args.participants, args.nodes, args.fanout, cases, args.seed, progress)
+    text = json.dumps(report, indent=2)
+    if args.output and args.output != "-":
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    from benchmarks.compare import compare_reports, format_comparisons
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    comparisons = compare_reports(baseline, current, args.threshold)
+    print(format_comparisons(comparisons))
+    regressions = [c for c in comparisons if c.regressed]
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Run the suite and write JSON results")
+    run.add_argument("--database-url", help="Target database (default: DATABASE_URL, else sqlite:///./benchmark.db)")
+    run.add_argument("--participants", type=_ints, default=[100, 1000], help="Comma-separated participant counts")
+    run.add_argument("--nodes", type=_ints, default=[10], help="Comma-separated graph sizes (broadcast nodes)")
+    run.add_argument("--fanout", type=_ints, default=[4], help="Comma-separated poll fan-outs (conditions per answer)")
+    run.add_argument("--cases", help="Comma-separated subset of cases (default: all)")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--reset", action="store_true", help="Drop and recreate all tables first (dedicated databases only)")
+    run.add_argument("-o", "--output", help="JSON output file (default: stdout)")
+    run.set_defaults(func=cmd_run)
+    cmp = sub.add_parser("compare", help="Compare results against a baseline; exit 1 on regressions")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.15, help="Allowed throughput drop (fraction, default 0.15)")
+    cmp.set_defaults(func=cmd_compare)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
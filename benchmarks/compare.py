@@ -0,0 +1,47 @@
+"""
+Compare two benchmark reports.
+
+Results are matched on (backend, case, participants, nodes, fanout). A case regressed
+when its throughput fell by more than ``threshold`` (a fraction) against the baseline;
+cases only in one report are listed but never fail the comparison.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+KEY_FIELDS = ("backend", "case", "participants", "nodes", "fanout")
+
+
+@dataclass(frozen=True)
+class Comparison:
+    key: tuple
+    baseline: Optional[float]  # ops/s
+    current: Optional[float]
+    change: Optional[float]  # current / baseline - 1
+    regressed: bool
+
+
+def _key(result: dict) -> tuple:
+    return tuple(result.get(name) for name in KEY_FIELDS)
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float = 0.15) -> list[Comparison]:
+    before = {_key(r): r["ops_per_second"] for r in baseline.get("results", [])}
+    after = {_key(r): r["ops_per_second"] for r in current.get("results", [])}
+    comparisons = []
+    for key in [*before, *(k for k in after if k not in before)]:  # report order
+        old, new = before.get(key), after.get(key)
+        change = new / old - 1 if old and new is not None else None
+        comparisons.append(Comparison(key, old, new, change, change is not None and change < -threshold))
+    return comparisons
+
+
+def format_comparisons(comparisons: list[Comparison]) -> str:
+    lines = [f"{'case':<44} {'baseline/s':>12} {'current/s':>12} {'change':>8}"]
+    for c in comparisons:
+        backend, case, participants, nodes, fanout = c.key
+        label = f"{backend} {case} p={participants} n={nodes} f={fanout}"
+        old = f"{c.baseline:.1f}" if c.baseline is not None else "-"
+        new = f"{c.current:.1f}" if c.current is not None else "-"
+        change = f"{c.change:+.1%}" if c.change is not None else "new" if c.baseline is None else "gone"
+        lines.append(f"{label:<44} {old:>12} {new:>12} {change:>8}{'  REGRESSION' if c.regressed else ''}")
+    return "\n".join(lines)
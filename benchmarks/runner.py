@@ -0,0 +1,199 @@
+"""
+The benchmark cases and the result format.
+
+Every case runs once per participant of a fresh synthetic project, in the order a real
+flow would (keyword, poll answer, node execution), and records per-operation latency;
+scheduler_drain enqueues one due job per participant and times draining them through
+the scheduler's claim/execute path, on the benchmark's sessions and only for the
+synthetic project. Results are plain dicts so they serialize to JSON
+as they are.
+"""
+import platform
+import random
+import statistics
+import subprocess
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Iterable, Optional, Sequence
+
+import sqlalchemy
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.engine import _condition_matches, execute_node, process_keyword, process_poll_answer
+from app.core.graph import get_project_graph
+from app.models import ScheduledJob
+from app.models.scheduled_job import JobLane, JobStatus
+from benchmarks.synthetic import KEYWORD, SyntheticProject, add_participants, generate_project
+
+CASES = ("process_keyword", "process_poll_answer", "condition_matches", "execute_node", "scheduler_drain")
+FORMAT_VERSION = 1
+
+
+def _timings(seconds: list[float], ops: Optional[int] = None, total: Optional[float] = None) -> dict:
+    """Summary of per-operation latencies (or of one timed block doing ``ops`` operations)."""
+    ops = len(seconds) if ops is None else ops
+    total = sum(seconds) if total is None else total
+    ordered = sorted(seconds)
+
+    def percentile(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else 0.0
+
+    return {
+        "ops": ops,
+        "seconds": round(total, 6),
+        "ops_per_second": round(ops / total, 3) if total > 0 else 0.0,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4) if ordered else 0.0,
+        "p50_ms": round(percentile(0.5), 4),
+        "p95_ms": round(percentile(0.95), 4),
+    }
+
+
+def _per_op(items: Iterable, op: Callable) -> dict:
+    seconds = []
+    for item in items:
+        start = time.perf_counter()
+        op(item)
+        seconds.append(time.perf_counter() - start)
+    return _timings(seconds)
+
+
+def _drain(session_factory: Callable[[], Session], project: SyntheticProject) -> dict:
+    from app.core import scheduler
+
+    db = session_factory()
+    try:
+        chain = project.chain_node_ids or project.branch_node_ids
+        now = datetime.utcnow()
+        db.execute(insert(ScheduledJob), [
+            {
+                "id": str(uuid.uuid4()),
+                "participant_id": pid,
+                "project_id": project.project_id,
+                "node_id": chain[i % len(chain)],
+                "run_at": now,
+                "status": JobStatus.PENDING.value,
+                "lane": JobLane.BULK.value,
+                "attempts": 0,
+                "created_at": now,
+            }
+            for i, pid in enumerate(project.participant_ids)
+        ])
+        db.commit()
+        dialect = db.get_bind().dialect.name
+    finally:
+        db.close()
+    # SQLite connections stay on the thread that opened them, so drain it without the worker pool.
+    executor = None
+    if dialect != "sqlite":
+        from concurrent.futures import ThreadPoolExecutor
+        from app.config import settings
+        executor = ThreadPoolExecutor(max_workers=max(1, settings.SCHEDULER_WORKERS))
+    scope = (ScheduledJob.project_id == project.project_id,)  # other due jobs in the database are not ours to time
+    start = time.perf_counter()
+    batches, drained = [], 0
+    try:
+        while True:
+            batch_start = time.perf_counter()
+            claimed = scheduler._run_scheduler_once(executor, session_factory, scope)
+            if not claimed:
+                break
+            batches.append(time.perf_counter() - batch_start)
+            drained += claimed
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    result = _timings(batches, ops=drained, total=time.perf_counter() - start)
+    result["batches"] = len(batches)
+    return result
+
+
+def run_case(
+    session_factory: Callable[[], Session],
+    participants: int,
+    nodes: int,
+    fanout: int,
+    cases: Sequence[str] = CASES,
+    seed: int = 0,
+) -> list[dict]:
+    """Run the selected cases on one fresh synthetic project; returns one result per case."""
+    rng = random.Random(seed)
+    db = session_factory()
+    try:
+        project = generate_project(db, nodes, fanout)
+        ids = add_participants(db, project, participants)
+        graph = get_project_graph(db, project.project_id)
+        branch_nodes = [graph.nodes[node_id] for node_id in project.branch_node_ids]
+        chain = project.chain_node_ids or project.branch_node_ids
+        measured: dict[str, dict] = {}
+        # The cases build on each other: the keyword enrolls participants and sends the poll they answer.
+        if "process_keyword" in cases or "process_poll_answer" in cases or "condition_matches" in cases:
+            measured["process_keyword"] = _per_op(ids, lambda pid: process_keyword(db, pid, KEYWORD))
+        if "process_poll_answer" in cases or "condition_matches" in cases:
+            answers = {pid: str(rng.randint(1, max(1, fanout))) for pid in ids}
+            measured["process_poll_answer"] = _per_op(ids, lambda pid: process_poll_answer(db, pid, answers[pid]))
+        if "condition_matches" in cases:
+            now = datetime.utcnow()
+            measured["condition_matches"] = _per_op(
+                ids, lambda pid: [_condition_matches(db, pid, node, now) for node in branch_nodes]
+            )
+        if "execute_node" in cases:
+            measured["execute_node"] = _per_op(
+                enumerate(ids), lambda item: execute_node(db, item[1], chain[item[0] % len(chain)])
+            )
+    finally:
+        db.close()
+    if "scheduler_drain" in cases:
+        measured["scheduler_drain"] = _drain(session_factory, project)
+    return [
+        {"case": case, "participants": participants, "nodes": nodes, "fanout": fanout, **measured[case]}
+        for case in cases
+        if case in measured
+    ]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_suite(
+    session_factory: Callable[[], Session],
+    participants: Sequence[int],
+    nodes: Sequence[int],
+    fanouts: Sequence[int],
+    cases: Sequence[str] = CASES,
+    seed: int = 0,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """Run every (participants, nodes, fanout) combination; returns the JSON-ready report."""
+    db = session_factory()
+    try:
+        backend = db.get_bind().dialect.name
+    finally:
+        db.close()
+    results = []
+    for count in participants:
+        for size in nodes:
+            for fanout in fanouts:
+                for result in run_case(session_factory, count, size, fanout, cases, seed):
+                    result["backend"] = backend
+                    results.append(result)
+                    if progress is not None:
+                        progress(result)
+    return {
+        "format": FORMAT_VERSION,
+        "meta": {
+            "backend": backend,
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
@@ -0,0 +1,111 @@
+"""
+Synthetic projects for benchmarks.
+
+A project of size (nodes, fanout) is shaped like the prototype flow, scaled up:
+
+    Bench_Start (START_DATE, Instantly) -> Bench_Poll (poll with ``fanout`` choices)
+      answer i -> Bench_Branch_i (AFTER_POLL, condition poll = i)
+        -> Bench_Chain_i_1 -> ... (AFTER_NODE, one day apart)
+
+so an answer evaluates ``fanout`` conditions, and ``nodes`` broadcast nodes are spread
+over the branches. The ``bench`` keyword activates a participant and sends the start
+node and the poll inline.
+"""
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Keyword,
+    MessageTemplate,
+    Node,
+    NodeCondition,
+    Participant,
+    Project,
+    TimingElement,
+    Variable,
+)
+
+KEYWORD = "bench"
+
+
+@dataclass
+class SyntheticProject:
+    project_id: str
+    start_node_id: str
+    poll_variable_id: str
+    branch_node_ids: list[str]  # one per poll answer, each with one condition
+    chain_node_ids: list[str]  # broadcast nodes with an AFTER_NODE dependent
+    participant_ids: list[str] = field(default_factory=list)
+
+
+def generate_project(db: Session, nodes: int = 10, fanout: int = 4, name: str = "Benchmark") -> SyntheticProject:
+    """Create and commit a synthetic project with ``nodes`` chain nodes over ``fanout`` poll branches."""
+    fanout = max(1, fanout)
+    project_id = str(uuid.uuid4())
+    db.add(Project(id=project_id, name=f"{name} {project_id[:8]}", description="Synthetic benchmark project", status="Active"))
+    db.flush()
+    instantly, later = str(uuid.uuid4()), str(uuid.uuid4())
+    db.add_all([
+        TimingElement(id=instantly, project_id=project_id, name="Instantly", direction="AFTER", days=0, hours=0, minutes=0, seconds=0),
+        TimingElement(id=later, project_id=project_id, name="1_Day", direction="AFTER", days=1, hours=0, minutes=0, seconds=0),
+    ])
+    start_var, poll_var = str(uuid.uuid4()), str(uuid.uuid4())
+    db.add_all([
+        Variable(id=start_var, project_id=project_id, name="Start_Date", type="DateTime", source="INTERNAL", is_system=True, is_agv=False),
+        Variable(id=poll_var, project_id=project_id, name="Bench_Poll_Variable", type="Integer", source="INTERNAL", is_system=False, is_agv=False),
+    ])
+    broadcast, poll = str(uuid.uuid4()), str(uuid.uuid4())
+    choices = [str(i) for i in range(1, fanout + 1)]
+    db.add_all([
+        MessageTemplate(id=broadcast, project_id=project_id, type="BROADCAST", name="Bench_Broadcast", text_en="Benchmark broadcast.", text_es="Difusión de prueba."),
+        MessageTemplate(id=poll, project_id=project_id, type="POLL", name="Bench_Poll", text_en="Pick a branch.", text_es="Elige una rama.", variable_id=poll_var, choices_en=choices, choices_es=choices),
+    ])
+    db.flush()
+
+    start, poll_node = str(uuid.uuid4()), str(uuid.uuid4())
+    db.add(Node(id=start, project_id=project_id, name="Bench_Start", is_terminal=False, schedule_timing_id=instantly, message_template_id=broadcast, activation_type="START_DATE", activation_datetime_var_id=start_var))
+    db.add(Node(id=poll_node, project_id=project_id, name="Bench_Poll", is_terminal=False, schedule_timing_id=later, message_template_id=poll, activation_type="AFTER_NODE", activation_source_node_id=start))
+    db.flush()
+    branches, chain = [], []
+    per_branch = max(0, nodes - fanout) // fanout
+    for i, choice in enumerate(choices, start=1):
+        previous = str(uuid.uuid4())
+        db.add(Node(id=previous, project_id=project_id, name=f"Bench_Branch_{i}", is_terminal=False, schedule_timing_id=later, message_template_id=broadcast, activation_type="AFTER_POLL", activation_poll_id=poll))
+        db.flush()
+        db.add(NodeCondition(id=str(uuid.uuid4()), node_id=previous, variable_id=poll_var, operation="equal", expected_answer=choice))
+        branches.append(previous)
+        for j in range(1, per_branch + 1):
+            node_id = str(uuid.uuid4())
+            db.add(Node(id=node_id, project_id=project_id, name=f"Bench_Chain_{i}_{j}", is_terminal=j == per_branch, schedule_timing_id=later, message_template_id=broadcast, activation_type="AFTER_NODE", activation_source_node_id=previous))
+            db.flush()
+            chain.append(previous)
+            previous = node_id
+    db.add(Keyword(id=str(uuid.uuid4()), project_id=project_id, name="Benchmark activation", keyword_text=KEYWORD, language="English", action_type="ACTIVATE_PARTICIPANT", referenced_node_id=start, referenced_variable_id=start_var))
+    db.commit()
+    return SyntheticProject(project_id, start, poll_var, branches, chain)
+
+
+def add_participants(db: Session, project: SyntheticProject, count: int, status: str = "INACTIVE") -> list[str]:
+    """Bulk-insert ``count`` participants (INACTIVE until the bench keyword activates them) and commit."""
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "project_id": project.project_id,
+            "external_id": f"bench-{i}",
+            "language": "English",
+            "channel": "web",
+            "status": status,
+            "created_at": datetime.utcnow(),
+        }
+        for i in range(count)
+    ]
+    if rows:
+        db.execute(insert(Participant), rows)
+    db.commit()
+    ids = [row["id"] for row in rows]
+    project.participant_ids.extend(ids)
+    return ids
@@ -25,13 +25,17 @@ def db_engine():
         participant,
         participant_message,
         participant_variable,
+        participant_state,
         node_execution_log,
         scheduled_job,
+        campaign,
+        outbox_message,
     )
     engine = create_engine(
         TEST_DATABASE_URL,
         connect_args={"check_same_thread": False} if "sqlite" in TEST_DATABASE_URL else {},
     )
+    Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
     return engine
 
@@ -70,10 +74,12 @@ def db_session(db_engine):
 
 @pytest.fixture
 def client(db_engine):
-    """Test client. Override get_db to use test engine and seed prototype."""
+    """Test client. Override get_db / get_async_db to use the test database and seed prototype."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
     from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import NullPool
     from app.main import app
-    from app.db import get_db
+    from app.db import async_database_url, get_async_db, get_db
 
     Session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
     session = Session()
@@ -87,7 +93,16 @@ def client(db_engine):
         finally:
             db.close()
 
+    # NullPool: the TestClient portal's event loop must not reuse connections opened on another loop.
+    async_engine = create_async_engine(async_database_url(TEST_DATABASE_URL), poolclass=NullPool)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False)
+
+    async def override_get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
@@ -52,3 +52,83 @@ def test_send_message_keyword(client: TestClient):
     assert any(m["text"] == "iselect" for m in inbound)
     # Scheduler may have already sent Broadcast_1
     assert len(outbound) >= 0
+
+
+def test_messages_keyset_pagination(client: TestClient):
+    """Messages page by cursor: limit bounds the page, since returns newer rows (plus a look-back), before walks back."""
+    from unittest.mock import patch
+    from app.config import settings
+    r = client.get("/api/projects")
+    proj = next((p for p in r.json() if p["name"] == "Prototype"), None)
+    pid = client.post("/api/participants", json={"project_id": proj["id"], "language": "English"}).json()["id"]
+    for i in range(5):
+        assert client.post(f"/api/participants/{pid}/message", json={"text": f"hello {i}"}).status_code == 200
+
+    first = client.get(f"/api/participants/{pid}/messages", params={"limit": 2})
+    assert [m["text"] for m in first.json()] == ["hello 0", "hello 1"]
+    cursor = first.headers["X-Next-Cursor"]
+    assert cursor == first.json()[-1]["cursor"]
+
+    rest = client.get(f"/api/participants/{pid}/messages", params={"since": cursor})
+    # The look-back window re-reads hello 0 (the cursor row itself is not repeated); clients dedupe by id.
+    assert [m["text"] for m in rest.json()] == ["hello 0", "hello 2", "hello 3", "hello 4"]
+    assert rest.headers["X-Next-Cursor"] == rest.json()[-1]["cursor"]
+    # Nothing new: only already-seen rows, same cursor to poll with again.
+    seen = {m["id"] for m in first.json() + rest.json()}
+    again = client.get(f"/api/participants/{pid}/messages", params={"since": rest.headers["X-Next-Cursor"]})
+    assert {m["id"] for m in again.json()} <= seen and again.headers["X-Next-Cursor"] == rest.headers["X-Next-Cursor"]
+    with patch.object(settings, "SINCE_LOOKBACK_SECONDS", 0):
+        empty = client.get(f"/api/participants/{pid}/messages", params={"since": rest.headers["X-Next-Cursor"]})
+        assert empty.json() == []
+
+    older = client.get(f"/api/participants/{pid}/messages", params={"before": rest.json()[-1]["cursor"], "limit": 2})
+    assert [m["text"] for m in older.json()] == ["hello 2", "hello 3"]
+
+    assert client.get(f"/api/participants/{pid}/messages", params={"since": "not-a-cursor"}).status_code == 400
+    assert client.get(f"/api/participants/{pid}/messages", params={"limit": 0}).status_code == 422
+
+
+def test_timeline_since_cursor(client: TestClient):
+    """Timeline entries carry cursors and since only returns later executions."""
+    r = client.get("/api/projects")
+    proj = next((p for p in r.json() if p["name"] == "Prototype"), None)
+    pid = client.post("/api/participants", json={"project_id": proj["id"], "language": "English"}).json()["id"]
+    from app.core.engine import execute_node
+    from app.models import Node
+    from app.routes.participants import get_db
+    db = next(client.app.dependency_overrides[get_db]())
+    try:
+        start = db.query(Node).filter(Node.project_id == proj["id"], Node.name == "Node_Start").first()
+        execute_node(db, pid, start.id)
+        timeline = client.get(f"/api/participants/{pid}/timeline").json()
+        assert [t["node_name"] for t in timeline] == ["Node_Start", "Node_0"]
+        after = client.get(f"/api/participants/{pid}/timeline", params={"since": timeline[0]["cursor"]}).json()
+        assert [t["node_name"] for t in after] == ["Node_0"]
+    finally:
+        db.close()
+
+
+def test_since_polling_delivers_rows_committed_out_of_order(client: TestClient):
+    """A row stamped before the client's cursor but committed after it was taken still arrives on the next poll."""
+    import uuid
+    from datetime import datetime, timedelta
+    from app.models import ParticipantMessage
+    from app.routes.participants import get_db
+    proj = next(p for p in client.get("/api/projects").json() if p["name"] == "Prototype")
+    pid = client.post("/api/participants", json={"project_id": proj["id"], "language": "English"}).json()["id"]
+    assert client.post(f"/api/participants/{pid}/message", json={"text": "first"}).status_code == 200
+    page = client.get(f"/api/participants/{pid}/messages")
+    cursor = page.headers["X-Next-Cursor"]
+    stamped = datetime.fromisoformat(page.json()[-1]["created_at"]) - timedelta(seconds=1)
+
+    db = next(client.app.dependency_overrides[get_db]())
+    try:  # e.g. a scheduler worker that stamped its message earlier but committed later
+        db.add(ParticipantMessage(id=str(uuid.uuid4()), participant_id=pid, direction="OUTBOUND", text="late",
+                                  created_at=stamped))
+        db.commit()
+    finally:
+        db.close()
+    seen = {m["id"] for m in page.json()}
+    polled = client.get(f"/api/participants/{pid}/messages", params={"since": cursor})
+    assert [m["text"] for m in polled.json() if m["id"] not in seen] == ["late"]
+    assert polled.headers["X-Next-Cursor"] == cursor  # the late row does not move the cursor back
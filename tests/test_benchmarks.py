@@ -0,0 +1,65 @@
+"""Benchmark suite tests (synthetic project, a tiny run, regression comparison)."""
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.compare import compare_reports
+from benchmarks.runner import run_suite
+
+
+def _report(**ops_per_second):
+    return {"results": [
+        {"backend": "sqlite", "case": case, "participants": 10, "nodes": 4, "fanout": 2, "ops_per_second": value}
+        for case, value in ops_per_second.items()
+    ]}
+
+
+def test_tiny_run_produces_json_ready_results(db_engine):
+    """Every engine case runs against a synthetic project and reports throughput and latency percentiles."""
+    import json
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    cases = ("process_keyword", "process_poll_answer", "condition_matches", "execute_node")
+    report = run_suite(Session, [5], [6], [3], cases)
+    assert report["meta"]["backend"] == "sqlite"
+    assert [r["case"] for r in report["results"]] == list(cases)
+    for result in report["results"]:
+        assert result["ops"] == 5 and result["ops_per_second"] > 0
+        assert result["p50_ms"] <= result["p95_ms"]
+    assert json.loads(json.dumps(report)) == report
+
+
+def test_compare_flags_throughput_drops_beyond_threshold():
+    """Only drops beyond the threshold regress; new and removed cases are listed but pass."""
+    baseline = _report(execute_node=100.0, process_keyword=100.0, condition_matches=50.0)
+    current = _report(execute_node=80.0, process_keyword=90.0, scheduler_drain=10.0)
+    by_case = {c.key[1]: c for c in compare_reports(baseline, current, threshold=0.15)}
+    assert by_case["execute_node"].regressed and round(by_case["execute_node"].change, 2) == -0.2
+    assert not by_case["process_keyword"].regressed
+    assert by_case["condition_matches"].current is None and not by_case["condition_matches"].regressed
+    assert by_case["scheduler_drain"].baseline is None and not by_case["scheduler_drain"].regressed
+
+
+def test_scheduler_drain_only_claims_the_synthetic_project(db_engine, db_session):
+    """A due job of another project in the same database is neither drained nor counted."""
+    import uuid
+    from datetime import datetime, timedelta
+    from app.models import Node, Participant, Project, ScheduledJob
+    from app.seed.prototype import seed_prototype_project
+    proj = Project(id=str(uuid.uuid4()), name="DrainBystander", description="Test", status="Active")
+    db_session.add(proj)
+    db_session.commit()
+    seed_prototype_project(db_session, proj.id)
+    p = Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="ACTIVE")
+    node = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_Start").first()
+    job = ScheduledJob(id=str(uuid.uuid4()), participant_id=p.id, project_id=proj.id, node_id=node.id,
+                       run_at=datetime.utcnow() - timedelta(seconds=1), status="PENDING")
+    db_session.add_all([p, job])
+    db_session.commit()
+
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    try:
+        (result,) = run_suite(Session, [4], [3], [2], ("scheduler_drain",))["results"]
+        db_session.refresh(job)
+        assert job.status == "PENDING"
+        assert result["ops"] == 4
+    finally:
+        db_session.delete(job)
+        db_session.commit()
@@ -0,0 +1,92 @@
+"""Campaign fan-out tests."""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.core.campaigns import CampaignError, campaign_progress, cancel_campaign, create_campaign
+from app.models import Project, Participant, Node, ScheduledJob
+from app.models.scheduled_job import JobStatus
+
+
+@pytest.fixture
+def audience(db_session):
+    """A prototype project with 4 English and 2 Spanish ACTIVE participants plus 1 INACTIVE one."""
+    from app.seed.prototype import seed_prototype_project
+    proj = Project(id=str(uuid.uuid4()), name="CampaignTest", description="Test", status="Active")
+    db_session.add(proj)
+    db_session.commit()
+    seed_prototype_project(db_session, proj.id)
+    languages = ["English"] * 4 + ["Spanish"] * 2
+    db_session.add_all(
+        [Participant(id=str(uuid.uuid4()), project_id=proj.id, language=lang, status="ACTIVE") for lang in languages]
+        + [Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="INACTIVE")]
+    )
+    db_session.commit()
+    broadcast = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_2").first()
+    return proj.id, broadcast.id
+
+
+def test_campaign_enqueues_jobs_with_one_insert(db_session, audience):
+    """All targeted participants get a PENDING job from a single INSERT ... SELECT."""
+    project_id, node_id = audience
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        campaign = create_campaign(db_session, project_id, node_id, name="Announcement")
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    job_inserts = [s for s in statements if s.lstrip().upper().startswith("INSERT INTO SCHEDULED_JOBS")]
+    assert len(job_inserts) == 1 and "SELECT" in job_inserts[0].upper()
+    assert campaign.job_count == 6
+    jobs = db_session.query(ScheduledJob).filter(ScheduledJob.campaign_id == campaign.id).all()
+    assert len({j.id for j in jobs}) == 6 and {j.node_id for j in jobs} == {node_id}
+    assert all(j.status == JobStatus.PENDING.value and j.attempts == 0 for j in jobs)
+
+
+def test_campaign_language_filter_progress_and_cancel(db_session, audience):
+    """A language filter narrows the audience; progress counts by status; cancel stops pending jobs."""
+    from app.core.engine import execute_nodes_batch
+    project_id, node_id = audience
+    campaign = create_campaign(
+        db_session, project_id, node_id, language="Spanish", run_at=datetime.utcnow() - timedelta(seconds=1)
+    )
+    assert campaign.job_count == 2
+    jobs = db_session.query(ScheduledJob).filter(ScheduledJob.campaign_id == campaign.id).all()
+    execute_nodes_batch(db_session, [(jobs[0].participant_id, node_id)], [jobs[0].id])
+    assert campaign_progress(db_session, campaign.id) == {"DONE": 1, "PENDING": 1}
+    assert cancel_campaign(db_session, campaign.id) == 1
+    assert campaign_progress(db_session, campaign.id) == {"DONE": 1, "CANCELLED": 1}
+
+    with pytest.raises(CampaignError):
+        create_campaign(db_session, project_id, "not-a-node")
+
+
+def test_campaign_api(client):
+    """POST creates a campaign with its job count; GET reports progress; unknown nodes are rejected."""
+    proj = next(p for p in client.get("/api/projects").json() if p["name"] == "Prototype")
+    client.post("/api/participants", json={"project_id": proj["id"]})  # at least one ACTIVE participant
+    from app.models import Node
+    from app.routes.participants import get_db
+    db = next(client.app.dependency_overrides[get_db]())
+    try:
+        node_id = db.query(Node.id).filter(Node.project_id == proj["id"], Node.name == "Node_2").scalar()
+    finally:
+        db.close()
+    run_at = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    r = client.post(f"/api/projects/{proj['id']}/campaigns", json={"node_id": node_id, "run_at": run_at})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["job_count"] >= 1 and body["progress"] == {"PENDING": body["job_count"]}
+    r = client.get(f"/api/projects/{proj['id']}/campaigns/{body['id']}")
+    assert r.status_code == 200 and r.json()["id"] == body["id"]
+    r = client.post(f"/api/projects/{proj['id']}/campaigns/{body['id']}/cancel")
+    assert r.json()["progress"] == {"CANCELLED": body["job_count"]}
+    r = client.post(f"/api/projects/{proj['id']}/campaigns", json={"node_id": "nope"})
+    assert r.status_code == 400
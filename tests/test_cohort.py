@@ -0,0 +1,156 @@
+"""Cohort query tests."""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+
+from app.core.cohort import CohortCondition, CohortError, count_cohort, iter_cohort_pages, select_cohort
+from app.core.conditions import VariableValue, compile_condition
+from app.db import get_db
+from app.models import Node, Project, Participant, ParticipantVariable, Variable
+
+# (Poll_1_Variable text answer, Poll_2_Variable int answer); None = never answered.
+ANSWERS = [("Yes", 3), (" yes ", 7), ("no", 18), ("maybe", 25), (None, 40), ("No", None), (None, None)]
+
+
+@pytest.fixture
+def cohort_project(db_session):
+    """A prototype project whose ACTIVE participants answered the two polls as in ANSWERS."""
+    from app.seed.prototype import seed_prototype_project
+    proj = Project(id=str(uuid.uuid4()), name="CohortTest", description="Test", status="Active")
+    db_session.add(proj)
+    db_session.commit()
+    seed_prototype_project(db_session, proj.id)
+    variables = {
+        v.name: v
+        for v in db_session.query(Variable).filter(Variable.project_id == proj.id)
+    }
+    participants = []
+    for text, number in ANSWERS:
+        p = Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="ACTIVE")
+        db_session.add(p)
+        if text is not None:
+            db_session.add(ParticipantVariable(
+                id=str(uuid.uuid4()), participant_id=p.id, variable_id=variables["Poll_1_Variable"].id, value_text=text
+            ))
+        if number is not None:
+            db_session.add(ParticipantVariable(
+                id=str(uuid.uuid4()), participant_id=p.id, variable_id=variables["Poll_2_Variable"].id, value_int=number
+            ))
+        participants.append((p.id, text, number))
+    db_session.add(Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="INACTIVE"))
+    db_session.commit()
+    return proj.id, variables, participants
+
+
+CASES = [
+    ("Poll_1_Variable", "equal", "YES"),
+    ("Poll_1_Variable", "in", "no, maybe"),
+    ("Poll_1_Variable", "not_in", "yes"),
+    ("Poll_1_Variable", "not_in", ""),
+    ("Poll_2_Variable", "equal", "7"),
+    ("Poll_2_Variable", "gt", "7"),
+    ("Poll_2_Variable", "gte", "7"),
+    ("Poll_2_Variable", "lt", "18"),
+    ("Poll_2_Variable", "lte", "18"),
+    ("Poll_2_Variable", "in", "3, 25, x"),
+    ("Poll_2_Variable", "not_in", "3,40"),
+    ("Poll_2_Variable", "gt", "not a number"),
+]
+
+
+@pytest.mark.parametrize("name,operation,value", CASES)
+def test_cohort_matches_compiled_conditions(db_session, cohort_project, name, operation, value):
+    """The SQL cohort selects exactly the participants the engine's compiled condition accepts."""
+    project_id, variables, participants = cohort_project
+    variable = variables[name]
+    compiled = compile_condition(
+        SimpleNamespace(id="c", variable_id=variable.id, operation=operation, expected_answer=value), variable
+    )
+    expected = set()
+    for pid, text, number in participants:
+        answer = text if name == "Poll_1_Variable" else number
+        values = {}
+        if answer is not None:
+            values[variable.id] = VariableValue(value_text=text) if isinstance(answer, str) else VariableValue(value_int=number)
+        if compiled.matches(values):
+            expected.add(pid)
+    page = select_cohort(db_session, project_id, [CohortCondition(name, operation, value)])
+    assert set(page.participant_ids) == expected
+
+
+def test_cohort_conjunction_is_one_query_and_pages_by_cursor(db_session, cohort_project):
+    """Several conditions compile into one SELECT; keyset pages cover the cohort exactly once."""
+    project_id, variables, participants = cohort_project
+    conditions = [
+        CohortCondition("Poll_2_Variable", "lt", "30"),
+        CohortCondition(variables["Poll_1_Variable"].id, "not_in", "maybe"),  # by id works too
+    ]
+    wanted = sorted(pid for pid, text, number in participants if number is not None and number < 30 and text and text.strip().lower() != "maybe")
+    assert len(wanted) == 3
+    count_cohort(db_session, project_id)  # warm the project graph cache
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        first = select_cohort(db_session, project_id, conditions, limit=2)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    # Besides the graph cache's version check, the whole cohort is one SELECT.
+    assert len([s for s in statements if "FROM participants" in s]) == 1
+    assert len(statements) <= 2
+    assert first.participant_ids == wanted[:2] and first.next_cursor == wanted[1]
+    second = select_cohort(db_session, project_id, conditions, after=first.next_cursor, limit=2)
+    assert second.participant_ids == wanted[2:] and second.next_cursor is None
+    assert [pid for page in iter_cohort_pages(db_session, project_id, conditions, page_size=1) for pid in page] == wanted
+    assert count_cohort(db_session, project_id, conditions) == 3
+    assert count_cohort(db_session, project_id) == len(ANSWERS)
+    assert count_cohort(db_session, project_id, status=None) == len(ANSWERS) + 1
+
+
+def test_cohort_rejects_unknown_variable_and_operation(db_session, cohort_project):
+    project_id, _, _ = cohort_project
+    with pytest.raises(CohortError):
+        select_cohort(db_session, project_id, [CohortCondition("Nope", "equal", "1")])
+    with pytest.raises(CohortError):
+        select_cohort(db_session, project_id, [CohortCondition("Poll_2_Variable", "between", "1")])
+
+
+def test_cohort_api_and_campaign_targeting(client):
+    """Query, count and export endpoints agree; a campaign can target the same cohort."""
+    db = next(client.app.dependency_overrides[get_db]())
+    proj = Project(id=str(uuid.uuid4()), name="CohortApi", description="Test", status="Active")
+    db.add(proj)
+    db.commit()
+    from app.seed.prototype import seed_prototype_project
+    seed_prototype_project(db, proj.id)
+    var = db.query(Variable).filter(Variable.project_id == proj.id, Variable.name == "Poll_2_Variable").first()
+    for number in (1, 5, 9):
+        p = Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="ACTIVE")
+        db.add(p)
+        db.add(ParticipantVariable(id=str(uuid.uuid4()), participant_id=p.id, variable_id=var.id, value_int=number))
+    db.commit()
+    body = {"conditions": [{"variable": "Poll_2_Variable", "operation": "gte", "value": "5"}], "limit": 1}
+
+    r = client.post(f"/api/projects/{proj.id}/cohorts/query", json=body)
+    assert r.status_code == 200 and len(r.json()["participant_ids"]) == 1 and r.json()["next_cursor"]
+    r = client.post(f"/api/projects/{proj.id}/cohorts/count", json=body)
+    assert r.json() == {"count": 2}
+    r = client.post(f"/api/projects/{proj.id}/cohorts/export", json=body)
+    assert r.status_code == 200 and len(r.text.splitlines()) == 2
+
+    bad = {"conditions": [{"variable": "Missing", "value": "1"}]}
+    assert client.post(f"/api/projects/{proj.id}/cohorts/query", json=bad).status_code == 400
+    assert client.post(f"/api/projects/{proj.id}/cohorts/export", json=bad).status_code == 400
+    assert client.post("/api/projects/nope/cohorts/count", json={}).status_code == 404
+
+    node = db.query(Node.id).filter(Node.project_id == proj.id, Node.name == "Node_2").scalar()
+    r = client.post(f"/api/projects/{proj.id}/campaigns", json={"node_id": node, "conditions": body["conditions"]})
+    assert r.status_code == 200 and r.json()["job_count"] == 2
+    r = client.post(f"/api/projects/{proj.id}/campaigns", json={"node_id": node, "conditions": bad["conditions"]})
+    assert r.status_code == 400
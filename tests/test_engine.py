@@ -12,10 +12,13 @@ from app.models import (
     MessageTemplate,
     Node,
     NodeCondition,
+    Keyword,
     ParticipantVariable,
     TimingElement,
 )
-from app.core.engine import _condition_matches, _resolve_text, _timedelta_from_timing
+from app.core.engine import _condition_matches
+from app.core.graph import timedelta_from_timing
+from app.core.protocol import resolve_text
 
 
 @pytest.fixture
@@ -41,7 +44,7 @@ def test_timedelta_from_timing():
         hours = 0
         minutes = 1
         seconds = 30
-    delta = _timedelta_from_timing(T())
+    delta = timedelta_from_timing(T())
     assert delta.total_seconds() == 90
 
 
@@ -50,7 +53,7 @@ def test_resolve_text_english():
     class T:
         text_en = "Hello"
         text_es = "Hola"
-    assert _resolve_text(T(), "English") == "Hello"
+    assert resolve_text(T(), "English") == "Hello"
 
 
 def test_resolve_text_spanish():
@@ -58,7 +61,7 @@ def test_resolve_text_spanish():
     class T:
         text_en = "Hello"
         text_es = "Hola"
-    assert _resolve_text(T(), "Spanish") == "Hola"
+    assert resolve_text(T(), "Spanish") == "Hola"
 
 
 def test_condition_matches_text_equal(db_session, project_and_participant):
@@ -92,3 +95,401 @@ def test_condition_matches_text_no_match(db_session, project_and_participant):
     db_session.add(pv)
     db_session.commit()
     assert _condition_matches(db_session, participant.id, node, datetime.utcnow()) is False
+
+
+def test_project_graph_is_cached_until_config_changes(db_session, project_and_participant):
+    """Compiled graph is reused while config_version is unchanged and rebuilt after a config edit."""
+    from app.core.graph import get_project_graph
+    proj, _ = project_and_participant
+    graph = get_project_graph(db_session, proj.id)
+    assert graph is get_project_graph(db_session, proj.id)
+    node_0 = next(n for n in graph.nodes.values() if n.name == "Node_0")
+    assert node_0.delay.total_seconds() == 45
+    assert [n.name for n in graph.start_nodes] == ["Node_Start"]
+    assert {n.name for n in graph.after_node[node_0.activation_source_node_id]} == {"Node_0"}
+    assert graph.keywords["iselect"].action_type == "ACTIVATE_PARTICIPANT"
+    assert graph.start_date_variable_id in graph.variables
+
+    timing = db_session.query(TimingElement).filter(
+        TimingElement.project_id == proj.id, TimingElement.name == "45_Seconds"
+    ).first()
+    timing.seconds = 50
+    db_session.commit()
+    rebuilt = get_project_graph(db_session, proj.id)
+    assert rebuilt is not graph
+    assert rebuilt.nodes[node_0.id].delay.total_seconds() == 50
+
+
+def test_execute_node_schedules_dependents_from_graph(db_session, project_and_participant):
+    """Executing Node_2 (10 s timing) schedules Node_3 instead of running it inline."""
+    from app.core.engine import execute_node
+    from app.models import ScheduledJob
+    proj, participant = project_and_participant
+    node_2 = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_2").first()
+    node_3 = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_3").first()
+    before = datetime.utcnow()
+    msg = execute_node(db_session, participant.id, node_2.id)
+    assert msg is not None
+    jobs = db_session.query(ScheduledJob).filter(ScheduledJob.participant_id == participant.id).all()
+    assert [j.node_id for j in jobs] == [node_3.id]
+    assert (jobs[0].run_at - before).total_seconds() >= 10
+
+
+def test_execute_node_runs_zero_delay_dependents_inline(db_session, project_and_participant):
+    """Node_Start is Instantly, so Node_0 (Poll_1) is sent in the same call without a ScheduledJob."""
+    from app.core.engine import execute_node
+    from app.models import NodeExecutionLog, ParticipantMessage, ScheduledJob
+    proj, participant = project_and_participant
+    start = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_Start").first()
+    node_0 = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_0").first()
+    msg = execute_node(db_session, participant.id, start.id)
+    assert msg is not None and "Broadcast 1" in msg.text
+    assert db_session.query(ScheduledJob).filter(ScheduledJob.participant_id == participant.id).count() == 0
+    assert db_session.query(ParticipantMessage).filter(ParticipantMessage.participant_id == participant.id).count() == 2
+    logged = {
+        log.node_id
+        for log in db_session.query(NodeExecutionLog).filter(NodeExecutionLog.participant_id == participant.id)
+    }
+    assert logged == {start.id, node_0.id}
+
+
+def test_inline_chain_depth_bound_falls_back_to_scheduling(db_session, project_and_participant):
+    """Past ENGINE_INLINE_CHAIN_DEPTH a zero-delay dependent is persisted as a due job."""
+    from app.config import settings
+    from app.core.engine import execute_node
+    from app.models import ScheduledJob
+    proj, participant = project_and_participant
+    start = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_Start").first()
+    node_0 = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_0").first()
+    with patch.object(settings, "ENGINE_INLINE_CHAIN_DEPTH", 0):
+        execute_node(db_session, participant.id, start.id)
+    jobs = db_session.query(ScheduledJob).filter(ScheduledJob.participant_id == participant.id).all()
+    assert [j.node_id for j in jobs] == [node_0.id]
+    assert jobs[0].run_at <= datetime.utcnow()
+
+
+def test_compiled_conditions_int_and_text_operations():
+    """Compiled predicates cover equal/gt/gte/lt/lte/in/not_in for int and text variables."""
+    from types import SimpleNamespace
+    from app.core.conditions import VariableValue, compile_condition
+
+    int_var = SimpleNamespace(type="Integer")
+
+    def check(operation, expected, value, variable=int_var):
+        cond = SimpleNamespace(id="c", variable_id="v", operation=operation, expected_answer=expected)
+        return compile_condition(cond, variable).matches({"v": value})
+
+    seven = VariableValue(value_text="7", value_int=7)
+    assert check("gt", "5", seven) and not check("lte", "5", seven)
+    assert check("gte", "7", seven) and check("lt", "8", seven) and check("equal", "7", seven)
+    assert check("in", "1, 7, 9", seven) and not check("not_in", "1,7", seven)
+    # No hard-coded fallback: a non-numeric expected answer never matches an int variable.
+    assert not check("gt", "many", seven)
+
+    answer = VariableValue(value_text=" Maybe ")
+    assert check("equal", "maybe", answer, variable=None)
+    assert check("in", "yes,maybe", answer, variable=None)
+    assert check("not_in", "yes,no", answer, variable=None)
+    cond = SimpleNamespace(id="c", variable_id="v", operation="equal", expected_answer="yes")
+    assert compile_condition(cond, None).matches({}) is False
+
+
+def test_conditional_fan_out_fetches_variables_once(db_session, project_and_participant):
+    """Answering Poll_2 loads the participant's variables in one query; all its dependents are then decided in memory."""
+    from dataclasses import replace
+    from sqlalchemy import event
+    from app.core.effects import load_snapshots
+    from app.core.graph import get_project_graph
+    from app.core.protocol import PollAnswerReceived, decide
+    proj, participant = project_and_participant
+    graph = get_project_graph(db_session, proj.id)
+    poll_2 = next(t for t in graph.templates.values() if t.name == "Poll_2")
+    db_session.add(ParticipantVariable(
+        id=str(uuid.uuid4()),
+        participant_id=participant.id,
+        variable_id=poll_2.variable_id,
+        value_text="8",
+        value_int=8,
+    ))
+    db_session.commit()
+    participant_id = participant.id
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        snapshots, _ = load_snapshots(db_session, [participant_id])
+        loaded = len(statements)
+        snapshot = replace(snapshots[participant_id], awaiting_poll_template_id=poll_2.id)
+        effects = decide(graph, snapshot, PollAnswerReceived("8"), datetime.utcnow())
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert [m.node_name for m in effects.messages] == ["Node_5"]  # Node_4 (<= 5) does not match
+    assert sum("participant_variables" in s for s in statements) == 1
+    assert len(statements) == loaded  # deciding issues no queries
+
+
+def test_execute_nodes_batch_bulk_writes_and_isolates_skips(db_session, project_and_participant):
+    """Batch executes valid pairs in one commit, marks their jobs DONE and skips unknown nodes."""
+    from app.core.engine import execute_nodes_batch
+    from app.models import NodeExecutionLog, ParticipantMessage, ScheduledJob
+    from app.models.scheduled_job import JobStatus
+    proj, participant = project_and_participant
+    other = Participant(id=str(uuid.uuid4()), project_id=proj.id, language="Spanish", status="ACTIVE")
+    inactive = Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="INACTIVE")
+    db_session.add_all([other, inactive])
+    db_session.commit()
+    start = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_Start").first()
+    node_0 = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_0").first()
+    node_2 = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_2").first()
+    node_3 = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_3").first()
+    job = ScheduledJob(
+        id=str(uuid.uuid4()),
+        participant_id=participant.id,
+        node_id=start.id,
+        run_at=datetime.utcnow(),
+        status=JobStatus.RUNNING.value,
+    )
+    db_session.add(job)
+    db_session.commit()
+
+    pairs = [
+        (participant.id, start.id),
+        (other.id, node_2.id),
+        (inactive.id, start.id),
+        (participant.id, "missing-node"),
+    ]
+    outcomes = execute_nodes_batch(db_session, pairs, [job.id, None, None, None])
+    assert [o.message_id is not None for o in outcomes] == [True, True, False, False]
+    assert all(o.error is None for o in outcomes)
+
+    texts = {}
+    for m in db_session.query(ParticipantMessage).filter(
+        ParticipantMessage.participant_id.in_([participant.id, other.id])
+    ):
+        texts.setdefault(m.participant_id, []).append(m.text)
+    # Node_Start's zero-delay dependent Node_0 ran inline; Node_2's 10 s dependent was scheduled.
+    assert len(texts[participant.id]) == 2 and any("Broadcast 1" in t for t in texts[participant.id])
+    assert len(texts[other.id]) == 1
+    logged = {log.node_id for log in db_session.query(NodeExecutionLog).filter(
+        NodeExecutionLog.participant_id.in_([participant.id, other.id])
+    )}
+    assert logged == {start.id, node_0.id, node_2.id}
+    scheduled = db_session.query(ScheduledJob).filter(
+        ScheduledJob.participant_id.in_([participant.id, other.id]),
+        ScheduledJob.id != job.id,
+    ).all()
+    assert [(j.participant_id, j.node_id) for j in scheduled] == [(other.id, node_3.id)]
+    db_session.refresh(job)
+    assert job.status == JobStatus.DONE.value
+
+
+def test_conversation_state_routes_poll_answer_without_history_scan(db_session, project_and_participant):
+    """Sending Poll_1 records it as awaited; answering it reads that state instead of the message history."""
+    from sqlalchemy import event
+    from app.core.engine import execute_node, process_poll_answer
+    from app.models import ParticipantState, ScheduledJob
+    proj, participant = project_and_participant
+    participant_id = participant.id
+    nodes = {n.name: n for n in db_session.query(Node).filter(Node.project_id == proj.id)}
+    poll_1 = db_session.query(MessageTemplate).filter(
+        MessageTemplate.project_id == proj.id, MessageTemplate.name == "Poll_1"
+    ).first()
+    execute_node(db_session, participant_id, nodes["Node_Start"].id)  # Node_0 (Poll_1) runs inline
+    state = db_session.get(ParticipantState, participant_id)
+    assert state.awaiting_poll_template_id == poll_1.id
+    assert state.last_node_id == nodes["Node_0"].id
+    assert state.outbound_count == 2 and state.inbound_count == 0
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert process_poll_answer(db_session, participant_id, "Yes") is None
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert not any("participant_messages" in s and "SELECT" in s for s in statements)
+    jobs = db_session.query(ScheduledJob).filter(ScheduledJob.participant_id == participant_id).all()
+    assert [j.node_id for j in jobs] == [nodes["Node_2"].id]
+
+
+def test_jobs_are_laned_by_what_triggered_them(db_session, project_and_participant):
+    """Poll follow-ups (and their own follow-ups) are interactive; START_DATE schedules are bulk."""
+    from app.config import settings
+    from app.core.engine import execute_node, execute_nodes_batch, process_keyword, process_poll_answer
+    from app.models import ScheduledJob
+    from app.models.scheduled_job import JobLane
+    proj, participant = project_and_participant
+    nodes = {n.name: n for n in db_session.query(Node).filter(Node.project_id == proj.id)}
+
+    def lanes():
+        jobs = db_session.query(ScheduledJob).filter(ScheduledJob.participant_id == participant.id)
+        return {nodes_by_id[j.node_id]: j.lane for j in jobs}
+
+    nodes_by_id = {n.id: name for name, n in nodes.items()}
+    execute_node(db_session, participant.id, nodes["Node_Start"].id)
+    process_poll_answer(db_session, participant.id, "Yes")
+    assert lanes() == {"Node_2": JobLane.INTERACTIVE.value}
+    execute_nodes_batch(db_session, [(participant.id, nodes["Node_2"].id)], lanes=[JobLane.INTERACTIVE.value])
+    assert lanes()["Node_3"] == JobLane.INTERACTIVE.value
+
+    other = Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="INACTIVE")
+    db_session.add(other)
+    db_session.commit()
+    keyword = db_session.query(Keyword).filter(Keyword.project_id == proj.id, Keyword.action_type == "ACTIVATE_PARTICIPANT").first()
+    with patch.object(settings, "ENGINE_INLINE_CHAIN_DEPTH", 0):
+        process_keyword(db_session, other.id, keyword.keyword_text)
+    jobs = db_session.query(ScheduledJob).filter(ScheduledJob.participant_id == other.id).all()
+    assert jobs and {j.lane for j in jobs} == {JobLane.BULK.value}
+
+
+def test_batch_merges_conversation_state_per_participant(db_session, project_and_participant):
+    """A batch upserts one state row per participant: counts add up and the last poll/node win."""
+    from app.core.engine import execute_nodes_batch
+    from app.models import ParticipantState
+    proj, participant = project_and_participant
+    nodes = {n.name: n.id for n in db_session.query(Node).filter(Node.project_id == proj.id)}
+    execute_nodes_batch(db_session, [(participant.id, nodes["Node_Start"]), (participant.id, nodes["Node_2"])])
+    state = db_session.get(ParticipantState, participant.id)
+    assert state.outbound_count == 3
+    assert state.last_node_id == nodes["Node_2"]
+    poll_1 = db_session.query(MessageTemplate).filter(
+        MessageTemplate.project_id == proj.id, MessageTemplate.name == "Poll_1"
+    ).first()
+    assert state.awaiting_poll_template_id == poll_1.id  # Node_2 is a broadcast; the poll stays awaited
+
+
+def test_async_entry_points_share_engine_logic(db_session, project_and_participant):
+    """The AsyncSession entry points run the same engine code through the async driver."""
+    import asyncio
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.pool import NullPool
+    from app.core.engine import execute_node_async, process_keyword_async, process_poll_answer_async
+    from app.db import async_database_url
+    from app.models import ParticipantMessage, ParticipantState
+    proj, participant = project_and_participant
+    participant_id = participant.id
+    start = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_Start").first().id
+    url = str(db_session.get_bind().url)
+    assert async_database_url("postgresql://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+
+    async def run():
+        engine = create_async_engine(async_database_url(url), poolclass=NullPool)
+        try:
+            async with AsyncSession(engine, autoflush=False) as db:
+                msg = await execute_node_async(db, participant_id, start)
+                assert msg is not None
+                assert await process_keyword_async(db, participant_id, "not-a-keyword") is None
+                assert await process_poll_answer_async(db, participant_id, "Yes") is None
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+    db_session.expire_all()
+    assert db_session.query(ParticipantMessage).filter(ParticipantMessage.participant_id == participant_id).count() == 2
+    assert db_session.get(ParticipantState, participant_id).outbound_count == 2
+
+
+def test_spread_run_at_is_deterministic_bounded_and_order_preserving():
+    """Run times move onto the participant's phase: within one window, stable, monotonic, spread out."""
+    from datetime import timedelta
+    from app.core.spread import spread_run_at
+    window = timedelta(minutes=10)
+    base = datetime(2025, 5, 1, 9, 0, 0)
+    spread = [spread_run_at(base, f"p{i}", window) for i in range(500)]
+    assert all(base <= t < base + window for t in spread)
+    assert spread == [spread_run_at(base, f"p{i}", window) for i in range(500)]
+    assert len({t.minute for t in spread}) == 10  # every minute of the window is used
+    # A participant's later timings never land before its earlier ones, and whole-window
+    # delays keep the phase instead of adding another offset.
+    times = [spread_run_at(base + timedelta(seconds=s), "p1", window) for s in range(0, 3600, 37)]
+    assert times == sorted(times)
+    assert spread_run_at(base + window, "p1", window) - spread[1] == window
+    assert spread_run_at(base, "p1", timedelta(0)) == base
+
+
+def test_timing_spread_schedules_instead_of_running_inline(db_session, project_and_participant):
+    """A spread on an Instantly timing defers its dependents (and activations) into the window."""
+    from datetime import timedelta
+    from app.core.engine import activate_participants, execute_node
+    from app.core.graph import get_project_graph
+    from app.core.spread import spread_run_at
+    from app.models import ScheduledJob
+    proj, participant = project_and_participant
+    start = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_Start").first()
+    node_0 = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_0").first()
+    timing = db_session.get(TimingElement, start.schedule_timing_id)
+    timing.spread_seconds = 600
+    db_session.commit()
+
+    before = datetime.utcnow()
+    execute_node(db_session, participant.id, start.id)
+    jobs = db_session.query(ScheduledJob).filter(ScheduledJob.participant_id == participant.id).all()
+    assert [j.node_id for j in jobs] == [node_0.id]
+    assert before <= jobs[0].run_at < before + timedelta(seconds=601)
+
+    graph = get_project_graph(db_session, proj.id)
+    keyword = next(k for k in graph.keywords.values() if k.action_type == "ACTIVATE_PARTICIPANT")
+    ids = [str(uuid.uuid4()) for _ in range(20)]
+    db_session.add_all(Participant(id=pid, project_id=proj.id, language="English", status="ACTIVE") for pid in ids)
+    db_session.flush()
+    now = datetime(2100, 5, 1, 9, 0, 0)  # far future: never claimed by other tests
+    activate_participants(db_session, graph, keyword, ids, now=now)
+    db_session.commit()
+    rows = db_session.query(ScheduledJob).filter(ScheduledJob.participant_id.in_(ids)).all()
+    window = graph.nodes[rows[0].node_id].spread
+    assert rows and all(j.run_at == spread_run_at(now, j.participant_id, window) for j in rows)
+    assert len({j.run_at for j in rows}) > 1
+
+
+def test_apply_effects_writes_in_bulk_in_order(db_session, project_and_participant):
+    """Later variable writes win, and a cancel drops what the same batch scheduled before it."""
+    from app.core.conditions import VariableValue, load_variable_values
+    from app.core.effects import apply_effects, load_snapshots
+    from app.core.protocol import Effects, ScheduledRun, VariableWrite
+    from app.models import ScheduledJob
+    from app.models.scheduled_job import JobStatus
+    proj, participant = project_and_participant
+    nodes = {n.name: n.id for n in db_session.query(Node).filter(Node.project_id == proj.id)}
+    rating = db_session.query(Variable).filter(Variable.project_id == proj.id, Variable.name == "Poll_2_Variable").first()
+    run_at = datetime(2100, 1, 1)
+    earlier = Effects(participant.id, proj.id, jobs=[ScheduledRun(nodes["Node_2"], run_at, "bulk")],
+                      variables=[VariableWrite(rating.id, VariableValue("2", 2))])
+    cancel = Effects(participant.id, proj.id, cancel_pending=True, status="INACTIVE",
+                     variables=[VariableWrite(rating.id, VariableValue("7", 7))])
+    later = Effects(participant.id, proj.id, jobs=[ScheduledRun(nodes["Node_3"], run_at, "bulk")])
+    snapshots, _ = load_snapshots(db_session, [participant.id])
+    assert apply_effects(db_session, snapshots, [earlier, cancel, later]) == [[], [], []]
+    db_session.commit()
+
+    jobs = db_session.query(ScheduledJob).filter(ScheduledJob.participant_id == participant.id).all()
+    assert [(j.node_id, j.status) for j in jobs] == [(nodes["Node_3"], JobStatus.PENDING.value)]
+    assert load_variable_values(db_session, participant.id, [rating.id])[rating.id] == VariableValue("7", 7)
+    db_session.refresh(participant)
+    assert participant.status == "INACTIVE"
+
+
+def test_poll_answers_batch_decides_in_order_and_commits_once(db_session, project_and_participant):
+    """Each answer sees the effects of earlier ones in the batch; unknown participants get an error."""
+    from app.core.engine import execute_node, process_poll_answers_batch
+    from app.models import ParticipantMessage
+    proj, participant = project_and_participant
+    participant_id = participant.id
+    nodes = {n.name: n.id for n in db_session.query(Node).filter(Node.project_id == proj.id)}
+    execute_node(db_session, participant_id, nodes["Node_Start"])  # sends Poll_1
+    errors = process_poll_answers_batch(db_session, [(participant_id, "Yes"), ("missing", "Yes")])
+    assert errors == [None, "Participant not found or inactive"]
+    value = db_session.query(ParticipantVariable).join(Variable).filter(
+        ParticipantVariable.participant_id == participant_id, Variable.name == "Poll_1_Variable"
+    ).one()
+    assert value.value_text == "Yes"
+    assert process_poll_answers_batch(db_session, []) == []
+    assert db_session.query(ParticipantMessage).filter(ParticipantMessage.participant_id == participant_id).count() == 2
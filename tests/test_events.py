@@ -0,0 +1,158 @@
+"""Conversation event pub/sub and SSE stream tests."""
+import asyncio
+import json
+import uuid
+from datetime import timedelta
+
+import pytest
+
+from app.core.events import MESSAGE, TIMELINE, EventBus, bus
+from app.models import Project, Participant, Node, ParticipantMessage
+
+
+@pytest.fixture
+def participant(db_session):
+    """An ACTIVE participant in a fresh prototype project."""
+    from app.seed.prototype import seed_prototype_project
+    proj = Project(id=str(uuid.uuid4()), name="EventsTest", description="Test", status="Active")
+    db_session.add(proj)
+    db_session.commit()
+    seed_prototype_project(db_session, proj.id)
+    p = Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="ACTIVE")
+    db_session.add(p)
+    db_session.commit()
+    return proj.id, p.id
+
+
+def test_engine_events_published_on_commit(db_session, participant):
+    """execute_node publishes its messages and timeline entries once the transaction commits."""
+    from app.core.engine import execute_node
+    project_id, participant_id = participant
+    start = db_session.query(Node).filter(Node.project_id == project_id, Node.name == "Node_Start").first()
+    sub = bus.subscribe(participant_id)
+    try:
+        execute_node(db_session, participant_id, start.id)
+        events = sub.drain()
+    finally:
+        sub.close()
+    # Node_Start plus Node_0, which runs inline (zero delay).
+    assert [e.type for e in events] == [MESSAGE, TIMELINE, MESSAGE, TIMELINE]
+    assert "Broadcast 1" in events[0].data["text"]
+    assert events[1].data["node_name"] == "Node_Start" and events[3].data["node_name"] == "Node_0"
+    assert not bus.has_subscribers(participant_id)
+
+
+def test_batch_events_discarded_on_rollback(db_session, participant):
+    """Events recorded in a transaction that rolls back are never delivered."""
+    from app.core.engine import execute_nodes_batch
+    project_id, participant_id = participant
+    start = db_session.query(Node).filter(Node.project_id == project_id, Node.name == "Node_Start").first()
+    sub = bus.subscribe(participant_id)
+    try:
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(db_session, "commit", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+            with pytest.raises(RuntimeError):
+                execute_nodes_batch(db_session, [(participant_id, start.id)])
+        db_session.rollback()
+        assert sub.drain() == []
+        execute_nodes_batch(db_session, [(participant_id, start.id)])
+        assert len(sub.drain()) == 4
+    finally:
+        sub.close()
+
+
+def test_subscription_wakes_async_consumer_from_another_thread():
+    """A publisher thread wakes a consumer waiting on the event loop; idle waits time out empty."""
+    from app.core.events import ConversationEvent
+    local_bus = EventBus()
+
+    async def consume():
+        sub = local_bus.subscribe("p1")
+        assert await sub.get(0.01) == []
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(None, local_bus.publish, [ConversationEvent("p1", MESSAGE, {"id": "m1"})])
+        events = await sub.get(5)
+        sub.close()
+        return events
+
+    events = asyncio.run(consume())
+    assert [e.data["id"] for e in events] == ["m1"]
+
+
+def test_event_stream_sends_snapshot_then_live_events():
+    """The SSE generator emits the snapshot, then pushed events, and unsubscribes when the client leaves."""
+    from app.core.events import ConversationEvent
+    from app.routes.participants import _event_stream
+
+    class FakeRequest:
+        def __init__(self):
+            self.checks = 0
+
+        async def is_disconnected(self):
+            self.checks += 1
+            return self.checks > 1
+
+    async def collect():
+        sub = bus.subscribe("sse-participant")
+        bus.publish([ConversationEvent("sse-participant", TIMELINE, {"id": "log-1", "node_name": "N", "cursor": "c1"})])
+        chunks = [chunk async for chunk in _event_stream(FakeRequest(), sub, {"messages": [], "timeline": []})]
+        return chunks
+
+    chunks = asyncio.run(collect())
+    assert "event: snapshot\n" in chunks[0]
+    assert "event: timeline\n" in chunks[1]
+    assert json.loads(chunks[1].split("data: ", 1)[1])["id"] == "log-1"
+    assert chunks[1].startswith("id: .c1\n")  # message cursor (none yet) . timeline cursor
+    assert not bus.has_subscribers("sse-participant")
+
+
+def test_events_endpoint_unknown_participant(client):
+    """The stream endpoint 404s for unknown participants."""
+    r = client.get("/api/participants/does-not-exist/events")
+    assert r.status_code == 404
+
+
+def test_reconnect_snapshot_only_carries_missed_rows(db_session, participant):
+    """A Last-Event-ID with both cursors yields a delta snapshot; a bad one falls back to a reset."""
+    from app.core.engine import execute_node
+    from app.routes.participants import _snapshot
+    project_id, participant_id = participant
+    nodes = {
+        n.name: n.id
+        for n in db_session.query(Node).filter(Node.project_id == project_id, Node.name.in_(["Node_Start", "Node_2"]))
+    }
+    execute_node(db_session, participant_id, nodes["Node_Start"])
+    first = _snapshot(db_session, participant_id, None)
+    assert first["reset"] and len(first["messages"]) == 2 and len(first["timeline"]) == 2
+
+    last_event_id = f"{first['messages'][-1].cursor}.{first['timeline'][-1].cursor}"
+    execute_node(db_session, participant_id, nodes["Node_2"])
+    delta = _snapshot(db_session, participant_id, last_event_id)
+    assert not delta["reset"]
+    # Rows after the cursors, preceded by the look-back re-read (which the client dedupes by id).
+    seen = {m.id for m in first["messages"]} | {t.id for t in first["timeline"]}
+    assert len([m for m in delta["messages"] if m.id not in seen]) == 1
+    assert [t.node_name for t in delta["timeline"] if t.id not in seen] == ["Node_2"]
+
+    assert _snapshot(db_session, participant_id, "garbage.cursor")["reset"]
+
+
+def test_reconnect_snapshot_includes_rows_committed_behind_the_cursor(db_session, participant):
+    """A message stamped before the Last-Event-ID but committed after it still reaches the resumed stream."""
+    from app.core.engine import execute_node
+    from app.routes.participants import _snapshot
+    project_id, participant_id = participant
+    node_start = db_session.query(Node).filter(Node.project_id == project_id, Node.name == "Node_Start").one()
+    execute_node(db_session, participant_id, node_start.id)
+    first = _snapshot(db_session, participant_id, None)
+    last_event_id = f"{first['messages'][-1].cursor}.{first['timeline'][-1].cursor}"
+
+    late = ParticipantMessage(
+        id=str(uuid.uuid4()), participant_id=participant_id, direction="OUTBOUND", text="late",
+        created_at=first["messages"][-1].created_at - timedelta(seconds=1),
+    )
+    db_session.add(late)
+    db_session.commit()
+    delta = _snapshot(db_session, participant_id, last_event_id)
+    assert not delta["reset"] and late.id in {m.id for m in delta["messages"]}
+    assert delta["cursors"] == last_event_id.split(".")
@@ -0,0 +1,106 @@
+"""What-if impact analysis tests."""
+import uuid
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.clock import VirtualClock, use_clock
+from app.models import Node, Participant, ParticipantVariable, Project, ScheduledJob, Variable
+from app.models.scheduled_job import JobLane
+
+SCHEDULED = datetime(2100, 2, 1, 9, 59, 0)  # far future: the scheduler never claims these jobs
+
+
+@pytest.fixture
+def live_project(db_session):
+    """Prototype project with Node_3 pending for three participants (Poll_2 = 3, 7, 9) and Node_5 for two."""
+    from app.core.effects import apply_effects, load_snapshots
+    from app.core.engine import execute_node
+    from app.core.protocol import Effects, ScheduledRun
+    from app.seed.prototype import seed_prototype_project
+    proj = Project(id=str(uuid.uuid4()), name="ImpactTest", description="Test", status="Active")
+    db_session.add(proj)
+    db_session.commit()
+    seed_prototype_project(db_session, proj.id)
+    nodes = {n.name: n.id for n in db_session.query(Node).filter(Node.project_id == proj.id)}
+    poll_2 = db_session.query(Variable).filter(Variable.project_id == proj.id, Variable.name == "Poll_2_Variable").one()
+    participants = []
+    for rating in (3, 7, 9):
+        p = Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="ACTIVE")
+        db_session.add(p)
+        db_session.add(ParticipantVariable(
+            id=str(uuid.uuid4()), participant_id=p.id, variable_id=poll_2.id, value_text=str(rating), value_int=rating
+        ))
+        participants.append(p.id)
+    db_session.add(Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="INACTIVE"))
+    db_session.commit()
+    with use_clock(VirtualClock(SCHEDULED)):
+        for pid in participants:
+            execute_node(db_session, pid, nodes["Node_2"])  # Node_3 due 10 s later (Node_2's timing)
+        snapshots, _ = load_snapshots(db_session, participants[1:])
+        apply_effects(db_session, snapshots, [
+            Effects(pid, proj.id, jobs=[ScheduledRun(nodes["Node_5"], SCHEDULED, JobLane.BULK.value)]) for pid in participants[1:]
+        ])
+        db_session.commit()
+    return proj.id
+
+
+PROPOSAL = {
+    "timings": {"10_Seconds": {"seconds": 70}},
+    "nodes": {"Node_5": {"conditions": [{"variable": "Poll_2_Variable", "operation": "gt", "expected_answer": 8}]}},
+}
+
+
+def test_impact_reports_shifts_unscheduled_jobs_and_load_without_writing(db_session, live_project):
+    """Retiming shifts Node_3 by a minute into the next hour; the stricter Node_5 loses the rating-7 participant."""
+    from app.core.impact import analyze_impact
+    before = {(j.id, j.run_at, j.status) for j in db_session.query(ScheduledJob)}
+    report = analyze_impact(db_session, live_project, PROPOSAL, workers=0, batch_size=2)
+    assert report.changed_nodes == ["Node_2", "Node_5"]  # Node_3 jobs follow Node_2's timing
+    assert report.pending_jobs == 5
+    assert report.shifted_jobs == 3
+    assert report.min_shift_seconds == report.max_shift_seconds == report.mean_shift_seconds == 60.0
+    assert report.unscheduled_jobs == 1
+    assert report.active_participants == 3
+    assert report.affected_participants == 3
+    assert report.conditions == [{"node": "Node_5", "gained": 0, "lost": 1}]
+    assert report.load_curve == [
+        {"hour": datetime(2100, 2, 1, 9), "before": 5, "after": 2},
+        {"hour": datetime(2100, 2, 1, 10), "before": 0, "after": 3},
+    ]
+    assert {(j.id, j.run_at, j.status) for j in db_session.query(ScheduledJob)} == before
+
+    pooled = analyze_impact(db_session, live_project, PROPOSAL, workers=2, batch_size=2)
+    assert replace(pooled, wall_seconds=0) == replace(report, wall_seconds=0)
+
+
+def test_impact_counts_only_real_changes(db_session, live_project):
+    """Restating current conditions changes nothing; unknown names are configuration errors."""
+    from app.core.impact import ImpactConfigError, analyze_impact
+    same = {"nodes": {"Node_5": {"conditions": [{"variable": "Poll_2_Variable", "operation": "GT", "expected_answer": "5"}]}}}
+    report = analyze_impact(db_session, live_project, same)
+    assert report.changed_nodes == [] and report.shifted_jobs == 0 and report.affected_participants == 0
+    assert report.active_participants == 3 and report.pending_jobs == 5
+    for bad in (
+        {"timings": {"Nope": {"seconds": 1}}},
+        {"timings": {"10_Seconds": {"weeks": 1}}},
+        {"nodes": {"Node_5": {"timing": "Nope"}}},
+        {"nodes": {"Node_5": {"conditions": [{"variable": "Poll_2_Variable", "operation": "near"}]}}},
+        {"edges": {}},
+    ):
+        with pytest.raises(ImpactConfigError):
+            analyze_impact(db_session, live_project, bad)
+
+
+def test_shift_keeps_offsets_from_pacing(db_session, live_project):
+    """The due-time difference is added to the stored run_at, so a job paced later stays that much later."""
+    from app.core.impact import analyze_impact
+    node_3 = db_session.query(Node).filter(Node.project_id == live_project, Node.name == "Node_3").one()
+    job = db_session.query(ScheduledJob).filter(ScheduledJob.node_id == node_3.id).first()
+    job.run_at += timedelta(hours=2)
+    db_session.commit()
+    report = analyze_impact(db_session, live_project, {"timings": {"10_Seconds": {"seconds": 70}}})
+    assert report.shifted_jobs == 3 and report.max_shift_seconds == 60.0
+    assert {"hour": datetime(2100, 2, 1, 11), "before": 1, "after": 0} in report.load_curve
+    assert {"hour": datetime(2100, 2, 1, 12), "before": 0, "after": 1} in report.load_curve
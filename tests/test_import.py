@@ -0,0 +1,87 @@
+"""Bulk participant import tests (CSV/NDJSON, de-duplication, batched activation, API and CLI)."""
+import io
+import json
+import uuid
+
+import pytest
+
+from app.core.participant_import import ImportConfigError, import_participants, iter_records
+from app.models import Project, Participant, ParticipantVariable, ScheduledJob, Node
+
+
+@pytest.fixture
+def project(db_session):
+    from app.seed.prototype import seed_prototype_project
+    proj = Project(id=str(uuid.uuid4()), name=f"ImportTest-{uuid.uuid4().hex[:8]}", description="Test", status="Active")
+    db_session.add(proj)
+    db_session.commit()
+    seed_prototype_project(db_session, proj.id)
+    return proj
+
+
+def test_csv_import_dedupes_validates_and_batches(db_session, project):
+    """Duplicates (in file and in the project) are skipped, bad rows reported by line, the rest inserted."""
+    db_session.add(Participant(id=str(uuid.uuid4()), project_id=project.id, external_id="existing"))
+    db_session.commit()
+    csv_text = (
+        "external_id,language\n"
+        "a1,English\n"
+        "a2,es\n"
+        "a1,English\n"
+        "existing,Spanish\n"
+        "a3,Klingon\n"
+        ",\n"
+    )
+    result = import_participants(db_session, project.id, iter_records(io.StringIO(csv_text), "csv"), batch_size=2)
+    assert (result.created, result.duplicates, result.error_count) == (3, 2, 1)
+    assert result.errors[0].line == 6 and "Klingon" in result.errors[0].message
+    rows = {
+        p.external_id: p.language
+        for p in db_session.query(Participant).filter(Participant.project_id == project.id)
+    }
+    assert rows == {"existing": "English", "a1": "English", "a2": "Spanish", None: "English"}
+
+
+def test_import_with_activation_schedules_start_nodes_in_bulk(db_session, project):
+    """--activate iselect sets Start_Date and schedules the keyword's start node for each created participant."""
+    ndjson = "\n".join(json.dumps({"external_id": f"p{i}"}) for i in range(5)) + "\nnot json\n"
+    result = import_participants(
+        db_session, project.id, iter_records(io.StringIO(ndjson), "ndjson"), activate_keyword="iselect", batch_size=3
+    )
+    assert (result.created, result.activated, result.scheduled_jobs, result.error_count) == (5, 5, 5, 1)
+    ids = [p.id for p in db_session.query(Participant).filter(Participant.project_id == project.id)]
+    start = db_session.query(Node).filter(Node.project_id == project.id, Node.name == "Node_Start").first()
+    jobs = db_session.query(ScheduledJob).filter(ScheduledJob.participant_id.in_(ids)).all()
+    assert {j.node_id for j in jobs} == {start.id} and len(jobs) == 5
+    assert db_session.query(ParticipantVariable).filter(ParticipantVariable.participant_id.in_(ids)).count() == 5
+
+    with pytest.raises(ImportConfigError):
+        import_participants(db_session, project.id, [], activate_keyword="iexit")
+
+
+def test_import_endpoint(client):
+    """Multipart upload returns the import summary; unknown projects 404, bad keywords 400."""
+    proj = next(p for p in client.get("/api/projects").json() if p["name"] == "Prototype")
+    ext = uuid.uuid4().hex
+    body = "\n".join(json.dumps({"external_id": f"{ext}-{i}", "language": "Spanish"}) for i in range(3))
+    files = {"file": ("cohort.ndjson", body.encode(), "application/x-ndjson")}
+    r = client.post("/api/participants/import", data={"project_id": proj["id"], "activate": "iselect"}, files=files)
+    assert r.status_code == 200
+    assert r.json()["created"] == 3 and r.json()["scheduled_jobs"] == 3
+    r = client.post("/api/participants/import", data={"project_id": proj["id"]}, files=files)
+    assert r.json()["created"] == 0 and r.json()["duplicates"] == 3
+
+    r = client.post("/api/participants/import", data={"project_id": "missing"}, files=files)
+    assert r.status_code == 404
+    r = client.post("/api/participants/import", data={"project_id": proj["id"], "activate": "nope"}, files=files)
+    assert r.status_code == 400
+
+
+def test_cli_import(db_session, project, tmp_path, capsys):
+    """The CLI resolves the project by name and prints the summary as JSON."""
+    from app.cli import main
+    path = tmp_path / "cohort.csv"
+    path.write_text("external_id,language\nc1,English\nc2,Spanish\n")
+    assert main(["import-participants", project.name, str(path)]) == 0
+    assert json.loads(capsys.readouterr().out)["created"] == 2
+    assert main(["import-participants", "no-such-project", str(path)]) == 2
@@ -0,0 +1,82 @@
+"""The engine's hot queries are served by the secondary indexes (checked with EXPLAIN)."""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select, text
+
+from app.models import (
+    Keyword,
+    Node,
+    NodeExecutionLog,
+    ParticipantMessage,
+    ParticipantVariable,
+    ScheduledJob,
+)
+
+
+def _plan(db_session, stmt) -> str:
+    """Query plan text for a statement, on SQLite or PostgreSQL."""
+    bind = db_session.get_bind()
+    sql = str(stmt.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+    if bind.dialect.name == "postgresql":
+        db_session.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = db_session.execute(text("EXPLAIN " + sql)).all()
+        return "\n".join(r[0] for r in rows)
+    rows = db_session.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+    return "\n".join(str(r[-1]) for r in rows)
+
+
+HOT_QUERIES = [
+    (
+        "ix_scheduled_jobs_status_run_at",
+        select(ScheduledJob.id)
+        .where(ScheduledJob.status == "PENDING", ScheduledJob.run_at <= datetime(2030, 1, 1))
+        .order_by(ScheduledJob.run_at)
+        .limit(50),
+    ),
+    (
+        "ix_participant_messages_participant_created",
+        select(ParticipantMessage)
+        .where(ParticipantMessage.participant_id == "p1")
+        .order_by(ParticipantMessage.created_at),
+    ),
+    (
+        "ux_participant_variables_participant_variable",
+        select(ParticipantVariable).where(
+            ParticipantVariable.participant_id == "p1",
+            ParticipantVariable.variable_id.in_(["v1", "v2"]),
+        ),
+    ),
+    (
+        "ix_nodes_project_activation_source",
+        select(Node).where(
+            Node.project_id == "proj",
+            Node.activation_type == "AFTER_NODE",
+            Node.activation_source_node_id == "n1",
+        ),
+    ),
+    (
+        "ix_nodes_project_activation_poll",
+        select(Node).where(
+            Node.project_id == "proj",
+            Node.activation_type == "AFTER_POLL",
+            Node.activation_poll_id == "t1",
+        ),
+    ),
+    (
+        "ix_keywords_project_text",
+        select(Keyword).where(Keyword.project_id == "proj", Keyword.keyword_text == "iselect"),
+    ),
+    (
+        "ix_node_execution_logs_participant_executed",
+        select(NodeExecutionLog)
+        .where(NodeExecutionLog.participant_id == "p1")
+        .order_by(NodeExecutionLog.executed_at),
+    ),
+]
+
+
+@pytest.mark.parametrize("index_name,stmt", HOT_QUERIES, ids=[name for name, _ in HOT_QUERIES])
+def test_hot_query_uses_index(db_session, index_name, stmt):
+    """Each hot query's plan references its index."""
+    assert index_name in _plan(db_session, stmt)
@@ -0,0 +1,105 @@
+"""Prometheus metrics tests (exposition format, scheduler instrumentation, /metrics)."""
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from app.config import settings
+from app.core.metrics import Counter, Histogram, Registry
+from app.models import Node, Participant, Project, ScheduledJob
+from app.models.scheduled_job import JobLane, JobStatus
+
+
+def test_exposition_format():
+    """Counters and cumulative histogram buckets render in the Prometheus text format."""
+    registry = Registry()
+    sent = registry.register(Counter("sent_total", "Sent.", ("channel",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency.", ("node",), buckets=(0.1, 1.0)))
+    sent.inc("sms")
+    sent.inc("sms", amount=2)
+    sent.inc('we"b')
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, "n1")
+    lines = registry.render().splitlines()
+    assert "# TYPE sent_total counter" in lines
+    assert 'sent_total{channel="sms"} 3' in lines
+    assert 'sent_total{channel="we\\"b"} 1' in lines
+    assert 'latency_seconds_bucket{node="n1",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{node="n1",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{node="n1",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{node="n1"} 5.55' in lines
+    assert 'latency_seconds_count{node="n1"} 3' in lines
+
+
+def test_scheduler_records_lag_timestamps_and_metrics(client, db_session):
+    """A scheduler tick stamps started_at / finished_at, and /metrics reports lag, throughput and backlog."""
+    from app.core.metrics import inbound_latency, jobs_executed, node_latency, scheduler_lag
+    from app.core.scheduler import _run_scheduler_once
+    from app.seed.prototype import seed_prototype_project
+    db_session.query(ScheduledJob).filter(ScheduledJob.run_at < datetime(2001, 1, 1)).update(
+        {ScheduledJob.status: JobStatus.CANCELLED.value}, synchronize_session=False
+    )
+    proj = Project(id=str(uuid.uuid4()), name="Metrics", description="Test", status="Active")
+    db_session.add(proj)
+    db_session.commit()
+    seed_prototype_project(db_session, proj.id)
+    p = Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="ACTIVE")
+    db_session.add(p)
+    node = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_Start").first()
+    run_at = datetime(2000, 6, 1)
+    db_session.add_all([
+        ScheduledJob(
+            id=str(uuid.uuid4()), participant_id=p.id, project_id=proj.id, node_id=node.id,
+            lane=JobLane.BULK.value, run_at=run_at + timedelta(seconds=i), status=JobStatus.PENDING.value,
+        )
+        for i in range(5)
+    ])
+    db_session.commit()
+    executed, lagged = jobs_executed.value("bulk"), scheduler_lag.count("bulk")
+
+    with patch.object(settings, "SCHEDULER_BATCH_SIZE", 1000):
+        _run_scheduler_once()
+
+    db_session.expire_all()
+    jobs = db_session.query(ScheduledJob).filter(ScheduledJob.project_id == proj.id).all()
+    assert {j.status for j in jobs} == {JobStatus.DONE.value}
+    assert all(j.run_at < j.started_at <= j.finished_at for j in jobs)
+    assert jobs_executed.value("bulk") - executed >= 5
+    assert scheduler_lag.count("bulk") - lagged >= 5
+    assert node_latency.count(proj.id, node.id) == 5
+
+    inbound = inbound_latency.count()
+    assert client.post(f"/api/participants/{p.id}/message", json={"text": "hello"}).status_code == 200
+    assert inbound_latency.count() == inbound + 1
+
+    r = client.get("/metrics")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    body = r.text
+    assert 'dash_scheduled_jobs{status="DONE"}' in body
+    assert 'dash_scheduler_lag_seconds_bucket{lane="bulk",le="+Inf"}' in body
+    assert f'dash_execute_node_seconds_count{{project="{proj.id}",node="{node.id}"}} 5' in body
+    assert "# TYPE dash_db_pool_checkout_seconds histogram" in body
+
+
+def test_async_engine_checkouts_are_timed(db_engine):
+    """Connections the event-loop routes check out of the async pool land in the same histogram."""
+    import asyncio
+    import threading
+    from unittest.mock import patch
+    from sqlalchemy import text
+    from app.core.metrics import pool_checkout
+    from app.db import new_async_session
+
+    async def query():
+        async with new_async_session() as db:
+            await db.execute(text("SELECT 1"))
+
+    observed = []
+    observe = pool_checkout.observe
+
+    def record(value, *labels):
+        observed.append(threading.current_thread())  # background threads check out connections too
+        observe(value, *labels)
+
+    with patch.object(pool_checkout, "observe", record):
+        asyncio.run(query())
+    assert observed.count(threading.current_thread()) == 1
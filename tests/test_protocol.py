@@ -0,0 +1,154 @@
+"""Unit tests for the pure protocol core (no database)."""
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import MappingProxyType, SimpleNamespace
+from unittest.mock import patch
+
+from app.config import settings
+from app.core.conditions import VariableValue, compile_condition
+from app.core.graph import CompiledKeyword, CompiledNode, CompiledTemplate, CompiledVariable, ProjectGraph
+from app.core.protocol import (
+    KeywordReceived,
+    ParticipantSnapshot,
+    PollAnswerReceived,
+    RunNode,
+    ScheduledRun,
+    advance,
+    decide,
+)
+from app.models.scheduled_job import JobLane
+
+NOW = datetime(2025, 3, 1, 9, 0, 0)
+
+
+def _node(id, template, activation, source=None, poll=None, delay=timedelta(0), conditions=()):
+    return CompiledNode(
+        id=id, project_id="p", name=id, message_template_id=template, activation_type=activation,
+        activation_source_node_id=source, activation_poll_id=poll, is_terminal=False,
+        delay=delay, spread=timedelta(0), conditions=conditions,
+        variable_ids=frozenset(c.variable_id for c in conditions),
+    )
+
+
+def _graph() -> ProjectGraph:
+    """Welcome -> (zero delay) Rating poll; <= 5 answers get Low a day later, others get High at once."""
+    variables = {
+        "start": CompiledVariable("start", "Start_Date", "datetime"),
+        "rating": CompiledVariable("rating", "Rating", "int"),
+    }
+    templates = {
+        t.id: t for t in (
+            CompiledTemplate("t_welcome", "BROADCAST", "Welcome", "Welcome", "Bienvenido", None, (), ()),
+            CompiledTemplate("t_rating", "POLL", "Rating", "Rate 1-10", None, "rating", (), ()),
+            CompiledTemplate("t_low", "BROADCAST", "Low", "Sorry", None, None, (), ()),
+            CompiledTemplate("t_high", "BROADCAST", "High", "Great", None, None, (), ()),
+            CompiledTemplate("t_bye", "BROADCAST", "Bye", "Bye", None, None, (), ()),
+        )
+    }
+
+    def cond(op, expected):
+        return compile_condition(SimpleNamespace(id=op, variable_id="rating", operation=op, expected_answer=expected),
+                                 variables["rating"])
+
+    welcome = _node("welcome", "t_welcome", "START_DATE")
+    rating = _node("rating", "t_rating", "AFTER_NODE", source="welcome")
+    low = _node("low", "t_low", "AFTER_POLL", poll="t_rating", delay=timedelta(days=1), conditions=(cond("lte", "5"),))
+    high = _node("high", "t_high", "AFTER_POLL", poll="t_rating", conditions=(cond("gt", "5"),))
+    bye = _node("bye", "t_bye", "KEYWORD")
+    nodes = {n.id: n for n in (welcome, rating, low, high, bye)}
+    keywords = {
+        "iselect": CompiledKeyword("k1", "iselect", "ACTIVATE_PARTICIPANT", None),
+        "iexit": CompiledKeyword("k2", "iexit", "DEACTIVATE_PARTICIPANT", "bye"),
+    }
+    return ProjectGraph(
+        project_id="p",
+        version="1",
+        nodes=MappingProxyType(nodes),
+        templates=MappingProxyType(templates),
+        variables=MappingProxyType(variables),
+        keywords=MappingProxyType(keywords),
+        after_node=MappingProxyType({"welcome": (rating,)}),
+        after_poll=MappingProxyType({"t_rating": (low, high)}),
+        start_nodes=(welcome,),
+        start_date_variable_id="start",
+        condition_variable_ids=frozenset({"rating"}),
+    )
+
+
+def _enrolled(graph, language="English"):
+    participant = ParticipantSnapshot("a", "p", "INACTIVE", language=language)
+    return advance(participant, decide(graph, participant, KeywordReceived(" ISELECT "), NOW))
+
+
+def test_keyword_activates_and_runs_zero_delay_chain_inline():
+    """iselect activates, stamps Start_Date and sends the start node plus its zero-delay poll."""
+    graph = _graph()
+    participant = ParticipantSnapshot("a", "p", "INACTIVE", language="Spanish")
+    effects = decide(graph, participant, KeywordReceived("iselect"), NOW)
+    assert effects.status == "ACTIVE" and not effects.cancel_pending
+    assert [(w.variable_id, w.value) for w in effects.variables] == [("start", VariableValue(value_datetime=NOW))]
+    assert [(m.node_id, m.text, m.is_poll) for m in effects.messages] == [
+        ("welcome", "Bienvenido", False),
+        ("rating", "Rate 1-10", True),  # no Spanish text: falls back to English
+    ]
+    assert effects.jobs == []
+    state = advance(participant, effects)
+    assert state.is_active and state.awaiting_poll_template_id == "t_rating"
+    assert decide(graph, state, KeywordReceived("hello"), NOW).status is None
+
+
+def test_poll_answer_branches_on_the_written_value():
+    """The answer is stored and evaluated at once: low ratings wait a day, high ones are answered inline."""
+    graph = _graph()
+    participant = _enrolled(graph)
+    low = decide(graph, participant, PollAnswerReceived(" 3 "), NOW)
+    assert [(w.variable_id, w.value) for w in low.variables] == [("rating", VariableValue("3", 3))]
+    assert low.messages == []
+    assert low.jobs == [ScheduledRun("low", NOW + timedelta(days=1), JobLane.INTERACTIVE.value)]
+    high = decide(graph, participant, PollAnswerReceived("9"), NOW)
+    assert [m.node_id for m in high.messages] == ["high"] and high.jobs == []
+    assert advance(participant, high).values["rating"] == VariableValue("9", 9)
+
+    unparsable = decide(graph, participant, PollAnswerReceived("lots"), NOW)
+    assert unparsable.variables[0].value == VariableValue("lots", None)
+    assert unparsable.messages == [] and unparsable.jobs == []
+
+
+def test_poll_answer_needs_an_active_participant_awaiting_a_poll():
+    graph = _graph()
+    fresh = ParticipantSnapshot("a", "p", "ACTIVE")
+    assert decide(graph, fresh, PollAnswerReceived("3"), NOW).variables == []  # nothing awaited
+    inactive = ParticipantSnapshot("a", "p", "INACTIVE", awaiting_poll_template_id="t_rating")
+    assert decide(graph, inactive, PollAnswerReceived("3"), NOW).error == "Participant not found or inactive"
+
+
+def test_exit_keyword_sends_exit_node_then_cancels():
+    graph = _graph()
+    participant = _enrolled(graph)
+    effects = decide(graph, participant, KeywordReceived("iexit"), NOW)
+    assert [m.node_id for m in effects.messages] == ["bye"]
+    assert effects.status == "INACTIVE" and effects.cancel_pending
+    stopped = advance(participant, effects)
+    assert decide(graph, stopped, RunNode("welcome"), NOW).messages == []  # inactive: skipped
+    assert decide(graph, stopped, KeywordReceived("iexit"), NOW).messages == []
+
+
+def test_run_node_schedules_past_inline_depth_in_its_lane():
+    """Zero-delay dependents become due jobs in the event's lane once the inline bound is reached."""
+    graph = _graph()
+    participant = _enrolled(graph)
+    with patch.object(settings, "ENGINE_INLINE_CHAIN_DEPTH", 0):
+        effects = decide(graph, participant, RunNode("welcome", JobLane.INTERACTIVE.value), NOW)
+    assert [m.node_id for m in effects.messages] == ["welcome"]
+    assert effects.jobs == [ScheduledRun("rating", NOW, JobLane.INTERACTIVE.value)]
+    assert decide(graph, participant, RunNode("missing"), NOW).messages == []
+
+
+def test_core_imports_without_a_database():
+    """The core loads without app.models / app.db, so no engine (or database driver) is needed."""
+    code = "import sys, app.core.protocol; assert not {'app.db', 'app.models'} & set(sys.modules)"
+    env = {**os.environ, "DATABASE_URL": "postgresql://nowhere/none"}
+    subprocess.run([sys.executable, "-c", code], check=True, env=env, cwd=Path(__file__).resolve().parents[1])
@@ -0,0 +1,132 @@
+"""Rescheduling pending jobs when a timing element changes."""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.clock import VirtualClock, use_clock
+from app.models import Campaign, Node, Participant, Project, ScheduledJob, TimingElement
+
+SCHEDULED = datetime(2100, 3, 1, 8, 0, 0, 250000)  # far future: the scheduler never claims these jobs
+
+
+@pytest.fixture
+def pending(db_session):
+    """Prototype project with Node_3 pending 10 s (Node_2's 10_Seconds timing) after SCHEDULED for three participants."""
+    from app.core.engine import execute_node
+    from app.seed.prototype import seed_prototype_project
+    proj = Project(id=str(uuid.uuid4()), name="RetimeTest", description="Test", status="Active")
+    db_session.add(proj)
+    db_session.commit()
+    seed_prototype_project(db_session, proj.id)
+    nodes = {n.name: n.id for n in db_session.query(Node).filter(Node.project_id == proj.id)}
+    participants = [str(uuid.uuid4()) for _ in range(3)]
+    for pid in participants:
+        db_session.add(Participant(id=pid, project_id=proj.id, language="English", status="ACTIVE"))
+    campaign = Campaign(id=str(uuid.uuid4()), project_id=proj.id, node_id=nodes["Node_3"], run_at=SCHEDULED)
+    db_session.add(campaign)
+    db_session.add(ScheduledJob(
+        id=str(uuid.uuid4()), participant_id=participants[0], project_id=proj.id, node_id=nodes["Node_3"],
+        run_at=SCHEDULED, status="PENDING", campaign_id=campaign.id, created_at=SCHEDULED,
+    ))
+    db_session.commit()
+    with use_clock(VirtualClock(SCHEDULED)):
+        for pid in participants:
+            execute_node(db_session, pid, nodes["Node_2"])
+        db_session.commit()
+    timing = db_session.query(TimingElement).filter(
+        TimingElement.project_id == proj.id, TimingElement.name == "10_Seconds"
+    ).one()
+    return timing, nodes["Node_3"]
+
+
+def _run_ats(db_session, node_id):
+    return {
+        j.id: j.run_at
+        for j in db_session.query(ScheduledJob).filter(ScheduledJob.node_id == node_id, ScheduledJob.campaign_id.is_(None))
+    }
+
+
+def test_delay_change_previews_then_moves_jobs_with_one_update(db_session, pending):
+    """The preview writes nothing; rescheduling moves every job by the delay change, keeping pacing offsets."""
+    from app.core.retiming import proposed_timing, retime_pending_jobs, update_timing
+    timing, node_3 = pending
+    paced = db_session.query(ScheduledJob).filter(ScheduledJob.node_id == node_3, ScheduledJob.campaign_id.is_(None)).first()
+    paced.run_at += timedelta(hours=2)
+    db_session.commit()
+    before = _run_ats(db_session, node_3)
+    assert sorted(before.values())[0] == SCHEDULED + timedelta(seconds=10)
+
+    preview = retime_pending_jobs(db_session, timing, proposed_timing(timing, {"minutes": 1}), apply=False)
+    assert (preview.jobs, preview.shifted_jobs, preview.shift_seconds) == (3, 3, 60.0)
+    assert preview.min_shift_seconds == preview.max_shift_seconds == 60.0
+    db_session.rollback()
+    assert _run_ats(db_session, node_3) == before
+
+    result = update_timing(db_session, timing, {"minutes": 1, "seconds": None}, reschedule=True)
+    assert result == preview
+    db_session.expire_all()
+    assert _run_ats(db_session, node_3) == {i: at + timedelta(minutes=1) for i, at in before.items()}
+    assert db_session.get(ScheduledJob, paced.id).run_at == SCHEDULED + timedelta(hours=2, minutes=1, seconds=10)
+    campaign_job = db_session.query(ScheduledJob).filter(ScheduledJob.campaign_id.isnot(None), ScheduledJob.node_id == node_3).one()
+    assert campaign_job.run_at == SCHEDULED
+    assert (timing.minutes, timing.seconds) == (1, 10)
+
+    assert update_timing(db_session, timing, {"seconds": 0}) is None  # without reschedule jobs keep their run_at
+    db_session.expire_all()
+    assert db_session.get(ScheduledJob, paced.id).run_at == SCHEDULED + timedelta(hours=2, minutes=1, seconds=10)
+    with pytest.raises(ValueError):
+        proposed_timing(timing, {"weeks": 1})
+
+
+def test_spread_jobs_land_on_each_participants_new_due_time(db_session, pending):
+    """Whole-window delay changes are one UPDATE; other changes are per participant. All match due_shift, paced or not."""
+    from app.core.retiming import due_shift, update_timing
+    from app.core.spread import spread_run_at
+    timing, node_3 = pending
+    hour = timedelta(hours=1)
+    jobs = db_session.query(ScheduledJob).filter(ScheduledJob.node_id == node_3, ScheduledJob.campaign_id.is_(None)).all()
+    for job in jobs:
+        job.run_at = spread_run_at(job.created_at + timedelta(seconds=10), job.participant_id, hour)
+    paced = jobs[0].id
+    jobs[0].run_at += timedelta(minutes=30)
+    timing.spread_seconds = 3600
+    db_session.commit()
+
+    for changes, delay, spread, new_delay, new_spread in (
+        ({"hours": 1}, 10, hour, 3610, hour),  # whole window: set-based
+        ({"hours": 0, "minutes": 40}, 3610, hour, 2410, hour),  # part of a window: Python batches
+        ({"minutes": 0, "spread_seconds": 600}, 2410, hour, 10, timedelta(minutes=10)),  # new window: Python batches
+    ):
+        before = {j.id: (j.participant_id, j.run_at, j.created_at) for j in jobs}
+        result = update_timing(db_session, timing, changes, reschedule=True)
+        db_session.expire_all()
+        expected = {
+            i: at + due_shift(pid, created, timedelta(seconds=delay), spread, timedelta(seconds=new_delay), new_spread)
+            for i, (pid, at, created) in before.items()
+        }
+        assert _run_ats(db_session, node_3) == expected
+        assert result.jobs == 3
+        for i, (pid, _, created) in before.items():
+            due = spread_run_at(created + timedelta(seconds=new_delay), pid, new_spread)
+            assert expected[i] == (due + timedelta(minutes=30) if i == paced else due)
+
+
+def test_timing_api(client):
+    """Preview counts without writing; PATCH applies the fields and, when asked, reschedules."""
+    from app.db import get_db
+    proj = next(p for p in client.get("/api/projects").json() if p["name"] == "Prototype")
+    db = next(client.app.dependency_overrides[get_db]())
+    timing = db.query(TimingElement).filter(TimingElement.project_id == proj["id"], TimingElement.name == "15_Seconds").one()
+    base = f"/api/projects/{proj['id']}/timings/{timing.id}"
+    r = client.post(f"{base}/reschedule-preview", json={"seconds": 20})
+    assert r.status_code == 200 and r.json()["shift_seconds"] == 5.0
+    r = client.patch(base, json={"seconds": 20, "reschedule": True})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["seconds"] == 20 and body["rescheduled"]["shift_seconds"] == 5.0
+    r = client.patch(base, json={"seconds": 15})
+    assert r.json()["seconds"] == 15 and r.json()["rescheduled"] is None
+    assert client.patch(f"/api/projects/{proj['id']}/timings/nope", json={}).status_code == 404
+    assert client.patch(base, json={"seconds": -1}).status_code == 422
+    db.close()
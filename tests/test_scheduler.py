@@ -0,0 +1,327 @@
+"""Scheduler tests (job claiming and execution)."""
+import threading
+import uuid
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.models import Project, Participant, Node, ScheduledJob
+from app.models.scheduled_job import JobStatus
+from app.core.scheduler import claim_due_jobs
+
+
+@pytest.fixture
+def due_jobs(db_session):
+    """A prototype project with one participant and 20 due PENDING jobs for Node_Start."""
+    from app.seed.prototype import seed_prototype_project
+    proj = Project(id=str(uuid.uuid4()), name="SchedulerTest", description="Test", status="Active")
+    db_session.add(proj)
+    db_session.commit()
+    seed_prototype_project(db_session, proj.id)
+    p = Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="ACTIVE")
+    db_session.add(p)
+    db_session.commit()
+    node = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_Start").first()
+    jobs = [
+        ScheduledJob(
+            id=str(uuid.uuid4()),
+            participant_id=p.id,
+            node_id=node.id,
+            run_at=datetime.utcnow() - timedelta(seconds=1),
+            status=JobStatus.PENDING.value,
+        )
+        for _ in range(20)
+    ]
+    db_session.add_all(jobs)
+    db_session.commit()
+    return [j.id for j in jobs]
+
+
+def test_claim_due_jobs_marks_running_once(db_session, due_jobs):
+    """Claimed jobs are RUNNING and are not handed out again."""
+    first = claim_due_jobs(db_session, 1000)
+    db_session.commit()
+    second = claim_due_jobs(db_session, 1000)
+    db_session.commit()
+    first_ids = {j.id for j in first}
+    assert set(due_jobs) <= first_ids
+    assert not first_ids & {j.id for j in second}
+    statuses = {
+        j.status for j in db_session.query(ScheduledJob).filter(ScheduledJob.id.in_(due_jobs))
+    }
+    assert statuses == {JobStatus.RUNNING.value}
+
+
+def test_concurrent_claims_never_duplicate(db_engine, due_jobs):
+    """Several threads claiming at once each get disjoint jobs."""
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    claimed: list[str] = []
+    lock = threading.Lock()
+
+    def worker():
+        db = Session()
+        try:
+            while True:
+                batch = claim_due_jobs(db, 3)
+                db.commit()
+                if not batch:
+                    return
+                with lock:
+                    claimed.extend(j.id for j in batch)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(claimed) == len(set(claimed))
+    assert set(due_jobs) <= set(claimed)
+
+
+def test_due_time_queue_sleeps_until_next_run_at():
+    """wait() returns as soon as the earliest pushed run_at is due, not after the idle bound."""
+    import time
+    from app.core.wakeup import DueTimeQueue
+    queue = DueTimeQueue()
+    queue.push(datetime.utcnow() + timedelta(seconds=0.2))
+    queue.push(datetime.utcnow() + timedelta(hours=1))
+    started = time.monotonic()
+    queue.wait(max_idle_seconds=5)
+    elapsed = time.monotonic() - started
+    assert 0.1 < elapsed < 2
+    assert queue.next_due() > datetime.utcnow() + timedelta(minutes=59)
+
+
+def test_committed_jobs_wake_the_scheduler(db_session, due_jobs):
+    """Committing a transaction that scheduled a job pushes its run_at into the due-time heap."""
+    from app.core.effects import apply_effects, load_snapshots
+    from app.core.protocol import Effects, ScheduledRun
+    from app.core.wakeup import due_times
+    job = db_session.query(ScheduledJob).filter(ScheduledJob.id == due_jobs[0]).first()
+    run_at = datetime.utcnow() - timedelta(days=365)
+    participants, _ = load_snapshots(db_session, [job.participant_id])
+    effects = Effects(job.participant_id, participants[job.participant_id].project_id, jobs=[ScheduledRun(job.node_id, run_at, job.lane)])
+    apply_effects(db_session, participants, [effects])
+    assert due_times.next_due() != run_at
+    db_session.commit()
+    assert due_times.next_due() == run_at
+    due_times.wait(0)
+
+
+def test_failed_jobs_back_off_then_fail(db_session, due_jobs):
+    """A failing job is retried later with growing delays and marked FAILED after the last attempt."""
+    from app.config import settings
+    from app.core.scheduler import fail_jobs, retry_delay
+    claimed = claim_due_jobs(db_session, 1000, lease_token="worker-a/1")
+    db_session.commit()
+    job = next(j for j in claimed if j.id == due_jobs[0])
+    assert job.attempts == 1
+    now = datetime.utcnow()
+    fail_jobs(db_session, [(job, "boom")], "worker-a/1", now=now)
+    row = db_session.query(ScheduledJob).filter(ScheduledJob.id == job.id).first()
+    assert row.status == JobStatus.PENDING.value
+    assert row.run_at == now + retry_delay(1)
+    assert row.last_error == "boom" and row.claimed_by is None
+    assert retry_delay(2) == 2 * retry_delay(1)
+    assert retry_delay(50).total_seconds() == settings.SCHEDULER_RETRY_MAX_SECONDS
+
+    last = job._replace(attempts=settings.SCHEDULER_MAX_ATTEMPTS)
+    row.status = JobStatus.RUNNING.value
+    row.claimed_by = "worker-a/2"
+    db_session.commit()
+    fail_jobs(db_session, [(last, "boom again")], "worker-a/2")
+    db_session.refresh(row)
+    assert row.status == JobStatus.FAILED.value
+
+
+def test_reaper_requeues_expired_leases(db_session, due_jobs):
+    """Jobs left RUNNING by a dead worker return to PENDING once their lease expires."""
+    from app.core.scheduler import reap_expired_leases
+    claim_due_jobs(db_session, 1000, lease_token="dead-worker/1")
+    db_session.commit()
+    assert reap_expired_leases(db_session, now=datetime.utcnow()) == 0
+    reaped = reap_expired_leases(db_session, now=datetime.utcnow() + timedelta(hours=1))
+    assert reaped >= len(due_jobs)
+    rows = db_session.query(ScheduledJob).filter(ScheduledJob.id.in_(due_jobs)).all()
+    assert {r.status for r in rows} == {JobStatus.PENDING.value}
+    assert {r.claimed_by for r in rows} == {None}
+
+
+def test_lost_lease_is_not_marked_done(db_session, due_jobs):
+    """A worker whose lease was re-claimed by another worker neither sends nor completes the job."""
+    from app.core.engine import execute_nodes_batch
+    from app.models import ParticipantMessage
+    claimed = claim_due_jobs(db_session, 1000, lease_token="slow-worker/1")
+    db_session.commit()
+    job = next(j for j in claimed if j.id == due_jobs[0])
+    db_session.query(ScheduledJob).filter(ScheduledJob.id == job.id).update(
+        {ScheduledJob.claimed_by: "other-worker/1"}, synchronize_session=False
+    )
+    db_session.commit()
+    before = db_session.query(ParticipantMessage).filter(
+        ParticipantMessage.participant_id == job.participant_id
+    ).count()
+    outcomes = execute_nodes_batch(db_session, [(job.participant_id, job.node_id)], [job.id], "slow-worker/1")
+    assert outcomes[0].error == "lease lost"
+    after = db_session.query(ParticipantMessage).filter(
+        ParticipantMessage.participant_id == job.participant_id
+    ).count()
+    assert after == before
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_grants_burst_then_refills():
+    from app.core.ratelimit import RateLimiter
+    clock = FakeClock()
+    limiter = RateLimiter(lambda key: {"a": 2.0}.get(key), burst_seconds=2, clock=clock)
+    assert limiter.available("b") is None and limiter.take("b", 1000) == 1000
+    assert limiter.take("a", 10) == 4
+    assert limiter.take("a", 1) == 0 and limiter.wait_seconds("a") == 0.5
+    clock.now += 1
+    assert limiter.available("a") == 2
+
+
+@pytest.fixture
+def two_projects(db_session):
+    """Projects "big" (40) and "small" (4) with PENDING jobs due in 2000, so no other test's jobs are due then."""
+    from app.seed.prototype import seed_prototype_project
+    db_session.query(ScheduledJob).filter(ScheduledJob.run_at < datetime(2001, 1, 1)).update(
+        {ScheduledJob.status: JobStatus.CANCELLED.value}, synchronize_session=False
+    )
+    ids = {}
+    for name, count in (("big", 40), ("small", 4)):
+        proj = Project(id=str(uuid.uuid4()), name=f"Fair-{name}", description="Test", status="Active")
+        db_session.add(proj)
+        db_session.commit()
+        seed_prototype_project(db_session, proj.id)
+        p = Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="ACTIVE")
+        db_session.add(p)
+        node = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_Start").first()
+        db_session.add_all([
+            ScheduledJob(
+                id=str(uuid.uuid4()), participant_id=p.id, project_id=proj.id, node_id=node.id,
+                run_at=datetime(2000, 1, 1) + timedelta(seconds=i), status=JobStatus.PENDING.value,
+            )
+            for i in range(count)
+        ])
+        ids[name] = proj.id
+    db_session.commit()
+    return ids
+
+
+def _by_project(db_session, jobs):
+    rows = db_session.query(ScheduledJob.project_id).filter(ScheduledJob.id.in_([j.id for j in jobs])).all()
+    counts = {}
+    for (project_id,) in rows:
+        counts[project_id] = counts.get(project_id, 0) + 1
+    return counts
+
+
+def test_claims_are_shared_round_robin_between_projects(db_session, two_projects):
+    """A big backlog cannot take the whole batch: the small project gets all its jobs in the first claim."""
+    from app.core.scheduler import claim_fair
+    now = datetime(2000, 1, 2)
+    claimed, throttled = claim_fair(db_session, 10, "fair/1", now=now)
+    db_session.commit()
+    assert throttled == []
+    assert _by_project(db_session, claimed) == {two_projects["small"]: 4, two_projects["big"]: 6}
+
+
+def test_throttled_project_is_paced_not_held(db_session, two_projects):
+    """A project over its rate gets only its tokens; its other due jobs move to run_at slots at its rate."""
+    from app.core.ratelimit import RateLimiter
+    from app.core.scheduler import claim_fair, pace_due_jobs
+    big, small = two_projects["big"], two_projects["small"]
+    limiter = RateLimiter(lambda key: 2.0 if key == big else None, burst_seconds=1.5, clock=FakeClock())
+    now = datetime(2000, 1, 2)
+    claimed, throttled = claim_fair(db_session, 30, "fair/2", limiter, now=now)
+    assert _by_project(db_session, claimed) == {big: 3, small: 4}
+    assert throttled == [big]
+    assert pace_due_jobs(db_session, big, limiter, 10, now=now) == 10
+    db_session.commit()
+    paced = sorted(
+        run_at for (run_at,) in db_session.query(ScheduledJob.run_at).filter(
+            ScheduledJob.project_id == big, ScheduledJob.status == JobStatus.PENDING.value, ScheduledJob.run_at > now
+        )
+    )
+    assert len(paced) == 10
+    assert paced[0] == now + timedelta(seconds=0.5)  # when the emptied bucket next has a token
+    assert all(b - a == timedelta(seconds=0.5) for a, b in zip(paced, paced[1:]))
+    assert db_session.query(ScheduledJob).filter(ScheduledJob.project_id == big, ScheduledJob.status == JobStatus.RUNNING.value).count() == 3
+    # The next call continues after the last slot handed out.
+    assert pace_due_jobs(db_session, big, limiter, 1, now=now) == 1
+    db_session.commit()
+    assert db_session.query(ScheduledJob).filter(
+        ScheduledJob.project_id == big, ScheduledJob.run_at == paced[-1] + timedelta(seconds=0.5)
+    ).count() == 1
+
+
+@pytest.fixture
+def laned_jobs(db_session):
+    """One project with 20 interactive and 20 bulk PENDING jobs due in 1999 (no other test's jobs are due then)."""
+    from app.models.scheduled_job import JobLane
+    from app.seed.prototype import seed_prototype_project
+    db_session.query(ScheduledJob).filter(ScheduledJob.run_at < datetime(2001, 1, 1)).update(
+        {ScheduledJob.status: JobStatus.CANCELLED.value}, synchronize_session=False
+    )
+    proj = Project(id=str(uuid.uuid4()), name="Lanes", description="Test", status="Active")
+    db_session.add(proj)
+    db_session.commit()
+    seed_prototype_project(db_session, proj.id)
+    p = Participant(id=str(uuid.uuid4()), project_id=proj.id, language="English", status="ACTIVE")
+    db_session.add(p)
+    node = db_session.query(Node).filter(Node.project_id == proj.id, Node.name == "Node_Start").first()
+    db_session.add_all([
+        ScheduledJob(
+            id=str(uuid.uuid4()), participant_id=p.id, project_id=proj.id, node_id=node.id, lane=lane.value,
+            run_at=datetime(1999, 1, 1) + timedelta(seconds=i), status=JobStatus.PENDING.value,
+        )
+        for lane in JobLane
+        for i in range(20)
+    ])
+    db_session.commit()
+    return proj.id
+
+
+def _by_lane(jobs):
+    counts = {}
+    for job in jobs:
+        counts[job.lane] = counts.get(job.lane, 0) + 1
+    return counts
+
+
+def test_lanes_get_reserved_capacity(db_session, laned_jobs):
+    """Each lane gets its reserved share; leftover capacity goes to the interactive lane first."""
+    from app.core.scheduler import claim_lanes, lane_reservations
+    now = datetime(1999, 1, 2)
+    with patch.object(settings, "SCHEDULER_LANE_RESERVED", {"interactive": 0.5, "bulk": 0.2}):
+        assert lane_reservations(10) == {"interactive": 5, "bulk": 2}
+        claimed, _ = claim_lanes(db_session, 10, "lanes/1", now=now)
+        assert _by_lane(claimed) == {"interactive": 8, "bulk": 2}
+        claimed, _ = claim_lanes(db_session, 30, "lanes/2", now=now)
+        db_session.commit()
+    # Only 12 interactive jobs were left: bulk takes the rest of the batch.
+    assert _by_lane(claimed) == {"interactive": 12, "bulk": 18}
+
+
+def test_lane_lag_endpoint(client, db_session, laned_jobs):
+    """The lanes endpoint reports each lane's due backlog and how long its oldest job has waited."""
+    from app.core.scheduler import lane_lag
+    lanes = {row["lane"]: row for row in lane_lag(db_session)}
+    assert lanes["interactive"]["due"] >= 20 and lanes["bulk"]["due"] >= 20
+    assert lanes["bulk"]["lag_seconds"] > 365 * 24 * 3600
+    r = client.get("/api/scheduler/lanes")
+    assert r.status_code == 200
+    assert [row["lane"] for row in r.json()] == ["interactive", "bulk"]